@@ -0,0 +1,130 @@
+# Load generator for the Bedrock runtime helpers.
+#
+# Drives bedrock_runtime (Converse), bedrock_stream (ConverseStream) or
+# Titan InvokeModel at a fixed concurrency and reports throughput, latency
+# percentiles, time to first token and errors. By default it starts
+# bedrock_stub in-process, so pooling, retries and streaming can be
+# load-tested offline:
+#
+#   python bedrock_loadgen.py --mode converse --requests 500 --concurrency 32 --throttle-rate 0.05
+#   python bedrock_loadgen.py --mode stream --concurrency 64 --max-concurrency 40
+#   python bedrock_loadgen.py --mode embed --endpoint http://127.0.0.1:8787
+#
+# Use --endpoint to target a stub started separately (or real Bedrock with
+# --endpoint "" and real credentials).
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from bedrock_stub import add_stub_arguments, config_from_args, start_stub
+
+parser = argparse.ArgumentParser(description="Load-test the Bedrock runtime helpers")
+parser.add_argument("--mode", choices=["converse", "stream", "embed"], default="converse")
+parser.add_argument("--requests", type=int, default=200)
+parser.add_argument("--concurrency", type=int, default=16)
+parser.add_argument("--model-id", default="anthropic.claude-3-5-sonnet-20240620-v1:0")
+parser.add_argument("--embedding-model-id", default="amazon.titan-embed-text-v2:0")
+parser.add_argument("--max-tokens", type=int, default=200)
+parser.add_argument("--endpoint", help="existing endpoint (default: start a local stub)")
+parser.add_argument("--ledger", action="store_true", help="record calls in the usage ledger")
+add_stub_arguments(parser)
+args = parser.parse_args()
+
+server = None
+if args.endpoint is None:
+    server = start_stub(0, config=config_from_args(args))
+    endpoint = f"http://127.0.0.1:{server.server_port}"
+else:
+    endpoint = args.endpoint
+
+# bedrock_runtime reads its settings at import time
+os.environ["BEDROCK_ENDPOINT_URL"] = endpoint
+os.environ["BEDROCK_MAX_CONCURRENCY"] = str(args.concurrency)
+os.environ["BEDROCK_MAX_POOL_CONNECTIONS"] = str(max(50, args.concurrency))
+os.environ.setdefault("AWS_REGION", "us-east-1")
+if not args.ledger:
+    os.environ["BEDROCK_USAGE_LEDGER"] = ""
+if endpoint:
+    # The stub does not check signatures, but botocore needs something to sign with
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "stub")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "stub")
+
+from bedrock_runtime import LatencyStats, call_with_backoff, converse_many, get_client  # noqa: E402
+from bedrock_stream import stream_converse  # noqa: E402
+
+prompts = [f"Question {i}: what is machine learning? Answer briefly." for i in range(args.requests)]
+inference_config = {"maxTokens": args.max_tokens}
+
+
+def run_converse() -> LatencyStats:
+    _, stats = converse_many(prompts, args.model_id, inference_config, max_concurrency=args.concurrency)
+    return stats
+
+
+def run_stream() -> LatencyStats:
+    stats = LatencyStats()
+
+    async def one(prompt: str, limit: asyncio.Semaphore) -> None:
+        async with limit:
+            try:
+                async with stream_converse(prompt, args.model_id, inference_config, stats=stats) as stream:
+                    async for _ in stream:
+                        pass
+            except Exception:
+                # Already counted in stats
+                pass
+
+    async def main() -> None:
+        limit = asyncio.Semaphore(args.concurrency)
+        await asyncio.gather(*(one(prompt, limit) for prompt in prompts))
+
+    asyncio.run(main())
+    return stats
+
+
+def run_embed() -> LatencyStats:
+    stats = LatencyStats()
+    client = get_client()
+
+    def one(text: str) -> None:
+        body = json.dumps({"inputText": text, "dimensions": 1024, "normalize": True})
+        start = time.perf_counter()
+        try:
+            response = call_with_backoff(client.invoke_model, modelId=args.embedding_model_id, body=body)
+            response["body"].read()
+            stats.record(time.perf_counter() - start, response={})
+        except Exception as e:
+            stats.record(time.perf_counter() - start, error=e)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, prompts))
+    return stats
+
+
+print(f"Running {args.requests} {args.mode} requests at concurrency {args.concurrency} against {endpoint or 'AWS'}")
+start = time.perf_counter()
+stats = {"converse": run_converse, "stream": run_stream, "embed": run_embed}[args.mode]()
+elapsed = time.perf_counter() - start
+
+summary = stats.summary()
+print(f"\nWall time: {elapsed:.2f}s, throughput {summary['calls'] / elapsed:.1f} req/s")
+for key, value in summary.items():
+    print(f"  {key:<14} {value}")
+
+if server is not None:
+    stub_stats = server.stats.to_dict()
+elif endpoint:
+    try:
+        with urllib.request.urlopen(f"{endpoint}/stats", timeout=5) as response:
+            stub_stats = json.loads(response.read())
+    except OSError:
+        stub_stats = None
+else:
+    stub_stats = None
+if stub_stats:
+    print("\nStub:", stub_stats)
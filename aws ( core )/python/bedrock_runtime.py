@@ -0,0 +1,289 @@
+# Shared Bedrock Runtime client with connection pooling, adaptive retries
+# and bounded concurrency.
+#
+# Every script in this folder used to build its own default client, make
+# one call and exit on the first error. This module gives them:
+#   - one thread-safe client per process, with max_pool_connections tuned
+#     like the JavaScript examples (maxSockets: 50)
+#   - botocore "adaptive" retry mode (client-side rate limiting + retries)
+#   - an outer full-jitter backoff on ThrottlingException, so bulk jobs
+#     ride out sustained throttling instead of failing
+#   - converse_many(): many Converse requests under a concurrency limit,
+#     with per-call latency and token statistics
+#
+# Usage:
+#   from bedrock_runtime import converse, converse_many, response_text
+#   print(response_text(converse("What's Machine Learning?")))
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+import usage_ledger
+
+# Load environment variables
+load_dotenv()
+
+# AWS Configuration
+REGION = os.getenv("AWS_REGION")
+MODEL_ID = os.getenv("BEDROCK_MODEL_ID")
+
+# Optional endpoint override, e.g. a VPC endpoint or the local stub
+ENDPOINT_URL = os.getenv("BEDROCK_ENDPOINT_URL") or None
+
+# Connection pool size; keep it >= MAX_CONCURRENCY (JS uses maxSockets: 50)
+MAX_POOL_CONNECTIONS = int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "50"))
+
+# Concurrent Bedrock calls allowed per process
+MAX_CONCURRENCY = int(os.getenv("BEDROCK_MAX_CONCURRENCY", "16"))
+
+# Attempts made by botocore's adaptive retry mode for each call
+MAX_ATTEMPTS = int(os.getenv("BEDROCK_MAX_ATTEMPTS", "6"))
+
+# Extra backoff rounds after botocore gives up on a throttled call
+THROTTLE_RETRIES = int(os.getenv("BEDROCK_THROTTLE_RETRIES", "4"))
+
+# Default inference configuration (see claude.converse.py for presets)
+DEFAULT_INFERENCE_CONFIG = {"maxTokens": 512, "temperature": 0.5, "topP": 0.9}
+
+RETRYABLE_ERRORS = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+_client = None
+_client_lock = threading.Lock()
+_semaphore = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+
+def get_client():
+    """
+    Return the process-wide Bedrock Runtime client.
+
+    boto3 clients are thread-safe once created, but creating them is not,
+    so the first caller builds it under a lock and everyone shares it.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                config = Config(
+                    region_name=REGION,
+                    max_pool_connections=MAX_POOL_CONNECTIONS,
+                    retries={"mode": "adaptive", "max_attempts": MAX_ATTEMPTS},
+                    connect_timeout=5,
+                    read_timeout=120,
+                    tcp_keepalive=True,
+                )
+                session = boto3.session.Session()
+                _client = session.client("bedrock-runtime", config=config, endpoint_url=ENDPOINT_URL)
+    return _client
+
+
+def error_code(error: Exception) -> str | None:
+    """The AWS error code of a ClientError, or None."""
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code")
+    return None
+
+
+def call_with_backoff(function, *args, retries: int = THROTTLE_RETRIES,
+                      base_delay: float = 1.0, max_delay: float = 30.0, **kwargs):
+    """
+    Call a Bedrock API function, retrying throttling with full-jitter backoff.
+
+    botocore already retried the call MAX_ATTEMPTS times; this waits a
+    random time in [0, min(max_delay, base_delay * 2**attempt)] and tries
+    again, so many workers do not retry in lockstep.
+
+    Args:
+        function: Client method, e.g. get_client().converse
+        retries: Extra attempts after a retryable error
+        base_delay: First backoff ceiling in seconds
+        max_delay: Largest backoff ceiling in seconds
+
+    Returns:
+        The API response
+    """
+    for attempt in range(retries + 1):
+        try:
+            return function(*args, **kwargs)
+        except ClientError as e:
+            if error_code(e) not in RETRYABLE_ERRORS or attempt == retries:
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+class LatencyStats:
+    """Thread-safe per-call latency, error and token statistics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: list[float] = []
+        self.first_token_latencies: list[float] = []
+        self.errors: dict[str, int] = {}
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def record(self, seconds: float, response: dict | None = None, error: Exception | None = None) -> None:
+        with self._lock:
+            self.latencies.append(seconds)
+            if error is not None:
+                code = error_code(error) or type(error).__name__
+                self.errors[code] = self.errors.get(code, 0) + 1
+            if response is not None:
+                usage = response.get("usage", {})
+                self.input_tokens += usage.get("inputTokens", 0)
+                self.output_tokens += usage.get("outputTokens", 0)
+
+    def record_first_token(self, seconds: float) -> None:
+        """Record the time to the first streamed token of a call."""
+        with self._lock:
+            self.first_token_latencies.append(seconds)
+
+    def summary(self) -> dict:
+        """Count, errors, tokens and latency percentiles in milliseconds."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            first_token = sorted(self.first_token_latencies)
+            errors = dict(self.errors)
+
+        def percentile(q: float, values: list[float] = latencies) -> float | None:
+            if not values:
+                return None
+            index = min(len(values) - 1, round(q / 100 * (len(values) - 1)))
+            return round(values[index] * 1000, 1)
+
+        summary = {
+            "calls": len(latencies),
+            "errors": errors,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+        }
+        if first_token:
+            summary["ttft_p50_ms"] = percentile(50, first_token)
+            summary["ttft_p95_ms"] = percentile(95, first_token)
+        return summary
+
+
+def user_message(text: str) -> list[dict]:
+    """Wrap a prompt into a one-message Converse conversation."""
+    return [{"role": "user", "content": [{"text": text}]}]
+
+
+def response_text(response: dict) -> str:
+    """Concatenate the text blocks of a Converse response."""
+    blocks = response["output"]["message"]["content"]
+    return "".join(block.get("text", "") for block in blocks)
+
+
+def converse(messages, model_id: str | None = None, inference_config: dict | None = None,
+             system: str | None = None, stats: LatencyStats | None = None, **kwargs) -> dict:
+    """
+    Send one Converse request through the shared client.
+
+    Waits for a slot under the process-wide concurrency limit, retries
+    throttling with backoff and records the call in the usage ledger.
+
+    Args:
+        messages: Conversation list, or a plain prompt string
+        model_id: Model to call (default BEDROCK_MODEL_ID)
+        inference_config: Overrides DEFAULT_INFERENCE_CONFIG
+        system: Optional system prompt
+        stats: Collector for latency, errors and tokens
+        **kwargs: Extra Converse parameters (toolConfig, ...)
+
+    Returns:
+        The Converse response
+    """
+    if isinstance(messages, str):
+        messages = user_message(messages)
+
+    request = {
+        "modelId": model_id or MODEL_ID,
+        "messages": messages,
+        "inferenceConfig": {**DEFAULT_INFERENCE_CONFIG, **(inference_config or {})},
+        **kwargs,
+    }
+    if system:
+        request["system"] = [{"text": system}]
+
+    client = get_client()
+    with _semaphore:
+        start = time.perf_counter()
+        try:
+            response = call_with_backoff(client.converse, **request)
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            usage_ledger.record_error(request["modelId"], "converse", error_code(e) or type(e).__name__, elapsed)
+            if stats is not None:
+                stats.record(elapsed, error=e)
+            raise
+    elapsed = time.perf_counter() - start
+    usage_ledger.record_response(request["modelId"], "converse", response, elapsed)
+    if stats is not None:
+        stats.record(elapsed, response=response)
+    return response
+
+
+def converse_many(conversations, model_id: str | None = None, inference_config: dict | None = None,
+                  system: str | None = None, max_concurrency: int = MAX_CONCURRENCY):
+    """
+    Run many Converse requests concurrently.
+
+    A failed request does not stop the others: its slot in the results
+    holds the exception instead of a response.
+
+    Args:
+        conversations: Iterable of conversation lists or prompt strings
+        model_id: Model to call (default BEDROCK_MODEL_ID)
+        inference_config: Overrides DEFAULT_INFERENCE_CONFIG
+        system: Optional system prompt for every request
+        max_concurrency: Worker threads (still capped by MAX_CONCURRENCY)
+
+    Returns:
+        (results in input order, LatencyStats)
+    """
+    stats = LatencyStats()
+
+    def run(messages):
+        try:
+            return converse(messages, model_id, inference_config, system, stats)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        results = list(pool.map(run, conversations))
+    return results, stats
+
+
+if __name__ == "__main__":
+    prompts = [
+        "Whats Machine Learning? Explain in 1 sentence.",
+        "Whats Deep Learning? Explain in 1 sentence.",
+        "Whats Reinforcement Learning? Explain in 1 sentence.",
+        "Whats a Transformer model? Explain in 1 sentence.",
+    ]
+
+    results, stats = converse_many(prompts, inference_config={"maxTokens": 200})
+    for prompt, result in zip(prompts, results):
+        print(f"\n> {prompt}")
+        if isinstance(result, Exception):
+            print(f"ERROR: {result}")
+        else:
+            print(response_text(result))
+
+    print("\nStats:", stats.summary())
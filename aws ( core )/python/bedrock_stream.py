@@ -0,0 +1,273 @@
+# Async streaming bridge for the Bedrock ConverseStream API.
+#
+# boto3 is synchronous: iterating converse_stream()["stream"] blocks the
+# calling thread until the next event arrives. BedrockStream runs that
+# loop in a worker thread and hands each event to the asyncio event loop
+# with call_soon_threadsafe, so one event loop can consume many Claude
+# streams at once while the threads only wait on sockets.
+#
+#   - async iteration yields text deltas
+#   - the final "metadata" event (usage tokens, latencyMs) and the stop
+#     reason are available once the stream ends
+#   - time to first token is measured from the request
+#   - cancelling the consuming task (or calling aclose()) closes the
+#     underlying HTTP stream, so the model stops billing output tokens
+#
+# Usage:
+#   async with stream_converse("What's Machine Learning?") as stream:
+#       async for text in stream:
+#           print(text, end="")
+#   print(stream.metadata)
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import usage_ledger
+from bedrock_runtime import (
+    DEFAULT_INFERENCE_CONFIG,
+    MAX_POOL_CONNECTIONS,
+    MODEL_ID,
+    LatencyStats,
+    call_with_backoff,
+    error_code,
+    get_client,
+    user_message,
+)
+
+# Streams read at once; each holds one bridge thread and one pooled connection
+MAX_STREAMS = int(os.getenv("BEDROCK_MAX_STREAMS", str(MAX_POOL_CONNECTIONS)))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_STREAMS, thread_name_prefix="bedrock-stream")
+
+# Queue markers for the producer thread
+_DELTA, _DONE, _ERROR = "delta", "done", "error"
+
+
+class BedrockStream:
+    """
+    Async iterator over the text deltas of one ConverseStream call.
+
+    After iteration finishes, ``metadata`` holds the final metadata event
+    ({"usage": {...}, "metrics": {"latencyMs": ...}}), ``stop_reason``
+    the messageStop reason and ``ttft_s`` the time to the first delta.
+    """
+
+    def __init__(self, messages, model_id: str | None = None, inference_config: dict | None = None,
+                 system: str | None = None, stats: LatencyStats | None = None, **kwargs):
+        """
+        Prepare the stream (the request is sent by start()).
+
+        Args:
+            messages: Conversation list, or a plain prompt string
+            model_id: Model to call (default BEDROCK_MODEL_ID)
+            inference_config: Overrides DEFAULT_INFERENCE_CONFIG
+            system: Optional system prompt
+            stats: Collector for latency, time to first token and tokens
+            **kwargs: Extra ConverseStream parameters
+        """
+        if isinstance(messages, str):
+            messages = user_message(messages)
+
+        self.request = {
+            "modelId": model_id or MODEL_ID,
+            "messages": messages,
+            "inferenceConfig": {**DEFAULT_INFERENCE_CONFIG, **(inference_config or {})},
+            **kwargs,
+        }
+        if system:
+            self.request["system"] = [{"text": system}]
+
+        self.stats = stats
+        self.metadata: dict | None = None
+        self.stop_reason: str | None = None
+        self.ttft_s: float | None = None
+        self.elapsed_s: float | None = None
+        self.cancelled = False
+
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._future = None
+        self._event_stream = None
+        self._cancel = threading.Event()
+        self._start = 0.0
+        # Whichever of cancel() and the bridge thread finishes last records a cancelled call
+        self._record_lock = threading.Lock()
+        self._requested = False
+        self._producer_done = False
+        self._finished = False
+
+    def start(self) -> "BedrockStream":
+        """Send the request from a bridge thread. Must run inside the event loop."""
+        if self._future is None:
+            self._loop = asyncio.get_running_loop()
+            self._queue = asyncio.Queue()
+            self._start = time.perf_counter()
+            self._future = self._loop.run_in_executor(_executor, self._produce)
+        return self
+
+    def _emit(self, kind: str, value=None) -> None:
+        """Hand an item to the event loop (called from the bridge thread)."""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (kind, value))
+
+    def _produce(self) -> None:
+        """Read the event stream and forward it to the event loop."""
+        try:
+            if self._cancel.is_set():
+                return
+            self._requested = True
+            response = call_with_backoff(get_client().converse_stream, **self.request)
+            self._event_stream = response["stream"]
+            if self._cancel.is_set():
+                self._event_stream.close()
+                return
+
+            for event in self._event_stream:
+                if self._cancel.is_set():
+                    break
+                if "contentBlockDelta" in event:
+                    text = event["contentBlockDelta"]["delta"].get("text")
+                    if text:
+                        self._emit(_DELTA, text)
+                elif "messageStop" in event:
+                    self.stop_reason = event["messageStop"].get("stopReason")
+                elif "metadata" in event:
+                    self.metadata = event["metadata"]
+        except Exception as e:
+            # Errors caused by closing the stream on cancel are expected
+            if not self._cancel.is_set():
+                self._emit(_ERROR, e)
+                return
+        finally:
+            with self._record_lock:
+                self._producer_done = True
+                cancelled = self._cancel.is_set()
+            if cancelled:
+                self._record_cancelled()
+            self._emit(_DONE)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        if self._finished:
+            raise StopAsyncIteration
+        self.start()
+
+        try:
+            kind, value = await self._queue.get()
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+        if kind == _DELTA:
+            if self.ttft_s is None:
+                self.ttft_s = time.perf_counter() - self._start
+                if self.stats is not None:
+                    self.stats.record_first_token(self.ttft_s)
+            return value
+
+        self._finished = True
+        self.elapsed_s = time.perf_counter() - self._start
+        model_id = self.request["modelId"]
+        if kind == _ERROR:
+            usage_ledger.record_error(model_id, "converse_stream", error_code(value) or type(value).__name__, self.elapsed_s)
+            if self.stats is not None:
+                self.stats.record(self.elapsed_s, error=value)
+            raise value
+        if not self.cancelled:
+            usage_ledger.record_response(model_id, "converse_stream", self.metadata, self.elapsed_s, self.ttft_s)
+            if self.stats is not None:
+                self.stats.record(self.elapsed_s, response=self.metadata)
+        raise StopAsyncIteration
+
+    def cancel(self) -> None:
+        """Stop reading and close the underlying HTTP stream."""
+        if self._finished or self._cancel.is_set():
+            return
+        self.cancelled = True
+        with self._record_lock:
+            self._cancel.set()
+            producer_done = self._producer_done
+        if producer_done:
+            self._record_cancelled()
+        if self._event_stream is not None:
+            # Unblocks the bridge thread if it is waiting on the socket
+            self._event_stream.close()
+
+    def _record_cancelled(self) -> None:
+        """Write the ledger row of a cancelled call (once, by cancel() or the bridge thread)."""
+        if not self._requested:
+            return
+        model_id = self.request["modelId"]
+        elapsed_s = time.perf_counter() - self._start
+        if self.metadata is not None:
+            # The response was complete; only the consumer stopped early
+            usage_ledger.record_response(model_id, "converse_stream", self.metadata, elapsed_s, self.ttft_s)
+        else:
+            usage_ledger.record_error(model_id, "converse_stream", "cancelled", elapsed_s)
+
+    async def aclose(self) -> None:
+        """Cancel the stream and wait for the bridge thread to exit."""
+        self.cancel()
+        if self._future is not None:
+            await asyncio.shield(self._future)
+        self._finished = True
+
+    async def text(self) -> str:
+        """Consume the whole stream and return the full response text."""
+        return "".join([delta async for delta in self])
+
+    async def __aenter__(self) -> "BedrockStream":
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if not self._finished:
+            await self.aclose()
+
+
+def stream_converse(messages, model_id: str | None = None, inference_config: dict | None = None,
+                    system: str | None = None, stats: LatencyStats | None = None, **kwargs) -> BedrockStream:
+    """
+    Create a BedrockStream for one ConverseStream request.
+
+    The request is sent when the stream is entered or first iterated.
+    """
+    return BedrockStream(messages, model_id, inference_config, system, stats, **kwargs)
+
+
+if __name__ == "__main__":
+    prompts = [
+        "Whats Machine Learning? Explain in 3 sentences.",
+        "Whats Deep Learning? Explain in 3 sentences.",
+        "Write a very long essay about the history of computing.",
+    ]
+
+    async def consume(index: int, prompt: str, stats: LatencyStats, max_chars: int | None = None) -> str:
+        async with stream_converse(prompt, stats=stats) as stream:
+            parts = []
+            async for delta in stream:
+                parts.append(delta)
+                if max_chars is not None and sum(map(len, parts)) >= max_chars:
+                    # Stop early: the HTTP stream is closed on exit
+                    break
+        status = "cancelled" if stream.cancelled else f"stop={stream.stop_reason} metadata={stream.metadata}"
+        ttft = f"{stream.ttft_s * 1000:.0f} ms" if stream.ttft_s is not None else "-"
+        print(f"\n[{index}] ttft={ttft} {status}")
+        return "".join(parts)
+
+    async def main():
+        stats = LatencyStats()
+        # The third stream is cut off after 200 characters
+        results = await asyncio.gather(
+            *(consume(i, prompt, stats, 200 if i == 2 else None) for i, prompt in enumerate(prompts)),
+            return_exceptions=True,
+        )
+        for index, result in enumerate(results):
+            print(f"\n> {prompts[index]}")
+            print(f"ERROR: {result}" if isinstance(result, Exception) else result)
+        print("\nStats:", stats.summary())
+
+    asyncio.run(main())
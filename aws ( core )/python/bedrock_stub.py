@@ -0,0 +1,404 @@
+# Local stand-in for the bedrock-runtime API, for offline load testing.
+#
+# Implements the three operations the scripts in this folder use:
+#   POST /model/{modelId}/converse          Converse (JSON)
+#   POST /model/{modelId}/converse-stream   ConverseStream (AWS event-stream framing)
+#   POST /model/{modelId}/invoke            InvokeModel for Titan text embeddings
+# plus GET /stats with request counters.
+#
+# Point any boto3 client at it with the endpoint override:
+#   python bedrock_stub.py --port 8787 --throttle-rate 0.1
+#   BEDROCK_ENDPOINT_URL=http://127.0.0.1:8787 python claude.converse.py
+# (any credentials work; the stub does not check signatures).
+#
+# Latency (time to first token, per-token delay, jitter), a concurrency
+# limit and random throttling / unavailability can be injected, so client
+# pooling, retries and streaming can be load-tested without AWS. The
+# response builders (converse_response, titan_embedding_response) also
+# produce payloads for botocore's Stubber.
+
+import argparse
+import binascii
+import hashlib
+import json
+import math
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+# Words the fake model answers with
+_WORDS = (
+    "machine learning lets computers find patterns in data and improve with "
+    "experience instead of following rules written by hand for every case"
+).split()
+
+
+class StubConfig:
+    """Injected behaviour of the stub."""
+
+    def __init__(self, first_token_ms: float = 200.0, token_ms: float = 15.0, jitter: float = 0.2,
+                 output_tokens: int = 40, max_concurrency: int = 0, throttle_rate: float = 0.0,
+                 unavailable_rate: float = 0.0, embedding_ms: float = 30.0):
+        """
+        Args:
+            first_token_ms: Delay before the first token (whole prefill)
+            token_ms: Delay per generated token
+            jitter: Relative random variation of every delay (0.2 = +/-20%)
+            output_tokens: Tokens generated per response (capped by maxTokens)
+            max_concurrency: Requests served at once; more are throttled (0 = unlimited)
+            throttle_rate: Probability of a ThrottlingException
+            unavailable_rate: Probability of a ServiceUnavailableException
+            embedding_ms: Latency of one Titan embedding
+        """
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.jitter = jitter
+        self.output_tokens = output_tokens
+        self.max_concurrency = max_concurrency
+        self.throttle_rate = throttle_rate
+        self.unavailable_rate = unavailable_rate
+        self.embedding_ms = embedding_ms
+
+    def delay(self, ms: float) -> None:
+        if ms > 0:
+            time.sleep(ms * random.uniform(1 - self.jitter, 1 + self.jitter) / 1000)
+
+
+class StubStats:
+    """Thread-safe request counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def inc(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def enter(self, limit: int) -> bool:
+        """Admit a request unless the concurrency limit is reached."""
+        with self._lock:
+            if limit and self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return True
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"counts": dict(self.counts), "in_flight": self.in_flight, "max_in_flight": self.max_in_flight}
+
+
+# =============================================================================
+# RESPONSE BUILDERS
+# =============================================================================
+
+def count_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)."""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def prompt_tokens(request: dict) -> int:
+    """Estimate input tokens of a Converse request."""
+    texts = [block.get("text", "") for message in request.get("messages", []) for block in message.get("content", [])]
+    texts += [block.get("text", "") for block in request.get("system", [])]
+    return sum(count_tokens(text) for text in texts) + 3 * len(request.get("messages", []))
+
+
+def generate_tokens(request: dict, default_tokens: int) -> list[str]:
+    """Deterministic fake output tokens, capped by inferenceConfig.maxTokens."""
+    max_tokens = request.get("inferenceConfig", {}).get("maxTokens", default_tokens)
+    count = min(default_tokens, max_tokens)
+    return [(" " if i else "") + _WORDS[i % len(_WORDS)] for i in range(count)]
+
+
+def converse_response(text: str, input_tokens: int, output_tokens: int, latency_ms: int,
+                      stop_reason: str = "end_turn") -> dict:
+    """A Converse response body (also usable with botocore's Stubber)."""
+    return {
+        "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+        "stopReason": stop_reason,
+        "usage": {
+            "inputTokens": input_tokens,
+            "outputTokens": output_tokens,
+            "totalTokens": input_tokens + output_tokens,
+        },
+        "metrics": {"latencyMs": latency_ms},
+    }
+
+
+def titan_embedding(text: str, dimensions: int = 1024, normalize: bool = True) -> list[float]:
+    """Deterministic pseudo-embedding derived from the text's hash."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    if normalize:
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        vector = [value / norm for value in vector]
+    return vector
+
+
+def titan_embedding_response(text: str, dimensions: int = 1024, normalize: bool = True) -> dict:
+    """A Titan Text Embeddings V2 InvokeModel body."""
+    return {
+        "embedding": titan_embedding(text, dimensions, normalize),
+        "inputTextTokenCount": count_tokens(text),
+    }
+
+
+# =============================================================================
+# EVENT-STREAM FRAMING
+# =============================================================================
+# Each message: total length (uint32), headers length (uint32), CRC32 of
+# those 8 bytes, headers, payload, CRC32 of everything before it. Headers
+# are name length (uint8), name, type 7 (string), value length (uint16), value.
+
+def _encode_headers(headers: dict[str, str]) -> bytes:
+    encoded = b""
+    for name, value in headers.items():
+        name_bytes, value_bytes = name.encode("utf-8"), value.encode("utf-8")
+        encoded += struct.pack(">B", len(name_bytes)) + name_bytes
+        encoded += struct.pack(">BH", 7, len(value_bytes)) + value_bytes
+    return encoded
+
+
+def encode_event(event_type: str, payload: dict, message_type: str = "event") -> bytes:
+    """
+    Encode one event-stream message.
+
+    Args:
+        event_type: e.g. "contentBlockDelta", or the error code for exceptions
+        payload: JSON payload
+        message_type: "event" or "exception"
+
+    Returns:
+        Framed message bytes
+    """
+    type_header = ":event-type" if message_type == "event" else ":exception-type"
+    headers = _encode_headers({
+        type_header: event_type,
+        ":content-type": "application/json",
+        ":message-type": message_type,
+    })
+    body = json.dumps(payload).encode("utf-8")
+    total_length = 12 + len(headers) + len(body) + 4
+    prelude = struct.pack(">II", total_length, len(headers))
+    prelude += struct.pack(">I", binascii.crc32(prelude) & 0xFFFFFFFF)
+    message = prelude + headers + body
+    return message + struct.pack(">I", binascii.crc32(message) & 0xFFFFFFFF)
+
+
+def decode_events(data: bytes) -> list[tuple[dict, dict]]:
+    """Decode framed messages into (headers, payload) pairs, checking both CRCs."""
+    events = []
+    offset = 0
+    while offset < len(data):
+        total_length, headers_length = struct.unpack_from(">II", data, offset)
+        (prelude_crc,) = struct.unpack_from(">I", data, offset + 8)
+        if binascii.crc32(data[offset:offset + 8]) & 0xFFFFFFFF != prelude_crc:
+            raise ValueError("prelude CRC mismatch")
+        message = data[offset:offset + total_length]
+        (message_crc,) = struct.unpack_from(">I", message, total_length - 4)
+        if binascii.crc32(message[:-4]) & 0xFFFFFFFF != message_crc:
+            raise ValueError("message CRC mismatch")
+
+        headers, position = {}, 12
+        while position < 12 + headers_length:
+            name_length = message[position]
+            name = message[position + 1:position + 1 + name_length].decode("utf-8")
+            position += 1 + name_length
+            _, value_length = struct.unpack_from(">BH", message, position)
+            headers[name] = message[position + 3:position + 3 + value_length].decode("utf-8")
+            position += 3 + value_length
+        events.append((headers, json.loads(message[12 + headers_length:-4] or b"{}")))
+        offset += total_length
+    return events
+
+
+# =============================================================================
+# HTTP SERVER
+# =============================================================================
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: StubConfig
+    stats: StubStats
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.stats.to_dict())
+        else:
+            self._send_error(404, "ResourceNotFoundException", "Unknown path")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "model":
+            self._send_error(404, "ResourceNotFoundException", "Unknown path")
+            return
+        model_id, operation = unquote(parts[1]), parts[2]
+        self.stats.inc(operation)
+
+        if not self.stats.enter(self.config.max_concurrency):
+            self.stats.inc("throttled")
+            self._send_error(429, "ThrottlingException", "Too many concurrent requests")
+            return
+        try:
+            roll = random.random()
+            if roll < self.config.throttle_rate:
+                self.stats.inc("throttled")
+                self._send_error(429, "ThrottlingException", "Too many requests, please wait before trying again.")
+            elif roll < self.config.throttle_rate + self.config.unavailable_rate:
+                self.stats.inc("unavailable")
+                self._send_error(503, "ServiceUnavailableException", "Service unavailable")
+            elif operation == "converse":
+                self._converse(body)
+            elif operation == "converse-stream":
+                self._converse_stream(body)
+            elif operation == "invoke":
+                self._invoke(model_id, body)
+            else:
+                self._send_error(404, "ResourceNotFoundException", f"Unknown operation {operation}")
+        finally:
+            self.stats.leave()
+
+    def _converse(self, request: dict) -> None:
+        start = time.perf_counter()
+        tokens = generate_tokens(request, self.config.output_tokens)
+        self.config.delay(self.config.first_token_ms + self.config.token_ms * len(tokens))
+        latency_ms = int((time.perf_counter() - start) * 1000)
+        self._send_json(200, converse_response("".join(tokens), prompt_tokens(request), len(tokens), latency_ms))
+
+    def _converse_stream(self, request: dict) -> None:
+        start = time.perf_counter()
+        tokens = generate_tokens(request, self.config.output_tokens)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            self._write_chunk(encode_event("messageStart", {"role": "assistant"}))
+            self.config.delay(self.config.first_token_ms)
+            for index, token in enumerate(tokens):
+                if index:
+                    self.config.delay(self.config.token_ms)
+                self._write_chunk(encode_event("contentBlockDelta", {"contentBlockIndex": 0, "delta": {"text": token}}))
+            self._write_chunk(encode_event("contentBlockStop", {"contentBlockIndex": 0}))
+            self._write_chunk(encode_event("messageStop", {"stopReason": "end_turn"}))
+            input_tokens = prompt_tokens(request)
+            self._write_chunk(encode_event("metadata", {
+                "usage": {"inputTokens": input_tokens, "outputTokens": len(tokens), "totalTokens": input_tokens + len(tokens)},
+                "metrics": {"latencyMs": int((time.perf_counter() - start) * 1000)},
+            }))
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the stream
+            self.stats.inc("stream_cancelled")
+            self.close_connection = True
+
+    def _invoke(self, model_id: str, request: dict) -> None:
+        if "inputText" not in request:
+            self._send_error(400, "ValidationException", f"{model_id}: only Titan text embeddings are stubbed")
+            return
+        self.config.delay(self.config.embedding_ms)
+        self._send_json(200, titan_embedding_response(
+            request["inputText"], request.get("dimensions", 1024), request.get("normalize", True)
+        ))
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, code: str, message: str) -> None:
+        # botocore reads the error code from this header (rest-json protocol)
+        self._send_json(status, {"message": message}, {"x-amzn-ErrorType": code})
+
+
+def start_stub(port: int = 0, host: str = "127.0.0.1", config: StubConfig | None = None) -> ThreadingHTTPServer:
+    """
+    Run the stub from a daemon thread.
+
+    Args:
+        port: Port to listen on (0 picks a free one)
+        host: Interface to bind
+        config: Injected behaviour
+
+    Returns:
+        The running server; its URL is http://host:server.server_port,
+        its counters are server.stats
+    """
+    handler = type("StubHandler", (_StubHandler,), {"config": config or StubConfig(), "stats": StubStats()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.stats = handler.stats
+    thread = threading.Thread(target=server.serve_forever, name="bedrock-stub", daemon=True)
+    thread.start()
+    return server
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the StubConfig options to an argument parser."""
+    parser.add_argument("--first-token-ms", type=float, default=200.0)
+    parser.add_argument("--token-ms", type=float, default=15.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--output-tokens", type=int, default=40)
+    parser.add_argument("--max-concurrency", type=int, default=0, help="throttle beyond this many requests (0 = unlimited)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--unavailable-rate", type=float, default=0.0)
+    parser.add_argument("--embedding-ms", type=float, default=30.0)
+
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        first_token_ms=args.first_token_ms,
+        token_ms=args.token_ms,
+        jitter=args.jitter,
+        output_tokens=args.output_tokens,
+        max_concurrency=args.max_concurrency,
+        throttle_rate=args.throttle_rate,
+        unavailable_rate=args.unavailable_rate,
+        embedding_ms=args.embedding_ms,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local bedrock-runtime stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_stub(args.port, args.host, config_from_args(args))
+    print(f"Bedrock stub listening on http://{args.host}:{server.server_port}")
+    print(f"  export BEDROCK_ENDPOINT_URL=http://{args.host}:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,19 +1,16 @@
 # Use the Conversation API to send a text message to Anthropic Claude.
 
-import boto3
+import time
+
 from botocore.exceptions import ClientError
-import os
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from bedrock_runtime import MODEL_ID, get_client, call_with_backoff
+from usage_ledger import record_response
 
-# AWS Configuration
-region = os.getenv("AWS_REGION")
-model_id = os.getenv("BEDROCK_MODEL_ID")
+model_id = MODEL_ID
 
-# Create a Bedrock Runtime client in the AWS Region you want to use.
-client = boto3.client("bedrock-runtime", region_name=region)
+# Shared Bedrock Runtime client (connection pool + adaptive retries).
+client = get_client()
 
 # Start a conversation with the user message.
 user_message = "Whats Machine Learning?.Explain in 10 sentence."
@@ -36,17 +33,23 @@ conversation = [
 
 try:
     # Send the message to the model, using a basic inference configuration.
-    response = client.converse(
+    # Throttling is retried with jittered backoff instead of failing.
+    start = time.perf_counter()
+    response = call_with_backoff(
+        client.converse,
         modelId=model_id,
         messages=conversation,
         inferenceConfig={"maxTokens": 512, "temperature": 0.5, "topP": 0.9},
     )
 
+    # Record tokens and latency in the usage ledger (python usage_ledger.py).
+    record_response(model_id, "converse", response, time.perf_counter() - start)
+
     # Extract and print the response text.
     response_text = response["output"]["message"]["content"][0]["text"]
-    # tokens_used = response["usage"]["totalTokens"]
+    usage = response["usage"]
     print(response_text)
-    # print(f"Tokens used: {tokens_used}")
+    print(f"\nTokens: {usage['inputTokens']} in / {usage['outputTokens']} out, latency {response['metrics']['latencyMs']} ms")
 
 except (ClientError, Exception) as e:
     print(f"ERROR: Can't invoke '{model_id}'. Reason: {e}")
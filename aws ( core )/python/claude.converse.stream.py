@@ -1,20 +1,17 @@
 # Use the Conversation API to send a text message to Anthropic Claude
 # and print the response stream.
 
-import boto3
+import time
+
 from botocore.exceptions import ClientError
-import os
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from bedrock_runtime import MODEL_ID, get_client, call_with_backoff
+from usage_ledger import record_response
 
-# AWS Configuration
-region = os.getenv("AWS_REGION")
-model_id = os.getenv("BEDROCK_MODEL_ID")
+model_id = MODEL_ID
 
-# Create a Bedrock Runtime client in the AWS Region you want to use.
-client = boto3.client("bedrock-runtime", region_name=region)
+# Shared Bedrock Runtime client (connection pool + adaptive retries).
+client = get_client()
 
 
 # Start a conversation with the user message.
@@ -28,17 +25,33 @@ conversation = [
 
 try:
     # Send the message to the model, using a basic inference configuration.
-    streaming_response = client.converse_stream(
+    # Throttling is retried with jittered backoff instead of failing.
+    start = time.perf_counter()
+    streaming_response = call_with_backoff(
+        client.converse_stream,
         modelId=model_id,
         messages=conversation,
         inferenceConfig={"maxTokens": 512, "temperature": 0.5, "topP": 0.9},
     )
 
     # Extract and print the streamed response text in real-time.
+    first_token_s = None
+    metadata = {}
     for chunk in streaming_response["stream"]:
         if "contentBlockDelta" in chunk:
+            if first_token_s is None:
+                first_token_s = time.perf_counter() - start
             text = chunk["contentBlockDelta"]["delta"]["text"]
             print(text, end="")
+        elif "metadata" in chunk:
+            # Last event: token usage and server-side latency
+            metadata = chunk["metadata"]
+
+    # Record tokens and latency in the usage ledger (python usage_ledger.py).
+    record_response(model_id, "converse_stream", metadata, time.perf_counter() - start, first_token_s)
+    if metadata:
+        usage = metadata["usage"]
+        print(f"\n\nTokens: {usage['inputTokens']} in / {usage['outputTokens']} out, latency {metadata['metrics']['latencyMs']} ms")
 
 except (ClientError, Exception) as e:
     print(f"ERROR: Can't invoke '{model_id}'. Reason: {e}")
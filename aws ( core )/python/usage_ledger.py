@@ -0,0 +1,300 @@
+# Token usage and latency ledger for Bedrock calls.
+#
+# Every Converse / ConverseStream response carries usage.inputTokens,
+# usage.outputTokens and metrics.latencyMs. The ledger appends one row per
+# call to a SQLite file (WAL mode, so concurrent writers do not block
+# readers) and aggregates by model, session and hour. Prompt-size changes
+# can then be measured in tokens and milliseconds instead of guessed.
+#
+# bedrock_runtime.converse and bedrock_stream record automatically; LangChain
+# models (ChatBedrock / ChatBedrockConverse) record through ledger_callback(),
+# which helpers/langchain.aws.py and the Bedrock backend of langchain ollama
+# attach to their models (they load this file via helpers/usage_ledger.py and
+# backends.get_usage_ledger()).
+#
+# Usage:
+#   python usage_ledger.py                 # Totals by model
+#   python usage_ledger.py --by session
+#   python usage_ledger.py --by hour --since 24
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# Ledger file; set BEDROCK_USAGE_LEDGER to an empty string to disable recording
+LEDGER_PATH = os.getenv("BEDROCK_USAGE_LEDGER", str(Path(__file__).parent / ".bedrock_usage.sqlite"))
+
+# Calls are grouped under this session unless set_session() says otherwise
+_session_id = os.getenv("BEDROCK_SESSION_ID") or uuid.uuid4().hex[:12]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    ts            REAL NOT NULL,
+    session       TEXT NOT NULL,
+    model_id      TEXT NOT NULL,
+    operation     TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    input_tokens  INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_ms    INTEGER,
+    wall_ms       REAL,
+    ttft_ms       REAL
+)
+"""
+
+# Grouping expressions for aggregate()
+_GROUPS = {
+    "model": "model_id",
+    "session": "session",
+    "hour": "strftime('%Y-%m-%d %H:00', ts, 'unixepoch', 'localtime')",
+    "operation": "operation",
+}
+
+
+def set_session(session_id: str) -> None:
+    """Group the following calls under a session ID (e.g. a user or job)."""
+    global _session_id
+    _session_id = session_id
+
+
+def get_session() -> str:
+    """Return the current session ID."""
+    return _session_id
+
+
+class UsageLedger:
+    """Append-only SQLite ledger of Bedrock calls, safe to share between threads."""
+
+    def __init__(self, path: str | Path = LEDGER_PATH):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Losing the last rows on a power cut is fine for a ledger
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS calls_ts ON calls (ts)")
+        self._conn.commit()
+
+    def record(self, model_id: str, operation: str, usage: dict | None = None,
+               latency_ms: int | None = None, wall_ms: float | None = None,
+               ttft_ms: float | None = None, status: str = "ok", session: str | None = None) -> None:
+        """
+        Append one call.
+
+        Args:
+            model_id: Bedrock model ID
+            operation: "converse", "converse_stream", "chat_model", ...
+            usage: Converse usage block ({"inputTokens", "outputTokens"})
+            latency_ms: Server-side latency (metrics.latencyMs)
+            wall_ms: Client-side wall time
+            ttft_ms: Time to first token for streams
+            status: "ok" or an error code
+            session: Session ID (default: the current session)
+        """
+        usage = usage or {}
+        row = (
+            time.time(), session or _session_id, model_id or "unknown", operation, status,
+            usage.get("inputTokens", 0), usage.get("outputTokens", 0), latency_ms, wall_ms, ttft_ms,
+        )
+        with self._lock:
+            self._conn.execute("INSERT INTO calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self._conn.commit()
+
+    def record_response(self, model_id: str, operation: str, response: dict,
+                        wall_s: float | None = None, ttft_s: float | None = None) -> None:
+        """Append a call from a Converse response or a stream's metadata event."""
+        response = response or {}
+        self.record(
+            model_id,
+            operation,
+            usage=response.get("usage"),
+            latency_ms=response.get("metrics", {}).get("latencyMs"),
+            wall_ms=round(wall_s * 1000, 1) if wall_s is not None else None,
+            ttft_ms=round(ttft_s * 1000, 1) if ttft_s is not None else None,
+        )
+
+    def aggregate(self, by: str = "model", since_hours: float | None = None) -> list[dict]:
+        """
+        Summarize calls per group.
+
+        Args:
+            by: "model", "session", "hour" or "operation"
+            since_hours: Only include calls from the last N hours
+
+        Returns:
+            One dict per group with calls, errors, tokens and latencies
+        """
+        group = _GROUPS[by]
+        where, params = "", ()
+        if since_hours is not None:
+            where, params = "WHERE ts >= ?", (time.time() - since_hours * 3600,)
+
+        query = f"""
+            SELECT {group} AS grp,
+                   COUNT(*),
+                   SUM(status != 'ok'),
+                   SUM(input_tokens),
+                   SUM(output_tokens),
+                   AVG(latency_ms),
+                   AVG(wall_ms),
+                   AVG(ttft_ms)
+            FROM calls {where}
+            GROUP BY grp
+            ORDER BY grp
+        """
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        def rounded(value):
+            return round(value, 1) if value is not None else None
+
+        return [
+            {
+                by: grp,
+                "calls": calls,
+                "errors": errors,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "avg_tokens_per_call": round((input_tokens + output_tokens) / calls, 1),
+                "avg_latency_ms": rounded(latency),
+                "avg_wall_ms": rounded(wall),
+                "avg_ttft_ms": rounded(ttft),
+            }
+            for grp, calls, errors, input_tokens, output_tokens, latency, wall, ttft in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+_ledger_failed = False
+
+
+def get_ledger() -> UsageLedger | None:
+    """Return the process-wide ledger, or None when recording is disabled."""
+    global _ledger
+    if _ledger is None and LEDGER_PATH:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = UsageLedger(LEDGER_PATH)
+    return _ledger
+
+
+def record_response(model_id: str, operation: str, response: dict,
+                    wall_s: float | None = None, ttft_s: float | None = None) -> None:
+    """
+    Record a call on the process-wide ledger.
+
+    Ledger problems (locked or read-only file) are reported once and never
+    fail the Bedrock call itself.
+    """
+    _safely(lambda ledger: ledger.record_response(model_id, operation, response, wall_s, ttft_s))
+
+
+def record_error(model_id: str, operation: str, status: str, wall_s: float | None = None) -> None:
+    """Record a failed call on the process-wide ledger."""
+    wall_ms = round(wall_s * 1000, 1) if wall_s is not None else None
+    _safely(lambda ledger: ledger.record(model_id, operation, wall_ms=wall_ms, status=status))
+
+
+def _safely(write) -> None:
+    global _ledger_failed
+    try:
+        ledger = get_ledger()
+        if ledger is not None:
+            write(ledger)
+    except sqlite3.Error as e:
+        if not _ledger_failed:
+            _ledger_failed = True
+            print(f"WARNING: usage ledger disabled after error: {e}")
+
+
+def ledger_callback(operation: str = "chat_model"):
+    """
+    Build a LangChain callback handler that records chat model calls.
+
+    Works with ChatBedrock and ChatBedrockConverse; pass it as
+    ``callbacks=[ledger_callback()]`` when creating the model.
+
+    Returns:
+        BaseCallbackHandler instance
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class UsageLedgerCallback(BaseCallbackHandler):
+        def __init__(self):
+            self._runs: dict = {}
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, invocation_params=None, **kwargs):
+            params = invocation_params or {}
+            model_id = params.get("model_id") or params.get("model") or serialized.get("kwargs", {}).get("model_id")
+            self._runs[run_id] = (model_id, time.perf_counter(), None)
+
+        def on_llm_new_token(self, token, *, run_id, **kwargs):
+            model_id, start, first_token = self._runs.get(run_id, (None, time.perf_counter(), None))
+            if first_token is None:
+                self._runs[run_id] = (model_id, start, time.perf_counter())
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            model_id, start, first_token = self._runs.pop(run_id, (None, time.perf_counter(), None))
+            message = getattr(response.generations[0][0], "message", None) if response.generations else None
+            usage = getattr(message, "usage_metadata", None) or {}
+            metadata = getattr(message, "response_metadata", None) or {}
+
+            # ChatBedrockConverse reports metrics.latencyMs as a one-element list
+            latency = metadata.get("metrics", {}).get("latencyMs")
+            if isinstance(latency, list):
+                latency = latency[0] if latency else None
+
+            record_response(
+                metadata.get("model_id") or model_id,
+                operation,
+                {
+                    "usage": {
+                        "inputTokens": usage.get("input_tokens", 0),
+                        "outputTokens": usage.get("output_tokens", 0),
+                    },
+                    "metrics": {"latencyMs": latency},
+                },
+                wall_s=time.perf_counter() - start,
+                ttft_s=first_token - start if first_token is not None else None,
+            )
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            model_id, start, _ = self._runs.pop(run_id, (None, time.perf_counter(), None))
+            response = getattr(error, "response", None)
+            code = response.get("Error", {}).get("Code") if isinstance(response, dict) else None
+            record_error(model_id, operation, code or type(error).__name__, time.perf_counter() - start)
+
+    return UsageLedgerCallback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize recorded Bedrock usage")
+    parser.add_argument("--by", choices=list(_GROUPS), default="model")
+    parser.add_argument("--since", type=float, help="only the last N hours")
+    parser.add_argument("--ledger", default=LEDGER_PATH, help="ledger file")
+    args = parser.parse_args()
+
+    if not Path(args.ledger).exists():
+        print(f"No ledger at {args.ledger}")
+        exit(1)
+
+    rows = UsageLedger(args.ledger).aggregate(args.by, args.since)
+    print(f"{args.by:<40} {'calls':>6} {'errors':>6} {'in tok':>9} {'out tok':>9} {'tok/call':>9} {'lat ms':>8} {'wall ms':>8} {'ttft ms':>8}")
+    for row in rows:
+        def cell(value):
+            return f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+        print(
+            f"{str(row[args.by]):<40} {row['calls']:>6} {row['errors']:>6} {row['input_tokens']:>9} "
+            f"{row['output_tokens']:>9} {row['avg_tokens_per_call']:>9.1f} {cell(row['avg_latency_ms'])} "
+            f"{cell(row['avg_wall_ms'])} {cell(row['avg_ttft_ms'])}"
+        )
@@ -1,13 +1,41 @@
-import boto3
+# List Bedrock foundation models from the cached catalog.
+#
+#   python bedrock.modellist.py                          # all models
+#   python bedrock.modellist.py --provider Anthropic --streaming
+#   python bedrock.modellist.py --output EMBEDDING --refresh
+#   python bedrock.modellist.py --offline                # bundled fixture, no AWS call
 
-# Test Bedrock connectivity
-bedrock = boto3.client('bedrock', region_name='us-east-1')
+import argparse
+
+from model_catalog import REGIONS, load_catalog
+
+parser = argparse.ArgumentParser(description="List Bedrock foundation models")
+parser.add_argument("--regions", nargs="+", default=REGIONS)
+parser.add_argument("--provider")
+parser.add_argument("--input", dest="input_modality")
+parser.add_argument("--output", dest="output_modality")
+parser.add_argument("--inference-type")
+parser.add_argument("--streaming", action="store_true", help="only models with response streaming")
+parser.add_argument("--all", action="store_true", help="include LEGACY models")
+parser.add_argument("--refresh", action="store_true", help="ignore the cache")
+parser.add_argument("--offline", action="store_true", help="use the bundled fixture")
+args = parser.parse_args()
 
 try:
-    # List available models
-    response = bedrock.list_foundation_models()
-    print("Available models:", len(response['modelSummaries']))
-    for model in response['modelSummaries']:
-        print(f"- {model['modelId']}")
+    catalog = load_catalog(args.regions, refresh=args.refresh, offline=args.offline)
+    for region, error in catalog.errors.items():
+        print(f"Error in {region}: {error}")
+
+    models = catalog.find(
+        provider=args.provider,
+        input_modality=args.input_modality,
+        output_modality=args.output_modality,
+        streaming=True if args.streaming else None,
+        inference_type=args.inference_type,
+        active_only=not args.all,
+    )
+    print("Available models:", len(models))
+    for model in models:
+        print(f"- {model['modelId']} [{model['region']}]")
 except Exception as e:
     print(f"Error: {e}")
@@ -5,6 +5,9 @@
 from langchain_aws import ChatBedrock
 from langchain.messages  import HumanMessage, SystemMessage
 
+from token_history import TokenBudgetHistory
+from usage_ledger import ledger_callback
+
 # Initialize the Bedrock Chat model with Claude Sonnet 4
 llm = ChatBedrock(
     model_id="anthropic.claude-3-5-sonnet-20240620-v1:0",
@@ -13,7 +16,9 @@ llm = ChatBedrock(
         "max_tokens": 1000,
         "temperature": 0.7,
         "top_p": 0.9
-    }
+    },
+    # Record tokens and latency of every call in the usage ledger
+    callbacks=[ledger_callback()],
 )
 
 # Simple text generation
@@ -39,27 +44,47 @@ def chat_with_system_message():
     print()
 
 # Interactive chat function
-def interactive_chat():
+def interactive_chat(max_history_tokens=2000):
     print("=== Interactive Chat (type 'quit' to exit) ===")
     
-    conversation_history = [
-        SystemMessage(content="You are a helpful AI assistant. Be concise and helpful.")
-    ]
+    # System message stays pinned; old turns are summarized once the
+    # history passes the token budget, so every turn costs about the same
+    history = TokenBudgetHistory(
+        "You are a helpful AI assistant. Be concise and helpful.",
+        max_tokens=max_history_tokens,
+        summarizer=llm,
+    )
     
     while True:
         user_input = input("\nYou: ")
         if user_input.lower() == 'quit':
             break
             
-        # Add user message to history
-        conversation_history.append(HumanMessage(content=user_input))
+        # Add user message to history (trims older turns if needed)
+        history.add_user(user_input)
+        messages = history.messages()
+        
+        # Stream the response as it is generated
+        print("Assistant: ", end="", flush=True)
+        response = None
+        for chunk in llm.stream(messages):
+            print(chunk.content, end="", flush=True)
+            response = chunk if response is None else response + chunk
+        print()
         
-        # Get response
-        response = llm.invoke(conversation_history)
-        print(f"Assistant: {response.content}")
+        # Add assistant response to history (None if nothing was streamed)
+        history.add_ai(response)
         
-        # Add assistant response to history
-        conversation_history.append(response)
+        # Per-turn token report
+        usage = (response.usage_metadata if response is not None else None) or {}
+        if usage.get("input_tokens"):
+            history.calibrate(messages, usage["input_tokens"])
+        stats = history.stats()
+        print(
+            f"[tokens: {usage.get('input_tokens', '?')} in / {usage.get('output_tokens', '?')} out | "
+            f"history ~{stats['estimated_tokens']}/{stats['max_tokens']}, "
+            f"{stats['turns_kept']} turns kept, {stats['turns_trimmed']} summarized]"
+        )
 
 # Run examples
 if __name__ == "__main__":
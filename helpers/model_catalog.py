@@ -0,0 +1,235 @@
+# Cached, filterable catalog of Bedrock foundation models.
+#
+# list_foundation_models() is a network round trip per region. The catalog
+# fetches every configured region concurrently, caches the raw summaries
+# on disk with a TTL and indexes them by provider, input/output modality,
+# streaming support and inference type, so startup code can pick a valid
+# model offline and instantly.
+#
+# Set BEDROCK_CATALOG_OFFLINE=1 (or pass offline=True) to read the bundled
+# fixture instead of calling AWS.
+#
+# Usage:
+#   from model_catalog import load_catalog
+#   catalog = load_catalog()
+#   model = catalog.pick(provider="Anthropic", output_modality="TEXT", streaming=True)
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+HERE = Path(__file__).parent
+
+REGIONS = [r.strip() for r in os.getenv("BEDROCK_REGIONS", os.getenv("AWS_REGION", "us-east-1")).split(",") if r.strip()]
+CACHE_PATH = Path(os.getenv("BEDROCK_CATALOG_CACHE", HERE / ".bedrock_models.json"))
+CACHE_TTL_S = int(os.getenv("BEDROCK_CATALOG_TTL", str(24 * 3600)))
+FIXTURE_PATH = HERE / "bedrock_models.fixture.json"
+OFFLINE = os.getenv("BEDROCK_CATALOG_OFFLINE", "0") == "1"
+
+
+class ModelCatalog:
+    """Foundation models from one or more regions, indexed for filtering."""
+
+    def __init__(self, regions: dict[str, list[dict]], fetched_at: float = 0.0, errors: dict | None = None):
+        """
+        Build the indexes.
+
+        Args:
+            regions: Region -> list of model summaries from list_foundation_models
+            fetched_at: Unix time the summaries were fetched
+            errors: Region -> error message for regions that failed
+        """
+        self.regions = regions
+        self.fetched_at = fetched_at
+        self.errors = errors or {}
+
+        # One entry per (region, model); "region" is added to each summary
+        self.models: list[dict] = []
+        self.by_provider: dict[str, set[int]] = {}
+        self.by_input_modality: dict[str, set[int]] = {}
+        self.by_output_modality: dict[str, set[int]] = {}
+        self.by_inference_type: dict[str, set[int]] = {}
+        self.by_region: dict[str, set[int]] = {}
+        self.by_model_id: dict[str, set[int]] = {}
+        self.streaming: set[int] = set()
+        self.active: set[int] = set()
+
+        for region, summaries in regions.items():
+            for summary in summaries:
+                index = len(self.models)
+                self.models.append({**summary, "region": region})
+                _add(self.by_provider, summary.get("providerName", "").lower(), index)
+                _add(self.by_region, region, index)
+                _add(self.by_model_id, summary["modelId"], index)
+                for modality in summary.get("inputModalities", []):
+                    _add(self.by_input_modality, modality.upper(), index)
+                for modality in summary.get("outputModalities", []):
+                    _add(self.by_output_modality, modality.upper(), index)
+                for inference_type in summary.get("inferenceTypesSupported", []):
+                    _add(self.by_inference_type, inference_type.upper(), index)
+                if summary.get("responseStreamingSupported"):
+                    self.streaming.add(index)
+                if summary.get("modelLifecycle", {}).get("status", "ACTIVE") == "ACTIVE":
+                    self.active.add(index)
+
+    def find(self, provider: str | None = None, input_modality: str | None = None,
+             output_modality: str | None = None, streaming: bool | None = None,
+             inference_type: str | None = None, region: str | None = None,
+             active_only: bool = True) -> list[dict]:
+        """
+        Return models matching every given filter.
+
+        Args:
+            provider: Provider name, e.g. "Anthropic" (case-insensitive)
+            input_modality: "TEXT", "IMAGE", ...
+            output_modality: "TEXT", "EMBEDDING", "IMAGE", ...
+            streaming: Require (True) or exclude (False) response streaming
+            inference_type: "ON_DEMAND", "PROVISIONED" or "INFERENCE_PROFILE"
+            region: Only this region
+            active_only: Skip LEGACY models
+
+        Returns:
+            Model summaries with a "region" key, in catalog order
+        """
+        candidates = set(range(len(self.models)))
+        filters = [
+            (self.by_provider, provider.lower() if provider else None),
+            (self.by_input_modality, input_modality.upper() if input_modality else None),
+            (self.by_output_modality, output_modality.upper() if output_modality else None),
+            (self.by_inference_type, inference_type.upper() if inference_type else None),
+            (self.by_region, region),
+        ]
+        for index, key in filters:
+            if key is not None:
+                candidates &= index.get(key, set())
+        if streaming is True:
+            candidates &= self.streaming
+        elif streaming is False:
+            candidates -= self.streaming
+        if active_only:
+            candidates &= self.active
+        return [self.models[i] for i in sorted(candidates)]
+
+    def pick(self, **filters) -> dict | None:
+        """Return the first model matching find(**filters), or None."""
+        matches = self.find(**filters)
+        return matches[0] if matches else None
+
+    def get(self, model_id: str, region: str | None = None) -> dict | None:
+        """Look up a model ID, optionally in a specific region."""
+        for i in sorted(self.by_model_id.get(model_id, ())):
+            if region is None or self.models[i]["region"] == region:
+                return self.models[i]
+        return None
+
+    def providers(self) -> list[str]:
+        """Provider names in the catalog."""
+        return sorted({model.get("providerName", "") for model in self.models})
+
+    def to_dict(self) -> dict:
+        return {"fetched_at": self.fetched_at, "regions": self.regions}
+
+
+def _add(index: dict[str, set[int]], key: str, value: int) -> None:
+    index.setdefault(key, set()).add(value)
+
+
+def fetch_region(region: str) -> list[dict]:
+    """Call list_foundation_models in one region."""
+    import boto3
+
+    bedrock = boto3.client("bedrock", region_name=region)
+    return bedrock.list_foundation_models()["modelSummaries"]
+
+
+def fetch_catalog(regions: list[str]) -> ModelCatalog:
+    """
+    Fetch several regions concurrently.
+
+    A failing region does not fail the catalog; its error is kept in
+    ``catalog.errors``.
+    """
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, len(regions))) as pool:
+        futures = {region: pool.submit(fetch_region, region) for region in regions}
+    for region, future in futures.items():
+        try:
+            results[region] = future.result()
+        except Exception as e:
+            errors[region] = str(e)
+    return ModelCatalog(results, time.time(), errors)
+
+
+def load_fixture(path: str | Path = FIXTURE_PATH) -> ModelCatalog:
+    """Load a catalog from a JSON file in the cache format (no network)."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return ModelCatalog(data["regions"], data.get("fetched_at", 0.0))
+
+
+def _write_cache(catalog: ModelCatalog, path: Path) -> None:
+    """Replace the cache file atomically."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(catalog.to_dict()), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def load_catalog(regions: list[str] | None = None, ttl_s: int = CACHE_TTL_S,
+                 refresh: bool = False, offline: bool = OFFLINE,
+                 cache_path: str | Path = CACHE_PATH) -> ModelCatalog:
+    """
+    Return the model catalog, from cache when it is fresh.
+
+    Args:
+        regions: Regions to include (default BEDROCK_REGIONS or AWS_REGION)
+        ttl_s: Maximum cache age in seconds
+        refresh: Ignore the cache and fetch
+        offline: Use the bundled fixture instead of AWS
+        cache_path: Cache file
+
+    Returns:
+        ModelCatalog
+    """
+    if offline:
+        return load_fixture()
+
+    regions = regions or REGIONS
+    cache_path = Path(cache_path)
+
+    cached = None
+    if cache_path.exists():
+        try:
+            cached = load_fixture(cache_path)
+        except (OSError, ValueError, KeyError):
+            cached = None
+
+    fresh = (
+        cached is not None
+        and time.time() - cached.fetched_at < ttl_s
+        and set(regions) <= set(cached.regions)
+    )
+    if fresh and not refresh:
+        return ModelCatalog({region: cached.regions[region] for region in regions}, cached.fetched_at)
+
+    catalog = fetch_catalog(regions)
+    if catalog.errors and cached is not None:
+        # Keep stale data for regions that could not be fetched
+        for region in catalog.errors:
+            if region in cached.regions:
+                catalog.regions[region] = cached.regions[region]
+        catalog = ModelCatalog(catalog.regions, catalog.fetched_at, catalog.errors)
+    if not catalog.errors:
+        _write_cache(catalog, cache_path)
+    return catalog
+
+
+if __name__ == "__main__":
+    catalog = load_catalog()
+    source = f"fetched {(time.time() - catalog.fetched_at) / 60:.0f} min ago" if catalog.fetched_at else "fixture"
+    print(f"{len(catalog.models)} models in {', '.join(catalog.regions)} ({source})")
+    for region, error in catalog.errors.items():
+        print(f"  {region}: {error}")
+    print("Providers:", ", ".join(catalog.providers()))
+    model = catalog.pick(provider="Anthropic", output_modality="TEXT", streaming=True, inference_type="ON_DEMAND")
+    print("Default streaming chat model:", model["modelId"] if model else None)
@@ -0,0 +1,152 @@
+# Token-budgeted conversation history for LangChain chat models.
+#
+# Sending the whole conversation on every turn makes input tokens and
+# latency grow linearly until the context limit is hit. TokenBudgetHistory
+# keeps the system message pinned, always keeps the most recent turns and,
+# when the history goes over budget, folds the oldest turns into a running
+# summary (or drops them when no summarizer model is given). When the kept
+# turns alone are over budget, their oldest messages are shortened. Every
+# request stays under max_tokens, so long sessions keep a flat cost per
+# turn; only a system prompt and newest message that are over budget by
+# themselves are sent as they are.
+#
+# Token counts are estimated from characters and calibrated against the
+# input token counts the model reports after each turn.
+#
+# Usage:
+#   history = TokenBudgetHistory("You are helpful.", max_tokens=2000, summarizer=llm)
+#   history.add_user("Hi")
+#   reply = llm.invoke(history.messages())
+#   history.add_ai(reply)
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+# Rough characters per token for English text, before calibration
+CHARS_PER_TOKEN = 4.0
+
+# Appended to a kept message that was shortened to fit the budget
+TRUNCATION_MARK = " [...]"
+
+SUMMARY_PROMPT = """Update the running summary of a conversation with the new exchanges below.
+Keep names, facts, decisions and open questions. Reply with the summary only, under {words} words.
+
+Current summary:
+{summary}
+
+New exchanges:
+{exchanges}"""
+
+
+class TokenBudgetHistory:
+    """Conversation history that stays under a token budget."""
+    
+    def __init__(self, system_prompt: str, max_tokens: int = 2000, keep_recent_turns: int = 2,
+                 summarizer=None, summary_words: int = 150):
+        """
+        Initialize the history.
+        
+        Args:
+            system_prompt: Pinned system message
+            max_tokens: Budget for the messages sent to the model
+            keep_recent_turns: Turns (user + assistant) never trimmed
+            summarizer: Chat model used to summarize trimmed turns (None = drop them)
+            summary_words: Target length of the running summary
+        """
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.summarizer = summarizer
+        self.summary_words = summary_words
+        self.summary = ""
+        self.turns: list[list[BaseMessage]] = []
+        self.trimmed_turns = 0
+        self._chars_per_token = CHARS_PER_TOKEN
+    
+    def estimate_tokens(self, messages: list[BaseMessage]) -> int:
+        """Estimate the input tokens of a message list."""
+        # A few tokens of role/format overhead per message
+        chars = sum(len(str(message.content)) for message in messages)
+        return int(chars / self._chars_per_token) + 4 * len(messages)
+    
+    def calibrate(self, messages: list[BaseMessage], reported_input_tokens: int) -> None:
+        """
+        Adjust the estimate with the input tokens the model actually counted.
+        
+        Args:
+            messages: Messages that were sent
+            reported_input_tokens: usage_metadata["input_tokens"] of the reply
+        """
+        overhead = 4 * len(messages)
+        chars = sum(len(str(message.content)) for message in messages)
+        if reported_input_tokens > overhead and chars:
+            observed = chars / (reported_input_tokens - overhead)
+            # Smooth so one unusual message does not swing the budget
+            self._chars_per_token = 0.7 * self._chars_per_token + 0.3 * observed
+    
+    def _system_message(self) -> SystemMessage:
+        if not self.summary:
+            return SystemMessage(content=self.system_prompt)
+        return SystemMessage(content=f"{self.system_prompt}\n\nSummary of the earlier conversation:\n{self.summary}")
+    
+    def messages(self) -> list[BaseMessage]:
+        """Messages to send: pinned system message, then the kept turns."""
+        return [self._system_message()] + [message for turn in self.turns for message in turn]
+    
+    def add_user(self, content: str) -> None:
+        """Start a new turn with a user message, trimming if over budget."""
+        self.turns.append([HumanMessage(content=content)])
+        self._enforce_budget()
+    
+    def add_ai(self, message: AIMessage | str | None) -> None:
+        """Finish the current turn with the assistant's reply."""
+        if message is None:
+            # A stream that yielded no chunks: keep the turn complete
+            message = ""
+        if isinstance(message, str):
+            message = AIMessage(content=message)
+        # Keep only the content: metadata is not sent back to the model
+        self.turns[-1].append(AIMessage(content=message.content))
+    
+    def _enforce_budget(self) -> None:
+        """Fold the oldest turns into the summary, then shorten kept ones, until the history fits."""
+        while (
+            self.estimate_tokens(self.messages()) > self.max_tokens
+            and len(self.turns) > self.keep_recent_turns
+        ):
+            # Trim in blocks of several turns so the prompt prefix changes rarely
+            count = max(1, (len(self.turns) - self.keep_recent_turns) // 2)
+            old, self.turns = self.turns[:count], self.turns[count:]
+            self.trimmed_turns += len(old)
+            if self.summarizer is not None:
+                self._summarize(old)
+        
+        # The kept turns can be over budget by themselves: shorten their
+        # messages oldest first, never the newest one
+        kept = [message for turn in self.turns for message in turn][:-1]
+        for message in kept:
+            excess = self.estimate_tokens(self.messages()) - self.max_tokens
+            if excess <= 0:
+                break
+            content = str(message.content)
+            cut = int(excess * self._chars_per_token) + 1 + len(TRUNCATION_MARK)
+            message.content = content[:max(0, len(content) - cut)] + TRUNCATION_MARK
+    
+    def _summarize(self, turns: list[list[BaseMessage]]) -> None:
+        exchanges = "\n".join(
+            f"{'User' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}"
+            for turn in turns for message in turn
+        )
+        prompt = SUMMARY_PROMPT.format(
+            words=self.summary_words, summary=self.summary or "(none)", exchanges=exchanges
+        )
+        self.summary = str(self.summarizer.invoke(prompt).content).strip()
+    
+    def stats(self) -> dict:
+        """Current size of the history."""
+        return {
+            "turns_kept": len(self.turns),
+            "turns_trimmed": self.trimmed_turns,
+            "estimated_tokens": self.estimate_tokens(self.messages()),
+            "max_tokens": self.max_tokens,
+            "has_summary": bool(self.summary),
+        }
@@ -0,0 +1,31 @@
+# The Bedrock usage ledger for the helper scripts.
+#
+# The ledger itself lives with the Bedrock runtime scripts in
+# "aws ( core )/python/usage_ledger.py"; this module loads that file, so
+# helpers record into the same SQLite ledger:
+#
+#   from usage_ledger import ledger_callback
+#   llm = ChatBedrock(model_id=..., callbacks=[ledger_callback()])
+#
+# Summarize with: python "aws ( core )/python/usage_ledger.py" --by session
+
+import importlib.util
+import sys
+from pathlib import Path
+
+SOURCE = Path(__file__).resolve().parent.parent / "aws ( core )" / "python" / "usage_ledger.py"
+
+# Loaded by path: adding that directory to sys.path would let its other
+# scripts shadow modules of the same name
+_spec = importlib.util.spec_from_file_location("_aws_usage_ledger", SOURCE)
+_ledger = sys.modules.setdefault(_spec.name, importlib.util.module_from_spec(_spec))
+if not hasattr(_ledger, "ledger_callback"):
+    _spec.loader.exec_module(_ledger)
+
+UsageLedger = _ledger.UsageLedger
+get_ledger = _ledger.get_ledger
+get_session = _ledger.get_session
+set_session = _ledger.set_session
+ledger_callback = _ledger.ledger_callback
+record_error = _ledger.record_error
+record_response = _ledger.record_response
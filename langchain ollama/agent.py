@@ -3,27 +3,61 @@ Main agent logic for the Light Novel AI Agent.
 Implements RAG-based question answering with tool usage.
 """
 
-from langchain_ollama import ChatOllama
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+import asyncio
+import time
+from typing import AsyncIterator
 
-from config import (
-    OLLAMA_BASE_URL, LLM_MODEL, LLM_TEMPERATURE,
-    LLM_NUM_CTX, AGENT_VERBOSE,
-)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import HumanMessage, AIMessage
+
+from backends import get_chat_model
+from config import AGENT_VERBOSE
 from tools import get_tools
 from memory import ConversationMemory, get_session_memory
-from prompting import AGENT_SYSTEM_PROMPT
-from retriever import retrieve_with_context
+from metrics import counter, histogram, track_llm_call, record_llm_tokens
+from profiling import span, turn, record_llm_response
+from prompting import AGENT_SYSTEM_PROMPT, PrefixTracker, build_chat_messages
+from retriever import retrieve_with_context, aretrieve_with_context
+
+
+AGENT_TURNS = counter("rag_agent_turns_total", "Completed agent turns", ("mode",))
+TIME_TO_FIRST_TOKEN = histogram(
+    "rag_llm_time_to_first_token_seconds", "Time to the first streamed chunk", ("call",)
+)
+
+
+def get_llm() -> BaseChatModel:
+    """Initialize and return the chat model of the configured LLM backend."""
+    return get_chat_model()
+
+
+def _observe_prefix(tracker: PrefixTracker | None, llm_span, messages) -> None:
+    """Record prompt prefix reuse on the tracker and the LLM span."""
+    if tracker is None:
+        return
+    stats = tracker.observe(messages)
+    if llm_span is not None:
+        llm_span.set(**stats)
+
+
+def invoke_llm(llm, messages, call: str, tracker: PrefixTracker | None = None):
+    """Invoke an LLM inside a profiling span tagged with the call's purpose."""
+    with span("llm", call=call) as llm_span, track_llm_call(call):
+        _observe_prefix(tracker, llm_span, messages)
+        response = llm.invoke(messages)
+        record_llm_response(llm_span, response)
+    record_llm_tokens(response)
+    return response
 
 
-def get_llm() -> ChatOllama:
-    """Initialize and return the Ollama LLM."""
-    return ChatOllama(
-        base_url=OLLAMA_BASE_URL,
-        model=LLM_MODEL,
-        temperature=LLM_TEMPERATURE,
-        num_ctx=LLM_NUM_CTX,
-    )
+async def ainvoke_llm(llm, messages, call: str, tracker: PrefixTracker | None = None):
+    """Async counterpart of invoke_llm."""
+    with span("llm", call=call) as llm_span, track_llm_call(call):
+        _observe_prefix(tracker, llm_span, messages)
+        response = await llm.ainvoke(messages)
+        record_llm_response(llm_span, response)
+    record_llm_tokens(response)
+    return response
 
 
 class LightNovelAgent:
@@ -33,56 +67,169 @@ class LightNovelAgent:
         self.session_id = session_id
         self.llm = get_llm()
         self.tools = get_tools()
+        self.tools_by_name = {tool.name: tool for tool in self.tools}
         self.llm_with_tools = self.llm.bind_tools(self.tools)
         self.memory = get_session_memory(session_id)
+        self.prefix_tracker = PrefixTracker()
     
-    def chat(self, message: str) -> str:
-        """Send a message and get a response."""
-        # Build messages with history
-        messages = [SystemMessage(content=AGENT_SYSTEM_PROMPT)]
-        messages.extend(self.memory.get_messages())
-        messages.append(HumanMessage(content=message))
-        
-        # Get response (may include tool calls)
-        response = self.llm_with_tools.invoke(messages)
+    def _build_messages(self, message: str, context: str | None = None) -> list:
+        """Build the message list: system prompt, history, then the new message."""
+        return build_chat_messages(AGENT_SYSTEM_PROMPT, self.memory.get_messages(), message, context)
+    
+    @staticmethod
+    def _followup_message(tool_results: list[str]) -> HumanMessage:
+        """Wrap tool results into the follow-up message for the final answer."""
+        context = "\n\n".join(tool_results)
+        followup = f"Based on the retrieved information:\n{context}\n\nProvide a helpful answer."
+        return HumanMessage(content=followup)
+    
+    def _remember(self, message: str, answer: str) -> None:
+        """Record a completed exchange in memory."""
+        self.memory.add_user_message(message)
+        self.memory.add_ai_message(answer)
+        AGENT_TURNS.labels(mode="agent").inc()
+    
+    def chat(self, message: str, context: str | None = None) -> str:
+        """
+        Send a message and get a response.
         
-        # Handle tool calls if present
-        if hasattr(response, 'tool_calls') and response.tool_calls:
-            tool_results = []
-            for tool_call in response.tool_calls:
-                tool_name = tool_call['name']
-                tool_args = tool_call['args']
+        Args:
+            message: The user's message
+            context: Retrieved passages to answer from; sent after the
+                history and never stored in memory
+        """
+        with turn("chat", session=self.session_id):
+            messages = self._build_messages(message, context)
+            
+            # Get response (may include tool calls)
+            response = invoke_llm(self.llm_with_tools, messages, "tool_selection", self.prefix_tracker)
+            
+            # Handle tool calls if present
+            if hasattr(response, 'tool_calls') and response.tool_calls:
+                tool_results = []
+                for tool_call in response.tool_calls:
+                    tool = self.tools_by_name.get(tool_call['name'])
+                    if tool is not None:
+                        with span("tool", name=tool.name):
+                            result = tool.invoke(tool_call['args'])
+                        tool_results.append(f"[{tool.name}]: {result}")
                 
-                # Find and execute the tool
-                for tool in self.tools:
-                    if tool.name == tool_name:
-                        result = tool.invoke(tool_args)
-                        tool_results.append(f"[{tool_name}]: {result}")
-                        break
+                # Get final response with tool results
+                messages.append(response)
+                messages.append(self._followup_message(tool_results))
+                final_response = invoke_llm(self.llm, messages, "answer", self.prefix_tracker)
+                answer = final_response.content
+            else:
+                answer = response.content
             
-            # Get final response with tool results
-            context = "\n\n".join(tool_results)
-            followup = f"Based on the retrieved information:\n{context}\n\nProvide a helpful answer."
-            messages.append(response)
-            messages.append(HumanMessage(content=followup))
-            final_response = self.llm.invoke(messages)
-            answer = final_response.content
-        else:
-            answer = response.content
+            self._remember(message, answer)
+            return answer
+    
+    async def _arun_tools(self, tool_calls: list[dict]) -> list[str]:
+        """Run the requested tools concurrently and label their results."""
+        calls = [
+            (self.tools_by_name[tool_call['name']], tool_call['args'])
+            for tool_call in tool_calls
+            if tool_call['name'] in self.tools_by_name
+        ]
+        async def run(tool, args):
+            with span("tool", name=tool.name):
+                return await tool.ainvoke(args)
         
-        # Update memory
-        self.memory.add_user_message(message)
-        self.memory.add_ai_message(answer)
+        results = await asyncio.gather(
+            *(run(tool, args) for tool, args in calls)
+        )
+        return [
+            f"[{tool.name}]: {result}"
+            for (tool, _), result in zip(calls, results)
+        ]
+    
+    async def achat(self, message: str, context: str | None = None) -> str:
+        """Send a message and get a response without blocking the event loop."""
+        with turn("chat", session=self.session_id):
+            messages = self._build_messages(message, context)
+            
+            # Get response (may include tool calls)
+            response = await ainvoke_llm(self.llm_with_tools, messages, "tool_selection", self.prefix_tracker)
+            
+            # Handle tool calls if present
+            if hasattr(response, 'tool_calls') and response.tool_calls:
+                tool_results = await self._arun_tools(response.tool_calls)
+                
+                # Get final response with tool results
+                messages.append(response)
+                messages.append(self._followup_message(tool_results))
+                final_response = await ainvoke_llm(self.llm, messages, "answer", self.prefix_tracker)
+                answer = final_response.content
+            else:
+                answer = response.content
+            
+            self._remember(message, answer)
+            return answer
+    
+    async def _astream_llm(self, llm, messages, call: str, sink: list) -> AsyncIterator:
+        """
+        Stream an LLM call inside a profiling span.
         
-        return answer
+        Yields chunks as they arrive and appends the merged response to
+        ``sink`` once the stream ends.
+        """
+        with span("llm", call=call, streamed=True) as llm_span, track_llm_call(call):
+            _observe_prefix(self.prefix_tracker, llm_span, messages)
+            start = time.perf_counter()
+            response = None
+            async for chunk in llm.astream(messages):
+                if response is None:
+                    ttft = time.perf_counter() - start
+                    TIME_TO_FIRST_TOKEN.labels(call=call).observe(ttft)
+                    if llm_span is not None:
+                        llm_span.set(ttft_ms=round(ttft * 1000, 2))
+                response = chunk if response is None else response + chunk
+                yield chunk
+            record_llm_response(llm_span, response)
+        record_llm_tokens(response)
+        sink.append(response)
+    
+    async def astream_chat(self, message: str, context: str | None = None) -> AsyncIterator[str]:
+        """Send a message and yield the response text as it is generated."""
+        with turn("chat", session=self.session_id, streamed=True):
+            messages = self._build_messages(message, context)
+            
+            # Stream the first response; tool calls arrive on the final chunk
+            merged = []
+            answer = ""
+            async for chunk in self._astream_llm(self.llm_with_tools, messages, "tool_selection", merged):
+                if chunk.content:
+                    answer += chunk.content
+                    yield chunk.content
+            response = merged[0] if merged else None
+            
+            if response is not None and response.tool_calls:
+                tool_results = await self._arun_tools(response.tool_calls)
+                messages.append(response)
+                messages.append(self._followup_message(tool_results))
+                
+                answer = ""
+                async for chunk in self._astream_llm(self.llm, messages, "answer", []):
+                    if chunk.content:
+                        answer += chunk.content
+                        yield chunk.content
+            
+            self._remember(message, answer)
     
     def ask(self, question: str, use_rag: bool = True) -> str:
         """Ask a question with optional RAG context."""
-        if use_rag:
-            context = retrieve_with_context(question)
-            enhanced = f"Context:\n{context}\n\nQuestion: {question}"
-            return self.chat(enhanced)
-        return self.chat(question)
+        with turn("ask", rag=use_rag):
+            if use_rag:
+                return self.chat(question, context=retrieve_with_context(question))
+            return self.chat(question)
+    
+    async def aask(self, question: str, use_rag: bool = True) -> str:
+        """Ask a question with optional RAG context without blocking the event loop."""
+        with turn("ask", rag=use_rag):
+            if use_rag:
+                return await self.achat(question, context=await aretrieve_with_context(question))
+            return await self.achat(question)
     
     def clear_history(self) -> None:
         self.memory.clear()
@@ -91,31 +238,35 @@ class LightNovelAgent:
 class SimpleRAGChain:
     """A simpler RAG chain without tool complexity."""
     
-    def __init__(self):
+    def __init__(self, session_id: str | None = None):
         self.llm = get_llm()
-        self.memory = ConversationMemory()
+        # Shared session memory when a session is given, private otherwise
+        self.memory = get_session_memory(session_id) if session_id else ConversationMemory()
+        self.prefix_tracker = PrefixTracker()
+    
+    def _build_messages(self, question: str, context: str) -> list:
+        """Build the prompt: system prompt, history, then context and question."""
+        return build_chat_messages(AGENT_SYSTEM_PROMPT, self.memory.get_messages(), question, context)
     
     def query(self, question: str) -> str:
         """Query with RAG context."""
-        context = retrieve_with_context(question)
-        history = self.memory.get_formatted_history()
-        
-        prompt = f"""{AGENT_SYSTEM_PROMPT}
-
-Context from Light Novels:
-{context}
-
-Conversation History:
-{history}
-
-User Question: {question}
-
-Please provide a helpful answer based on the context above."""
-        
-        response = self.llm.invoke(prompt)
-        self.memory.add_user_message(question)
-        self.memory.add_ai_message(response.content)
-        return response.content
+        with turn("query"):
+            context = retrieve_with_context(question)
+            response = invoke_llm(self.llm, self._build_messages(question, context), "answer", self.prefix_tracker)
+            self.memory.add_user_message(question)
+            self.memory.add_ai_message(response.content)
+            AGENT_TURNS.labels(mode="simple").inc()
+            return response.content
+    
+    async def aquery(self, question: str) -> str:
+        """Query with RAG context without blocking the event loop."""
+        with turn("query"):
+            context = await aretrieve_with_context(question)
+            response = await ainvoke_llm(self.llm, self._build_messages(question, context), "answer", self.prefix_tracker)
+            self.memory.add_user_message(question)
+            self.memory.add_ai_message(response.content)
+            AGENT_TURNS.labels(mode="simple").inc()
+            return response.content
     
     def clear_history(self) -> None:
         self.memory.clear()
@@ -0,0 +1,244 @@
+"""
+Model backends for the Light Novel AI Agent.
+Builds chat and embedding models for Ollama or Amazon Bedrock.
+
+A backend knows how to create a LangChain chat model and embedding model
+with its own connection handling: Ollama models keep their httpx pools
+plus num_ctx/keep_alive, Bedrock models share one pooled boto3 client
+with adaptive retries. The RAG pipeline asks for models through
+get_chat_model() and get_embeddings() and never names a provider, so
+LLM_BACKEND and EMBEDDING_BACKEND in config.py can move generation to
+Bedrock while embeddings stay local (or the reverse).
+
+Usage:
+    python backends.py            # List backends and the configured selection
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from config import (
+    LLM_BACKEND,
+    EMBEDDING_BACKEND,
+    OLLAMA_BASE_URL,
+    LLM_MODEL,
+    LLM_TEMPERATURE,
+    LLM_NUM_CTX,
+    EMBEDDING_MODEL,
+    OLLAMA_KEEP_ALIVE,
+    BEDROCK_REGION,
+    BEDROCK_ENDPOINT_URL,
+    BEDROCK_LLM_MODEL,
+    BEDROCK_MAX_TOKENS,
+    BEDROCK_MAX_POOL_CONNECTIONS,
+    BEDROCK_READ_TIMEOUT,
+    BEDROCK_EMBED_CONCURRENCY,
+    USAGE_LEDGER_MODULE,
+)
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models import BaseChatModel
+
+
+class Backend(ABC):
+    """A provider of chat and embedding models."""
+    
+    name = "base"
+    
+    @abstractmethod
+    def chat_model(self, temperature: float = LLM_TEMPERATURE) -> BaseChatModel:
+        """
+        Build a chat model.
+        
+        Args:
+            temperature: Sampling temperature
+        
+        Returns:
+            LangChain chat model supporting invoke, stream and bind_tools
+        """
+    
+    @abstractmethod
+    def embedding_model(self) -> Embeddings:
+        """Build an embedding model."""
+
+
+class OllamaBackend(Backend):
+    """Local models served by Ollama."""
+    
+    name = "ollama"
+    
+    def chat_model(self, temperature: float = LLM_TEMPERATURE) -> BaseChatModel:
+        from langchain_ollama import ChatOllama
+        
+        return ChatOllama(
+            base_url=OLLAMA_BASE_URL,
+            model=LLM_MODEL,
+            temperature=temperature,
+            # Every caller uses the same num_ctx: a different one makes Ollama reload the model
+            num_ctx=LLM_NUM_CTX,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+        )
+    
+    def embedding_model(self) -> Embeddings:
+        from langchain_ollama import OllamaEmbeddings
+        
+        return OllamaEmbeddings(
+            base_url=OLLAMA_BASE_URL,
+            model=EMBEDDING_MODEL,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+        )
+
+
+class BedrockBackend(Backend):
+    """Claude through the Converse API and Titan Text Embeddings V2."""
+    
+    name = "bedrock"
+    
+    def chat_model(self, temperature: float = LLM_TEMPERATURE) -> BaseChatModel:
+        from langchain_aws import ChatBedrockConverse
+        
+        # Converse gives streaming, tool calling and usage metadata for every model
+        ledger = get_usage_ledger()
+        return ChatBedrockConverse(
+            client=get_bedrock_client(),
+            model=BEDROCK_LLM_MODEL,
+            region_name=BEDROCK_REGION,
+            temperature=temperature,
+            max_tokens=BEDROCK_MAX_TOKENS,
+            callbacks=[ledger.ledger_callback()] if ledger is not None else None,
+        )
+    
+    def embedding_model(self) -> Embeddings:
+        from titan_embeddings import TitanEmbeddings
+        
+        return TitanEmbeddings()
+
+
+@lru_cache(maxsize=1)
+def get_bedrock_client():
+    """
+    Return the shared Bedrock Runtime client.
+    
+    boto3 clients are thread-safe, so chat models and embedding workers
+    share one client and its connection pool. Adaptive retry mode rate
+    limits client-side when the account is throttled.
+    """
+    import boto3
+    from botocore.config import Config
+    
+    config = Config(
+        region_name=BEDROCK_REGION,
+        max_pool_connections=max(BEDROCK_MAX_POOL_CONNECTIONS, BEDROCK_EMBED_CONCURRENCY),
+        retries={"mode": "adaptive", "max_attempts": 8},
+        connect_timeout=5,
+        read_timeout=BEDROCK_READ_TIMEOUT,
+        tcp_keepalive=True,
+    )
+    return boto3.session.Session().client(
+        "bedrock-runtime", config=config, endpoint_url=BEDROCK_ENDPOINT_URL
+    )
+
+
+@lru_cache(maxsize=1)
+def get_usage_ledger():
+    """
+    Load the Bedrock usage ledger (aws ( core )/python/usage_ledger.py).
+    
+    The module is loaded from its file rather than through sys.path, so
+    the other scripts in that directory cannot shadow modules of this
+    package (it has an embedding.py too).
+    
+    Returns:
+        The usage_ledger module, or None if the file is missing
+    """
+    if not USAGE_LEDGER_MODULE.exists():
+        return None
+    
+    import importlib.util
+    import sys
+    
+    if "usage_ledger" not in sys.modules:
+        spec = importlib.util.spec_from_file_location("usage_ledger", USAGE_LEDGER_MODULE)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules["usage_ledger"] = module
+    return sys.modules["usage_ledger"]
+
+
+# =============================================================================
+# REGISTRY
+# =============================================================================
+
+_backends: dict[str, Backend] = {}
+
+
+def register_backend(backend: Backend) -> None:
+    """
+    Make a backend selectable by name.
+    
+    Args:
+        backend: Backend instance (replaces one with the same name)
+    """
+    _backends[backend.name] = backend
+
+
+def get_backend(name: str) -> Backend:
+    """
+    Look up a registered backend.
+    
+    Args:
+        name: Backend name, e.g. "ollama" or "bedrock"
+    
+    Returns:
+        The backend
+    """
+    try:
+        return _backends[name]
+    except KeyError:
+        raise ValueError(f"Unknown backend {name!r} (available: {', '.join(sorted(_backends))})") from None
+
+
+def list_backends() -> list[str]:
+    """Return the names of the registered backends."""
+    return sorted(_backends)
+
+
+def get_chat_model(temperature: float = LLM_TEMPERATURE, backend: str | None = None) -> BaseChatModel:
+    """
+    Build a chat model from the configured LLM backend.
+    
+    Args:
+        temperature: Sampling temperature
+        backend: Backend name (default LLM_BACKEND)
+    
+    Returns:
+        LangChain chat model
+    """
+    return get_backend(backend or LLM_BACKEND).chat_model(temperature)
+
+
+def get_embeddings(backend: str | None = None) -> Embeddings:
+    """
+    Build an embedding model from the configured embedding backend.
+    
+    Args:
+        backend: Backend name (default EMBEDDING_BACKEND)
+    
+    Returns:
+        LangChain embeddings
+    """
+    return get_backend(backend or EMBEDDING_BACKEND).embedding_model()
+
+
+register_backend(OllamaBackend())
+register_backend(BedrockBackend())
+
+
+if __name__ == "__main__":
+    print(f"Backends: {', '.join(list_backends())}")
+    print(f"Chat:       {LLM_BACKEND}")
+    print(f"Embeddings: {EMBEDDING_BACKEND}")
@@ -0,0 +1,294 @@
+"""
+Batch question answering over a JSONL file of questions.
+
+Each input line is ``{"id": ..., "question": ...}`` (the id defaults to
+the line number) or a bare JSON string. Questions are answered
+independently, without conversation history, so every prompt shares the
+same system prompt prefix.
+
+Questions are retrieved in groups of ``retrieval_size``: their query
+embeddings go to the model as batched requests. LLM generations run
+with at most ``concurrency`` in flight while the next group is being
+retrieved. Every answer is appended to the output JSONL as soon as it
+is ready, with its sources, timings and token counts. Running the same
+command again after a crash skips the questions already answered and
+retries the ones that failed.
+"""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from config import BATCH_CONCURRENCY, BATCH_RETRIEVAL_SIZE, EMBED_BATCH_WAIT_MS, RETRIEVER_K
+from agent import get_llm, ainvoke_llm
+from embedding import enable_query_batching, disable_query_batching
+from metrics import counter
+from prompting import AGENT_SYSTEM_PROMPT, build_chat_messages, format_context
+from retriever import aretrieve_documents
+
+BATCH_QUESTIONS = counter("rag_batch_questions_total", "Batch questions answered", ("status",))
+
+
+def default_output_path(questions_path: str | Path) -> Path:
+    """Answers file next to the questions file: questions.answers.jsonl."""
+    questions_path = Path(questions_path)
+    return questions_path.with_name(f"{questions_path.stem}.answers.jsonl")
+
+
+def load_questions(path: str | Path) -> list[dict]:
+    """
+    Read questions from a JSONL file.
+    
+    Args:
+        path: File with one question per line
+    
+    Returns:
+        List of {"id", "question"} dicts, in file order; a line that is
+        not valid JSON or has no question gives {"id", "error"} instead
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                questions.append({"id": str(line_number), "error": f"invalid JSON: {e}"})
+                continue
+            if isinstance(item, str):
+                item = {"question": item}
+            if not isinstance(item, dict):
+                questions.append({"id": str(line_number), "error": "expected an object or a string"})
+                continue
+            
+            question_id = str(item.get("id", line_number))
+            if not isinstance(item.get("question"), str) or not item["question"].strip():
+                questions.append({"id": question_id, "error": 'missing "question"'})
+                continue
+            questions.append({"id": question_id, "question": item["question"]})
+    return questions
+
+
+def load_completed(path: str | Path) -> set[str]:
+    """
+    Read the IDs already answered in an output file.
+    
+    A line torn by a crash mid-write is cut off, so appending resumes on
+    a clean line. Records with an "error" do not count as completed.
+    
+    Args:
+        path: Output JSONL file (may not exist)
+    
+    Returns:
+        Set of question IDs with a stored answer
+    """
+    path = Path(path)
+    if not path.exists():
+        return set()
+    
+    completed = set()
+    valid_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_bytes += len(line)
+            if "error" not in record:
+                completed.add(str(record["id"]))
+    
+    if valid_bytes < path.stat().st_size:
+        with open(path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return completed
+
+
+def _sources(documents: list) -> list[dict]:
+    """Distinct (source_file, page) pairs of the retrieved documents, in rank order."""
+    seen = {}
+    for doc in documents:
+        key = (doc.metadata.get("source_file", "Unknown"), doc.metadata.get("page"))
+        seen.setdefault(key, {"source_file": key[0], "page": key[1]})
+    return list(seen.values())
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+async def arun_batch(
+    questions_path: str | Path,
+    output_path: str | Path | None = None,
+    concurrency: int = BATCH_CONCURRENCY,
+    retrieval_size: int = BATCH_RETRIEVAL_SIZE,
+    k: int = RETRIEVER_K,
+    verbose: bool = True,
+) -> dict:
+    """
+    Answer every question in a JSONL file, appending answers to another.
+    
+    Args:
+        questions_path: Input JSONL file
+        output_path: Output JSONL file (default: <questions>.answers.jsonl)
+        concurrency: LLM generations running at once
+        retrieval_size: Questions retrieved together
+        k: Documents retrieved per question
+        verbose: Print a line per answered question
+    
+    Returns:
+        Summary with answered, failed and skipped counts, wall time,
+        throughput and total tokens
+    """
+    output_path = Path(output_path) if output_path else default_output_path(questions_path)
+    questions = load_questions(questions_path)
+    completed = load_completed(output_path)
+    todo = [item for item in questions if item["id"] not in completed]
+    
+    summary = {
+        "output": str(output_path),
+        "questions": len(questions),
+        "skipped": len(questions) - len(todo),
+        "answered": 0,
+        "failed": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+    }
+    if not todo:
+        summary.update(wall_s=0.0, questions_per_s=0.0)
+        return summary
+    
+    llm = get_llm()
+    generation_slots = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    
+    with open(output_path, "a", encoding="utf-8") as out:
+        def write(record: dict) -> None:
+            # One complete line per record, flushed so a crash loses at most this one
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            
+            status = "error" if "error" in record else "answered"
+            BATCH_QUESTIONS.labels(status=status).inc()
+            summary["failed" if status == "error" else "answered"] += 1
+            if verbose:
+                done = summary["answered"] + summary["failed"] + summary["skipped"]
+                mark = "✗" if status == "error" else "✓"
+                print(f"{mark} [{done}/{len(questions)}] {record['id']}")
+        
+        # Malformed lines fail on their own, the rest of the file still runs
+        for item in todo:
+            if "error" in item:
+                write(item)
+        todo = [item for item in todo if "error" not in item]
+        
+        async def retrieve(item: dict) -> tuple[list, dict]:
+            timings = {}
+            documents = await aretrieve_documents(item["question"], k=k, timings=timings)
+            return documents, timings
+        
+        async def answer(item: dict, documents: list, timings: dict) -> None:
+            queued_at = time.perf_counter()
+            try:
+                async with generation_slots:
+                    started_at = time.perf_counter()
+                    messages = build_chat_messages(
+                        AGENT_SYSTEM_PROMPT, [], item["question"], format_context(documents)
+                    )
+                    response = await ainvoke_llm(llm, messages, "batch")
+            except Exception as e:
+                write({**item, "error": str(e)})
+                return
+            finished_at = time.perf_counter()
+            
+            usage = getattr(response, "usage_metadata", None) or {}
+            summary["input_tokens"] += usage.get("input_tokens", 0)
+            summary["output_tokens"] += usage.get("output_tokens", 0)
+            write({
+                **item,
+                "answer": response.content,
+                "sources": _sources(documents),
+                "timings": {
+                    "embed_ms": _ms(timings["embed_s"]),
+                    "search_ms": _ms(timings["search_s"]),
+                    "queue_ms": _ms(started_at - queued_at),
+                    "llm_ms": _ms(finished_at - started_at),
+                },
+                "tokens": {
+                    "input": usage.get("input_tokens"),
+                    "output": usage.get("output_tokens"),
+                },
+            })
+        
+        # Concurrent query embeddings of a group go out as batched requests
+        enable_query_batching(retrieval_size, EMBED_BATCH_WAIT_MS)
+        pending: set[asyncio.Task] = set()
+        try:
+            for offset in range(0, len(todo), retrieval_size):
+                group = todo[offset:offset + retrieval_size]
+                retrieved = await asyncio.gather(*(retrieve(item) for item in group), return_exceptions=True)
+                
+                for item, result in zip(group, retrieved):
+                    if isinstance(result, Exception):
+                        write({**item, "error": f"retrieval failed: {result}"})
+                    else:
+                        pending.add(asyncio.create_task(answer(item, *result)))
+                
+                # Retrieve ahead by at most one group of queued generations
+                while len(pending) > max(retrieval_size, concurrency):
+                    _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            
+            if pending:
+                await asyncio.wait(pending)
+        finally:
+            for task in pending:
+                task.cancel()
+            disable_query_batching()
+    
+    wall_s = time.perf_counter() - start
+    processed = summary["answered"] + summary["failed"]
+    summary.update(wall_s=round(wall_s, 2), questions_per_s=round(processed / wall_s, 2))
+    return summary
+
+
+def run_batch(
+    questions_path: str | Path,
+    output_path: str | Path | None = None,
+    concurrency: int = BATCH_CONCURRENCY,
+    retrieval_size: int = BATCH_RETRIEVAL_SIZE,
+    k: int = RETRIEVER_K,
+    verbose: bool = True,
+) -> dict:
+    """Synchronous wrapper around arun_batch."""
+    return asyncio.run(arun_batch(questions_path, output_path, concurrency, retrieval_size, k, verbose))
+
+
+def print_summary(summary: dict) -> None:
+    """Print a batch summary."""
+    print(f"\n📦 Batch finished: {summary['output']}")
+    print(f"   Answered: {summary['answered']}, failed: {summary['failed']}, "
+          f"already done: {summary['skipped']} of {summary['questions']}")
+    print(f"   Wall time: {summary['wall_s']}s ({summary['questions_per_s']} questions/s)")
+    print(f"   Tokens: {summary['input_tokens']} in, {summary['output_tokens']} out")
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions")
+    parser.add_argument("questions", help="input JSONL, one question per line")
+    parser.add_argument("-o", "--output", help="output JSONL (default: <questions>.answers.jsonl)")
+    parser.add_argument("-c", "--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--retrieval-size", type=int, default=BATCH_RETRIEVAL_SIZE)
+    parser.add_argument("-k", type=int, default=RETRIEVER_K)
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args()
+    
+    print_summary(run_batch(
+        args.questions, args.output, args.concurrency, args.retrieval_size, args.k, not args.quiet
+    ))
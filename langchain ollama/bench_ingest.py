@@ -0,0 +1,363 @@
+"""
+Ingestion benchmark for the Light Novel AI Agent.
+Measures the ingest pipeline stage by stage.
+
+For every stage (load, split, dedup, embed, store) the benchmark records
+wall time, CPU time and throughput (and with --trace-memory the peak
+Python memory the stage allocated), writes the results as JSON and
+compares them against a stored baseline to flag regressions. The
+report's peak_rss_mb is the peak of the whole process.
+
+The benchmark runs against a throwaway Chroma directory and registry, and
+by default against the bundled fake Ollama server, so it never touches
+the real index and needs no network.
+
+Usage:
+    python bench_ingest.py                          # Synthetic corpus, fake Ollama
+    python bench_ingest.py --corpus .pdfs           # Real volumes
+    python bench_ingest.py --ollama-url http://localhost:11434
+    python bench_ingest.py --save-baseline          # Store results as the baseline
+    python bench_ingest.py --baseline other.json    # Compare against a given file
+    python bench_ingest.py --trace-memory           # Also measure memory per stage
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Stage -> result key whose count is the number of items the stage processed
+STAGE_ITEMS = {
+    "load": "pages",
+    "split": "pages",
+    "dedup": "chunks_before_dedup",
+    "embed": "chunks",
+    "store": "chunks",
+}
+
+FILLER_VOCABULARY = (
+    "the a she he they said looked at room school morning evening train home "
+    "mother father brother sister quiet smile glance shelf book music cafe "
+    "rain window street study exam part-time job memory distance family "
+    "together alone perhaps maybe really never always because although "
+    "moment feeling question answer silence dinner breakfast phone message"
+).split()
+
+_FRONT_MATTER = (
+    "Copyright (c) Example Press. All rights reserved. No part of this book "
+    "may be reproduced in any form without written permission from the "
+    "publisher. Cover art and illustrations by Example Artist. Translation "
+    "by Example Translator. Table of contents: Prologue, Chapter 1, Chapter 2, "
+    "Chapter 3, Chapter 4, Epilogue, Afterword."
+)
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process in megabytes, if available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def free_port() -> int:
+    """Find a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_stage_profiler():
+    """
+    Create a StageTimings subclass that also records CPU time and memory.
+    
+    Memory is the peak Python allocation above the stage's starting
+    point, measured with tracemalloc when it is tracing (None otherwise).
+    RSS cannot be split by stage: ru_maxrss only ever grows.
+    
+    Imported lazily so the environment overrides in run_benchmark are in
+    place before config is first imported.
+    """
+    from ingest import StageTimings
+    
+    class StageProfiler(StageTimings):
+        @contextmanager
+        def stage(self, name: str):
+            tracing = tracemalloc.is_tracing()
+            if tracing:
+                alloc_start = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            try:
+                yield
+            finally:
+                wall_s = time.perf_counter() - wall_start
+                cpu_s = time.process_time() - cpu_start
+                peak_alloc = None
+                if tracing:
+                    peak_alloc = (tracemalloc.get_traced_memory()[1] - alloc_start) / (1024 * 1024)
+                # Stages entered once per batch accumulate; memory keeps the highest peak
+                previous = self.stages.get(name, {})
+                if previous.get("peak_alloc_mb") is not None:
+                    peak_alloc = max(peak_alloc, previous["peak_alloc_mb"])
+                self.stages[name] = {
+                    "wall_s": previous.get("wall_s", 0.0) + wall_s,
+                    "cpu_s": previous.get("cpu_s", 0.0) + cpu_s,
+                    "peak_alloc_mb": peak_alloc,
+                }
+    
+    return StageProfiler
+
+
+def generate_corpus(directory: Path, volumes: int, words_per_volume: int, seed: int) -> list[Path]:
+    """
+    Write a deterministic synthetic corpus of text volumes.
+    
+    Every volume starts with the same front matter so deduplication has
+    realistic work to do.
+    
+    Args:
+        directory: Where to write the volumes
+        volumes: Number of volumes
+        words_per_volume: Approximate length of each volume
+        seed: Random seed
+    
+    Returns:
+        Paths of the generated files
+    """
+    rng = random.Random(seed)
+    paths = []
+    for number in range(1, volumes + 1):
+        paragraphs = [_FRONT_MATTER]
+        written = 0
+        while written < words_per_volume:
+            length = rng.randint(40, 120)
+            sentence_words = [rng.choice(FILLER_VOCABULARY) for _ in range(length)]
+            paragraphs.append(" ".join(sentence_words).capitalize() + ".")
+            written += length
+        
+        path = directory / f"Synthetic Series vol {number}.txt"
+        path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def summarize(files: list[dict]) -> dict:
+    """
+    Aggregate per-file stage measurements into per-stage totals.
+    
+    Args:
+        files: Per-file results with "stages" and item counts
+    
+    Returns:
+        Dictionary mapping stage names to totals and throughput
+    """
+    stages = {}
+    for result in files:
+        for name, info in result["stages"].items():
+            total = stages.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "items": 0, "peak_alloc_mb": None})
+            total["wall_s"] += info["wall_s"]
+            total["cpu_s"] += info["cpu_s"]
+            total["items"] += result.get(STAGE_ITEMS.get(name, "chunks"), 0)
+            if info["peak_alloc_mb"] is not None:
+                total["peak_alloc_mb"] = max(total["peak_alloc_mb"] or 0.0, info["peak_alloc_mb"])
+    
+    for total in stages.values():
+        total["items_per_s"] = total["items"] / total["wall_s"] if total["wall_s"] else None
+        total["wall_s"] = round(total["wall_s"], 4)
+        total["cpu_s"] = round(total["cpu_s"], 4)
+        if total["peak_alloc_mb"] is not None:
+            total["peak_alloc_mb"] = round(total["peak_alloc_mb"], 3)
+    return stages
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compare stage wall times against a baseline.
+    
+    Args:
+        current: Current report
+        baseline: Baseline report
+        tolerance: Allowed relative slowdown (0.15 = 15%)
+    
+    Returns:
+        Human-readable regression messages, empty if none
+    """
+    regressions = []
+    for name, info in current["stages"].items():
+        reference = baseline.get("stages", {}).get(name)
+        if not reference or not reference.get("wall_s"):
+            continue
+        ratio = info["wall_s"] / reference["wall_s"]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"{name}: {info['wall_s']:.3f}s vs baseline {reference['wall_s']:.3f}s "
+                f"({(ratio - 1) * 100:+.0f}%)"
+            )
+    return regressions
+
+
+def prepare_environment(workdir: Path, ollama_url: str | None, embed_ms: float = 0.0):
+    """
+    Point the pipeline at a throwaway store and an Ollama endpoint.
+    
+    Must run before config is first imported, since config reads these
+    environment variables at import time.
+    
+    Args:
+        workdir: Directory for the throwaway Chroma store and registry
+        ollama_url: Real Ollama URL, or None to start the fake server
+        embed_ms: Fake embedding latency per text
+        
+    Returns:
+        The fake server (call shutdown() when done), or None
+    """
+    os.environ["CHROMA_DIR"] = str(workdir / "chroma")
+    os.environ["REGISTRY_FILE"] = str(workdir / "registry.json")
+    
+    if ollama_url:
+        os.environ["OLLAMA_BASE_URL"] = ollama_url
+        return None
+    
+    port = free_port()
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{port}"
+    
+    from fake_ollama import start_fake_ollama, FakeOllamaOptions
+    
+    fake_server, _ = start_fake_ollama(port=port, options=FakeOllamaOptions(embed_ms=embed_ms))
+    return fake_server
+
+
+def environment_info(ollama_url: str | None) -> dict:
+    """Describe the machine the benchmark ran on."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ollama": ollama_url or "fake",
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    """Run the ingest pipeline over the corpus and build the report."""
+    workdir = Path(tempfile.mkdtemp(prefix="bench_ingest_"))
+    fake_server = prepare_environment(workdir, args.ollama_url, args.embed_ms)
+    
+    if args.corpus:
+        corpus_dir = Path(args.corpus)
+        files = sorted(p for p in corpus_dir.iterdir() if p.suffix.lower() in (".pdf", ".txt", ".md"))
+        corpus = {"type": "directory", "path": str(corpus_dir)}
+    else:
+        corpus_dir = workdir / "corpus"
+        corpus_dir.mkdir()
+        files = generate_corpus(corpus_dir, args.volumes, args.words, args.seed)
+        corpus = {"type": "synthetic", "volumes": args.volumes, "words_per_volume": args.words, "seed": args.seed}
+    
+    from ingest import ingest_file
+    
+    StageProfiler = make_stage_profiler()
+    if args.trace_memory:
+        # Tracing slows allocation-heavy stages, so timings are not
+        # comparable with untraced runs
+        tracemalloc.start()
+    results = []
+    started = time.perf_counter()
+    for path in files:
+        profiler = StageProfiler()
+        result = ingest_file(path, force=True, timings=profiler)
+        if result["status"] != "success":
+            raise RuntimeError(f"Ingest failed for {path.name}: {result.get('message')}")
+        results.append({
+            "filename": result["filename"],
+            "pages": result["pages"],
+            "chunks": result["chunks"],
+            "chunks_before_dedup": result["chunks"] + result["duplicates_skipped"],
+            "stages": profiler.stages,
+        })
+    total_wall = time.perf_counter() - started
+    if args.trace_memory:
+        tracemalloc.stop()
+    
+    if fake_server is not None:
+        fake_server.shutdown()
+    
+    return {
+        "benchmark": "ingest",
+        "timestamp": datetime.now().isoformat(),
+        "environment": environment_info(args.ollama_url),
+        "corpus": corpus,
+        "trace_memory": args.trace_memory,
+        "total_wall_s": round(total_wall, 4),
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": summarize(results),
+        "files": results,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\nIngest benchmark ({len(report['files'])} files, {report['total_wall_s']:.2f}s total)")
+    print(f"{'stage':<8} {'wall s':>9} {'cpu s':>9} {'items':>8} {'items/s':>10} {'alloc MB':>9}")
+    for name, info in report["stages"].items():
+        rate = f"{info['items_per_s']:.1f}" if info["items_per_s"] else "-"
+        alloc = f"{info['peak_alloc_mb']:.1f}" if info["peak_alloc_mb"] is not None else "-"
+        print(f"{name:<8} {info['wall_s']:>9.3f} {info['cpu_s']:>9.3f} {info['items']:>8} {rate:>10} {alloc:>9}")
+    if report["peak_rss_mb"] is not None:
+        print(f"Process peak RSS: {report['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ingest pipeline")
+    parser.add_argument("--corpus", help="directory of volumes (default: synthetic corpus)")
+    parser.add_argument("--volumes", type=int, default=3, help="synthetic volumes")
+    parser.add_argument("--words", type=int, default=40000, help="words per synthetic volume")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ollama-url", help="use a real Ollama instead of the fake server")
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="fake embedding latency per text")
+    parser.add_argument("--output", help="report path (default: .bench/ingest-<timestamp>.json)")
+    parser.add_argument("--baseline", help="baseline to compare against (default: .bench/ingest_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown per stage")
+    parser.add_argument("--trace-memory", action="store_true", help="measure peak allocation per stage (slower)")
+    args = parser.parse_args()
+    
+    report = run_benchmark(args)
+    print_report(report)
+    
+    from config import BENCH_DIR
+    
+    BENCH_DIR.mkdir(exist_ok=True)
+    baseline_path = Path(args.baseline) if args.baseline else BENCH_DIR / "ingest_baseline.json"
+    output = Path(args.output) if args.output else BENCH_DIR / f"ingest-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nReport written to {output}")
+    
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Baseline saved to {baseline_path}")
+    elif baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        if baseline.get("trace_memory", False) != report["trace_memory"]:
+            print("\nNote: only one of this run and the baseline traced memory; timings may differ")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("\n⚠️  Regressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
@@ -0,0 +1,344 @@
+"""
+Retrieval quality and latency benchmark for the Light Novel AI Agent.
+Compares chunking and retriever settings on a labelled question set.
+
+Each question carries its gold volume (and optionally gold pages). For
+every combination of chunk size/overlap and retriever settings the
+benchmark indexes the corpus into its own collection, runs
+retrieve_documents for every question and reports hit@k (the share of
+questions with a relevant passage in the top k), MRR, p50/p95/p99
+latency split into embedding and search time, and the context tokens
+the retrieved passages would add to the prompt. The cheapest
+configuration that meets the quality bar is recommended.
+
+Question file (JSONL), one object per line:
+    {"question": "...", "volume": "Gimai Seikatsu vol 2.pdf", "pages": [41, 42]}
+
+Usage:
+    python bench_retrieval.py                               # Synthetic corpus and questions
+    python bench_retrieval.py --corpus .pdfs --questions questions.jsonl
+    python bench_retrieval.py --chunk-sizes 500,1000 --ks 3,5,8 --search-types similarity,mmr
+"""
+
+import argparse
+import itertools
+import json
+import random
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from bench_ingest import prepare_environment, environment_info, FILLER_VOCABULARY
+
+_CHARACTERS = ["Yuuta", "Saki", "Maru", "Narasaka", "Yomiuri", "Akiko", "Taichi", "Shiori"]
+_PLACES = ["bookstore", "library", "station", "rooftop", "cafe", "aquarium", "shrine", "beach"]
+_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday", "festival"]
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def _float_list(value: str) -> list[float]:
+    return [float(v) for v in value.split(",") if v]
+
+
+def _str_list(value: str) -> list[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def latency_summary(seconds: list[float]) -> dict:
+    """p50/p95/p99 and mean of a list of durations, in milliseconds."""
+    millis = [s * 1000 for s in seconds]
+    return {
+        "p50": percentile(millis, 50),
+        "p95": percentile(millis, 95),
+        "p99": percentile(millis, 99),
+        "mean": sum(millis) / len(millis) if millis else None,
+    }
+
+
+def generate_labelled_corpus(
+    directory: Path,
+    volumes: int,
+    facts_per_volume: int,
+    seed: int,
+) -> tuple[list[Path], list[dict]]:
+    """
+    Write synthetic volumes with planted facts and questions about them.
+    
+    Args:
+        directory: Where to write the volumes
+        volumes: Number of volumes
+        facts_per_volume: Planted facts (and questions) per volume
+        seed: Random seed
+    
+    Returns:
+        (volume paths, labelled questions)
+    """
+    rng = random.Random(seed)
+    combos = list(itertools.product(_CHARACTERS, _CHARACTERS, _PLACES, _DAYS))
+    combos = [c for c in combos if c[0] != c[1]]
+    rng.shuffle(combos)
+    
+    paths, questions = [], []
+    for number in range(1, volumes + 1):
+        filename = f"Synthetic Series vol {number}.txt"
+        paragraphs = []
+        for _ in range(facts_per_volume):
+            who, whom, place, day = combos.pop()
+            filler = " ".join(rng.choice(FILLER_VOCABULARY) for _ in range(rng.randint(80, 160)))
+            paragraphs.append(filler.capitalize() + ".")
+            paragraphs.append(f"On {day}, {who} met {whom} at the {place} and they talked for hours.")
+            questions.append({
+                "question": f"Where did {who} meet {whom} on {day}?",
+                "volume": filename,
+            })
+        
+        path = directory / filename
+        path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+        paths.append(path)
+    return paths, questions
+
+
+def load_questions(path: str | Path) -> list[dict]:
+    """
+    Load a labelled question set.
+    
+    Args:
+        path: JSONL file with question, volume and optional pages
+    
+    Returns:
+        List of question dictionaries
+    """
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                questions.append(json.loads(line))
+    return questions
+
+
+def is_relevant(doc, gold: dict, page_tolerance: int) -> bool:
+    """Check a retrieved document against a question's gold labels."""
+    if doc.metadata.get("source_file") != gold["volume"]:
+        return False
+    pages = gold.get("pages") or ([gold["page"]] if "page" in gold else [])
+    if not pages:
+        return True
+    page = doc.metadata.get("page")
+    return page is not None and any(abs(page - p) <= page_tolerance for p in pages)
+
+
+def build_collection(files: list[Path], chunk_size: int, chunk_overlap: int) -> str:
+    """
+    Index the corpus with one chunking configuration.
+    
+    Args:
+        files: Volumes to index
+        chunk_size: Chunk size in characters
+        chunk_overlap: Chunk overlap in characters
+    
+    Returns:
+        Name of the collection holding the chunks
+    """
+    from embedding import embed_documents
+    from loaders import load_document
+    from splitter import split_documents
+    from vectorstore import add_embedded_documents
+    
+    collection_name = f"bench_cs{chunk_size}_ov{chunk_overlap}"
+    for path in files:
+        chunks = split_documents(load_document(path), chunk_size, chunk_overlap)
+        vectors = embed_documents([chunk.page_content for chunk in chunks])
+        add_embedded_documents(chunks, vectors, collection_name=collection_name)
+    return collection_name
+
+
+def evaluate(questions: list[dict], config: dict, collection_name: str, page_tolerance: int) -> dict:
+    """
+    Run every question through retrieve_documents with one configuration.
+    
+    Args:
+        questions: Labelled questions
+        config: Retriever settings (k, search_type, fetch_k, lambda_mult)
+        collection_name: Collection to search
+        page_tolerance: Allowed distance from a gold page
+    
+    Returns:
+        Quality, latency and context-size metrics for the configuration
+    """
+    from prompting import estimate_tokens, format_context
+    from retriever import retrieve_documents
+    
+    hits, reciprocal_ranks = 0, 0.0
+    embed_s, search_s, total_s, context_tokens = [], [], [], []
+    
+    for gold in questions:
+        timings = {}
+        documents = retrieve_documents(
+            gold["question"],
+            k=config["k"],
+            search_type=config["search_type"],
+            fetch_k=config["fetch_k"],
+            lambda_mult=config["lambda_mult"],
+            collection_name=collection_name,
+            timings=timings,
+        )
+        embed_s.append(timings["embed_s"])
+        search_s.append(timings["search_s"])
+        total_s.append(timings["embed_s"] + timings["search_s"])
+        context_tokens.append(estimate_tokens(format_context(documents)))
+        
+        for rank, doc in enumerate(documents, 1):
+            if is_relevant(doc, gold, page_tolerance):
+                hits += 1
+                reciprocal_ranks += 1 / rank
+                break
+    
+    count = len(questions)
+    return {
+        **config,
+        "hit_at_k": hits / count if count else None,
+        "mrr": reciprocal_ranks / count if count else None,
+        "latency_ms": {
+            "total": latency_summary(total_s),
+            "embed": latency_summary(embed_s),
+            "search": latency_summary(search_s),
+        },
+        "context_tokens": {
+            "mean": sum(context_tokens) / count if count else None,
+            "max": max(context_tokens, default=None),
+        },
+    }
+
+
+def recommend(results: list[dict], min_hit_rate: float) -> dict | None:
+    """
+    Pick the cheapest configuration meeting the hit@k bar.
+    
+    Cheapest means fewest context tokens, then lowest p95 latency.
+    """
+    eligible = [r for r in results if (r["hit_at_k"] or 0) >= min_hit_rate]
+    if not eligible:
+        return None
+    return min(
+        eligible,
+        key=lambda r: (r["context_tokens"]["mean"], r["latency_ms"]["total"]["p95"]),
+    )
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    """Index the corpus per chunking config and evaluate the retriever grid."""
+    workdir = Path(tempfile.mkdtemp(prefix="bench_retrieval_"))
+    fake_server = prepare_environment(workdir, args.ollama_url)
+    
+    if args.corpus:
+        if not args.questions:
+            raise SystemExit("--questions is required with --corpus")
+        corpus_dir = Path(args.corpus)
+        files = sorted(p for p in corpus_dir.iterdir() if p.suffix.lower() in (".pdf", ".txt", ".md"))
+        questions = load_questions(args.questions)
+    else:
+        corpus_dir = workdir / "corpus"
+        corpus_dir.mkdir()
+        files, questions = generate_labelled_corpus(corpus_dir, args.volumes, args.facts, args.seed)
+        if args.questions:
+            questions = load_questions(args.questions)
+    
+    results = []
+    for chunk_size, chunk_overlap in itertools.product(args.chunk_sizes, args.overlaps):
+        if chunk_overlap >= chunk_size:
+            continue
+        print(f"Indexing with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}...")
+        collection_name = build_collection(files, chunk_size, chunk_overlap)
+        
+        for k, search_type in itertools.product(args.ks, args.search_types):
+            mmr_grid = itertools.product(args.fetch_ks, args.lambdas) if search_type == "mmr" else [(None, None)]
+            for fetch_k, lambda_mult in mmr_grid:
+                config = {
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": chunk_overlap,
+                    "k": k,
+                    "search_type": search_type,
+                    "fetch_k": fetch_k or k,
+                    "lambda_mult": lambda_mult if lambda_mult is not None else 0.5,
+                }
+                results.append(evaluate(questions, config, collection_name, args.page_tolerance))
+    
+    if fake_server is not None:
+        fake_server.shutdown()
+    
+    return {
+        "benchmark": "retrieval",
+        "timestamp": datetime.now().isoformat(),
+        "environment": environment_info(args.ollama_url),
+        "questions": len(questions),
+        "min_hit_rate": args.min_hit_rate,
+        "configs": results,
+        "recommendation": recommend(results, args.min_hit_rate),
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\nRetrieval benchmark ({report['questions']} questions)")
+    header = f"{'chunk':>6} {'ovl':>4} {'k':>3} {'type':<10} {'fetch':>5} {'λ':>4} " \
+             f"{'hit@k':>7} {'mrr':>6} {'p50ms':>7} {'p95ms':>7} {'p99ms':>7} {'ctx tok':>8}"
+    print(header)
+    for r in report["configs"]:
+        total = r["latency_ms"]["total"]
+        print(
+            f"{r['chunk_size']:>6} {r['chunk_overlap']:>4} {r['k']:>3} {r['search_type']:<10} "
+            f"{r['fetch_k']:>5} {r['lambda_mult']:>4} {r['hit_at_k']:>7.3f} {r['mrr']:>6.3f} "
+            f"{total['p50']:>7.1f} {total['p95']:>7.1f} {total['p99']:>7.1f} "
+            f"{r['context_tokens']['mean']:>8.0f}"
+        )
+    
+    best = report["recommendation"]
+    if best:
+        print(
+            f"\nRecommended: chunk_size={best['chunk_size']}, chunk_overlap={best['chunk_overlap']}, "
+            f"k={best['k']}, search_type={best['search_type']}"
+            + (f", fetch_k={best['fetch_k']}, lambda_mult={best['lambda_mult']}" if best["search_type"] == "mmr" else "")
+        )
+    else:
+        print(f"\nNo configuration reached hit@k >= {report['min_hit_rate']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency")
+    parser.add_argument("--corpus", help="directory of volumes (default: synthetic corpus)")
+    parser.add_argument("--questions", help="labelled questions (JSONL)")
+    parser.add_argument("--volumes", type=int, default=4, help="synthetic volumes")
+    parser.add_argument("--facts", type=int, default=25, help="synthetic facts per volume")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ollama-url", help="use a real Ollama instead of the fake server")
+    parser.add_argument("--chunk-sizes", type=_int_list, default=[500, 1000])
+    parser.add_argument("--overlaps", type=_int_list, default=[100, 200])
+    parser.add_argument("--ks", type=_int_list, default=[3, 5, 8])
+    parser.add_argument("--search-types", type=_str_list, default=["similarity", "mmr"])
+    parser.add_argument("--fetch-ks", type=_int_list, default=[20])
+    parser.add_argument("--lambdas", type=_float_list, default=[0.5])
+    parser.add_argument("--page-tolerance", type=int, default=0)
+    parser.add_argument("--min-hit-rate", type=float, default=0.8, help="hit@k a recommendation must reach")
+    parser.add_argument("--output", help="report path (default: .bench/retrieval-<timestamp>.json)")
+    args = parser.parse_args()
+    
+    report = run_benchmark(args)
+    print_report(report)
+    
+    from config import BENCH_DIR
+    
+    BENCH_DIR.mkdir(exist_ok=True)
+    output = Path(args.output) if args.output else BENCH_DIR / f"retrieval-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nReport written to {output}")
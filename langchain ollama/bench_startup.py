@@ -0,0 +1,196 @@
+"""
+Startup benchmark for the Light Novel AI Agent.
+Measures cold-start cost of the CLI entry points.
+
+Each target (``import main``, ``main.py --status``, ...) runs in a
+fresh interpreter and is timed end to end, then profiled once with
+``python -X importtime`` to report the slowest modules and whether heavy
+dependencies (chromadb, pypdf, langchain_community, the Ollama clients)
+were loaded. Results are written as JSON and compared against a stored
+baseline like bench_ingest.py.
+
+Usage:
+    python bench_startup.py                    # Default targets, 5 runs each
+    python bench_startup.py --runs 10 --top 25
+    python bench_startup.py --save-baseline    # Store results as the baseline
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from bench_ingest import compare, environment_info
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+
+# Label -> arguments after the interpreter
+TARGETS = {
+    "import config": ["-c", "import config"],
+    "import ingest": ["-c", "import ingest"],
+    "import main": ["-c", "import main"],
+    "import app": ["-c", "import app"],
+    "import agent": ["-c", "import agent"],
+    "main.py --status": ["main.py", "--status"],
+    "app.py --status": ["app.py", "--status"],
+}
+
+# Modules that should only load when actually needed
+HEAVY_MODULES = (
+    "chromadb",
+    "langchain_chroma",
+    "langchain_community",
+    "langchain_ollama",
+    "pypdf",
+)
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """
+    Parse ``-X importtime`` output.
+    
+    Args:
+        stderr: Interpreter stderr
+    
+    Returns:
+        One entry per imported module with self/cumulative microseconds
+    """
+    modules = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                "module": name,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": len(indent) // 2,
+            })
+    return modules
+
+
+def run_target(args: list[str], env: dict, importtime: bool = False) -> tuple[float, str]:
+    """
+    Run one target in a fresh interpreter.
+    
+    Returns:
+        Wall seconds and captured stderr
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += args
+    
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=SCRIPT_DIR, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{completed.stderr[-2000:]}")
+    return wall, completed.stderr
+
+
+def benchmark_target(label: str, args: list[str], env: dict, runs: int, top: int) -> dict:
+    """Time a target over several runs and profile its imports once."""
+    walls = [run_target(args, env)[0] for _ in range(runs)]
+    _, stderr = run_target(args, env, importtime=True)
+    modules = parse_importtime(stderr)
+    
+    top_level = {module["module"].split(".")[0] for module in modules}
+    slowest = sorted(modules, key=lambda module: module["cumulative_us"], reverse=True)
+    
+    return {
+        "wall_s": round(statistics.median(walls), 4),
+        "wall_min_s": round(min(walls), 4),
+        "runs": runs,
+        "modules_imported": len(modules),
+        "import_total_ms": round(sum(module["self_us"] for module in modules) / 1000, 1),
+        "heavy_modules_loaded": sorted(name for name in HEAVY_MODULES if name in top_level),
+        "slowest_imports": [
+            {"module": module["module"], "cumulative_ms": round(module["cumulative_us"] / 1000, 1)}
+            for module in slowest[:top]
+        ],
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    """Benchmark every selected target against a throwaway data directory."""
+    workdir = Path(tempfile.mkdtemp(prefix="bench_startup_"))
+    env = dict(os.environ)
+    env["CHROMA_DIR"] = str(workdir / "chroma")
+    env["REGISTRY_FILE"] = str(workdir / "registry.json")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    
+    # Warm the bytecode and filesystem caches once so runs are comparable
+    for target in args.targets:
+        run_target(TARGETS[target], env)
+    
+    results = {}
+    for target in args.targets:
+        print(f"Timing {target}...")
+        results[target] = benchmark_target(target, TARGETS[target], env, args.runs, args.top)
+    
+    return {
+        "benchmark": "startup",
+        "timestamp": datetime.now().isoformat(),
+        "environment": environment_info(None),
+        # "stages" keeps the layout bench_ingest.compare expects
+        "stages": results,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\nStartup benchmark")
+    print(f"{'target':<20} {'wall s':>8} {'imports ms':>11} {'modules':>8}  heavy modules loaded")
+    for label, info in report["stages"].items():
+        heavy = ", ".join(info["heavy_modules_loaded"]) or "-"
+        print(f"{label:<20} {info['wall_s']:>8.3f} {info['import_total_ms']:>11.1f} {info['modules_imported']:>8}  {heavy}")
+    
+    for label, info in report["stages"].items():
+        print(f"\nSlowest imports for {label}:")
+        for entry in info["slowest_imports"]:
+            print(f"  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup time")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per target")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--output", help="report path (default: .bench/startup-<timestamp>.json)")
+    parser.add_argument("--baseline", help="baseline to compare against (default: .bench/startup_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown per target")
+    args = parser.parse_args()
+    
+    report = run_benchmark(args)
+    print_report(report)
+    
+    from config import BENCH_DIR
+    
+    BENCH_DIR.mkdir(exist_ok=True)
+    baseline_path = Path(args.baseline) if args.baseline else BENCH_DIR / "startup_baseline.json"
+    output = Path(args.output) if args.output else BENCH_DIR / f"startup-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nReport written to {output}")
+    
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Baseline saved to {baseline_path}")
+    elif baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("\n⚠️  Regressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
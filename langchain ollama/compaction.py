@@ -0,0 +1,385 @@
+"""
+Index maintenance: rebuild Chroma collections and reclaim disk space.
+
+Re-ingesting volumes deletes and re-adds their chunks, which leaves
+tombstones in the HNSW graph, and dropped collections (staging runs,
+old shards) leave their index directories behind. Compaction:
+
+1. Copies every record of a collection, embeddings included, into a
+   fresh collection built with the HNSW settings from config.py
+   (HNSW_SPACE, HNSW_CONSTRUCTION_EF, HNSW_SEARCH_EF, HNSW_M; unset
+   ones keep the collection's current values), then swaps it in under
+   the name of the old one. Nothing is re-embedded.
+2. Deletes index directories that no collection refers to any more.
+3. VACUUMs chroma.sqlite3 so freed pages go back to the filesystem.
+
+On-disk size, query latency and recall@k (against exact search over the
+stored embeddings) are measured before and after, so the effect of new
+HNSW settings can be judged. Queries use stored chunk embeddings, so no
+embedding model is needed. Run it while nothing is ingesting.
+
+A rebuilt collection gets a new ID. Stores cached in this process are
+reopened, but a server or watcher running in another process (and any
+retriever from get_retriever()) still points at the dropped collection:
+restart them after compacting.
+
+Usage:
+    python compaction.py                        # Compact every collection
+    python compaction.py --collection light_novel_collection --queries 200
+    python compaction.py --measure-only         # Report without compacting
+    python main.py --compact --measure-only
+"""
+
+import random
+import re
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+
+from config import CHROMA_DIR, COLLECTION_METADATA, RETRIEVER_K, STAGING_COLLECTION_NAME
+from bench_retrieval import latency_summary
+from vectorstore import copy_collection, drop_collection, index_lock
+
+# Suffix of the collection a rebuild is copied into before the swap
+_REBUILD_SUFFIX = "__compact"
+
+# Index segments are stored in directories named after their UUID
+_SEGMENT_DIR = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def _client(persist_directory: str | Path):
+    import chromadb
+    
+    return chromadb.PersistentClient(path=str(persist_directory))
+
+
+def directory_size(path: str | Path) -> int:
+    """Total size in bytes of the files under a directory."""
+    path = Path(path)
+    if not path.exists():
+        return 0
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def list_collections(persist_directory: str | Path = CHROMA_DIR) -> list[str]:
+    """Names of the collections to compact, excluding staging and rebuild leftovers."""
+    if not Path(persist_directory).exists():
+        return []
+    names = [getattr(c, "name", c) for c in _client(persist_directory).list_collections()]
+    return sorted(
+        name for name in names
+        if name != STAGING_COLLECTION_NAME and not name.endswith(_REBUILD_SUFFIX)
+    )
+
+
+def _space(collection) -> str:
+    """Distance function of a collection's HNSW index."""
+    configuration = getattr(collection, "configuration", None) or {}
+    space = (configuration.get("hnsw") or {}).get("space")
+    return space or (collection.metadata or {}).get("hnsw:space", "l2")
+
+
+def _load_embeddings(collection, batch_size: int = 1000):
+    """All IDs and embeddings of a collection, sorted by ID."""
+    import numpy as np
+    
+    ids, embeddings = [], []
+    while True:
+        batch = collection.get(limit=batch_size, offset=len(ids), include=["embeddings"])
+        if not batch["ids"]:
+            break
+        ids.extend(batch["ids"])
+        embeddings.extend(batch["embeddings"])
+    order = sorted(range(len(ids)), key=ids.__getitem__)
+    return [ids[i] for i in order], np.asarray([embeddings[i] for i in order], dtype=np.float32)
+
+
+def _exact_neighbours(vectors, queries, k: int, space: str) -> list[set[int]]:
+    """Indices of the k nearest stored vectors to each query, by brute force."""
+    import numpy as np
+    
+    if space == "cosine":
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    if space == "l2":
+        distances = (queries ** 2).sum(1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(1)[None, :]
+    else:
+        distances = -(queries @ vectors.T)
+    k = min(k, vectors.shape[0])
+    nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    return [set(row.tolist()) for row in nearest]
+
+
+def measure_collection(
+    collection_name: str,
+    persist_directory: str | Path = CHROMA_DIR,
+    queries: int = 50,
+    k: int = RETRIEVER_K,
+    seed: int = 0,
+) -> dict:
+    """
+    Measure query latency and recall of a collection's HNSW index.
+    
+    The queries are the embeddings of ``queries`` stored chunks, chosen
+    by seed from the sorted IDs, so a later run picks the same ones.
+    
+    Args:
+        collection_name: Collection to measure
+        persist_directory: Directory for persistent storage
+        queries: Number of queries to time
+        k: Results per query
+        seed: Random seed for choosing the queries
+    
+    Returns:
+        Dict with count, hnsw settings, latency (p50/p95/p99/mean in ms)
+        and recall@k (None for an empty collection)
+    """
+    collection = _client(persist_directory).get_collection(collection_name)
+    configuration = getattr(collection, "configuration", None) or {}
+    result = {
+        "count": collection.count(),
+        "hnsw": configuration.get("hnsw") or {
+            key: value for key, value in (collection.metadata or {}).items() if key.startswith("hnsw:")
+        },
+        "latency_ms": latency_summary([]),
+        "recall": None,
+    }
+    if not result["count"] or queries <= 0:
+        return result
+    
+    ids, vectors = _load_embeddings(collection)
+    picked = random.Random(seed).sample(range(len(ids)), min(queries, len(ids)))
+    position = {doc_id: i for i, doc_id in enumerate(ids)}
+    exact = _exact_neighbours(vectors, vectors[picked], k, _space(collection))
+    
+    durations, hits = [], 0
+    for query, expected in zip(vectors[picked], exact):
+        start = time.perf_counter()
+        found = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        durations.append(time.perf_counter() - start)
+        hits += len({position[doc_id] for doc_id in found["ids"][0]} & expected)
+    
+    result["latency_ms"] = latency_summary(durations)
+    result["recall"] = hits / sum(len(expected) for expected in exact)
+    return result
+
+
+def rebuild_collection(
+    collection_name: str,
+    persist_directory: str | Path = CHROMA_DIR,
+    metadata: dict | None = None,
+) -> int:
+    """
+    Rebuild a collection's index by copying it into a fresh collection.
+    
+    The copy gets ``metadata`` (default: the collection's own metadata
+    updated with COLLECTION_METADATA), so this is also how new HNSW
+    settings reach an existing collection. The swap
+    runs under the write side of ``index_lock``; searches in this process
+    wait for it.
+    
+    Args:
+        collection_name: Collection to rebuild
+        persist_directory: Directory for persistent storage
+        metadata: Collection metadata for the rebuilt collection
+    
+    Returns:
+        Number of records copied
+    """
+    rebuild_name = f"{collection_name}{_REBUILD_SUFFIX}"
+    client = _client(persist_directory)
+    if metadata is None:
+        current = client.get_collection(collection_name).metadata or {}
+        metadata = {**current, **COLLECTION_METADATA}
+    
+    with index_lock.write():
+        # Left over from a rebuild interrupted during the copy
+        drop_collection(persist_directory, rebuild_name)
+        copied = copy_collection(
+            collection_name, rebuild_name, persist_directory,
+            metadata=metadata or None,
+        )
+        drop_collection(persist_directory, collection_name)
+        client.get_collection(rebuild_name).modify(name=collection_name)
+    return copied
+
+
+def finish_interrupted_rebuilds(persist_directory: str | Path = CHROMA_DIR) -> list[str]:
+    """
+    Rename rebuilt collections whose swap was interrupted.
+    
+    A rebuild copy whose original collection is gone was stopped after
+    the drop, so the copy is complete and takes the original's name.
+    
+    Args:
+        persist_directory: Directory for persistent storage
+    
+    Returns:
+        Names of the collections restored
+    """
+    if not Path(persist_directory).exists():
+        return []
+    client = _client(persist_directory)
+    names = {getattr(c, "name", c) for c in client.list_collections()}
+    
+    restored = []
+    for name in sorted(names):
+        original = name[:-len(_REBUILD_SUFFIX)]
+        if name.endswith(_REBUILD_SUFFIX) and original not in names:
+            with index_lock.write():
+                client.get_collection(name).modify(name=original)
+            restored.append(original)
+    return restored
+
+
+def remove_orphan_segments(persist_directory: str | Path = CHROMA_DIR) -> tuple[int, int]:
+    """
+    Delete index directories that no collection refers to.
+    
+    Chroma keeps each HNSW index in a directory named after its segment
+    ID and does not always remove it when the collection is deleted.
+    
+    Args:
+        persist_directory: Directory for persistent storage
+    
+    Returns:
+        (directories removed, bytes freed)
+    """
+    database = Path(persist_directory) / "chroma.sqlite3"
+    if not database.exists():
+        return 0, 0
+    
+    with sqlite3.connect(database) as connection:
+        live = {row[0] for row in connection.execute("SELECT id FROM segments")}
+    
+    removed = freed = 0
+    for path in Path(persist_directory).iterdir():
+        if path.is_dir() and _SEGMENT_DIR.match(path.name) and path.name not in live:
+            freed += directory_size(path)
+            shutil.rmtree(path)
+            removed += 1
+    return removed, freed
+
+
+def vacuum_database(persist_directory: str | Path = CHROMA_DIR) -> None:
+    """Rewrite chroma.sqlite3 without its free pages."""
+    database = Path(persist_directory) / "chroma.sqlite3"
+    if not database.exists():
+        return
+    connection = sqlite3.connect(database, isolation_level=None)
+    try:
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+
+
+def compact(
+    collections: list[str] | None = None,
+    persist_directory: str | Path = CHROMA_DIR,
+    queries: int = 50,
+    k: int = RETRIEVER_K,
+    rebuild: bool = True,
+) -> dict:
+    """
+    Compact the vector store and measure it before and after.
+    
+    Args:
+        collections: Collections to rebuild (default: all but staging)
+        persist_directory: Directory for persistent storage
+        queries: Queries timed per collection (0 skips measuring)
+        k: Results per query
+        rebuild: False only measures, without changing anything
+    
+    Returns:
+        Report with "before" and "after" measurements ({"bytes",
+        "collections": {name: measure_collection()}}), "copied" records
+        per collection and the orphaned index directories removed
+    """
+    finish_interrupted_rebuilds(persist_directory)
+    names = collections or list_collections(persist_directory)
+    
+    def snapshot() -> dict:
+        return {
+            "bytes": directory_size(persist_directory),
+            "collections": {
+                name: measure_collection(name, persist_directory, queries, k) for name in names
+            },
+        }
+    
+    report = {"before": snapshot(), "copied": {}, "orphans_removed": 0, "orphan_bytes": 0}
+    if not rebuild:
+        return report
+    
+    for name in names:
+        report["copied"][name] = rebuild_collection(name, persist_directory)
+    report["orphans_removed"], report["orphan_bytes"] = remove_orphan_segments(persist_directory)
+    vacuum_database(persist_directory)
+    report["after"] = snapshot()
+    return report
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def _format_measure(measure: dict) -> str:
+    latency = measure["latency_ms"]
+    hnsw = measure["hnsw"]
+    settings = ", ".join(
+        f"{key}={hnsw[key]}" for key in ("space", "ef_construction", "ef_search", "max_neighbors") if key in hnsw
+    ) or ", ".join(f"{key}={value}" for key, value in hnsw.items())
+    if measure["recall"] is None:
+        return f"{measure['count']} records [{settings}]"
+    return (
+        f"{measure['count']} records, p50 {latency['p50']:.2f} ms, "
+        f"p95 {latency['p95']:.2f} ms, recall {measure['recall']:.3f} [{settings}]"
+    )
+
+
+def print_report(report: dict) -> None:
+    """Print a compaction report."""
+    before = report["before"]
+    after = report.get("after")
+    
+    print("\n🧹 Vector store compaction")
+    print(f"   Configured HNSW settings: {COLLECTION_METADATA or 'none (Chroma defaults)'}")
+    if after is None:
+        print(f"   On disk: {_megabytes(before['bytes'])}")
+    else:
+        saved = before["bytes"] - after["bytes"]
+        print(f"   On disk: {_megabytes(before['bytes'])} → {_megabytes(after['bytes'])} "
+              f"({_megabytes(saved)} reclaimed)")
+        print(f"   Orphaned index directories removed: {report['orphans_removed']} "
+              f"({_megabytes(report['orphan_bytes'])})")
+    
+    for name, measure in before["collections"].items():
+        print(f"\n   {name}")
+        print(f"     before: {_format_measure(measure)}")
+        if after is not None:
+            print(f"     after:  {_format_measure(after['collections'][name])}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Command line entry point, shared with main.py --compact.
+    
+    Args:
+        argv: Arguments after the command (default: sys.argv[1:])
+    """
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Rebuild Chroma collections and reclaim disk space")
+    parser.add_argument("--collection", action="append", help="collection to compact (repeatable; default: all)")
+    parser.add_argument("--queries", type=int, default=50, help="queries timed per collection (0: skip)")
+    parser.add_argument("-k", type=int, default=RETRIEVER_K)
+    parser.add_argument("--measure-only", action="store_true", help="report without compacting")
+    args = parser.parse_args(argv)
+    
+    print_report(compact(args.collection, queries=args.queries, k=args.k, rebuild=not args.measure_only))
+    if not args.measure_only:
+        print("\n   Restart any running server or watcher so it reopens the rebuilt collections.")
+
+
+if __name__ == "__main__":
+    main()
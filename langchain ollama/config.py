@@ -4,6 +4,7 @@ Contains all paths, model settings, and parameters.
 """
 
 import os
+import re
 from pathlib import Path
 
 # =============================================================================
@@ -16,14 +17,20 @@ BASE_DIR = Path(__file__).parent.resolve()
 # Data directories
 PDF_DIR = BASE_DIR / ".pdfs"
 DOCS_DIR = BASE_DIR / ".docs"
-CHROMA_DIR = BASE_DIR / ".chroma_db"
+CHROMA_DIR = Path(os.getenv("CHROMA_DIR", BASE_DIR / ".chroma_db"))
 
 # Registry file for tracking processed volumes
-REGISTRY_FILE = BASE_DIR / "registry.json"
+REGISTRY_FILE = Path(os.getenv("REGISTRY_FILE", BASE_DIR / "registry.json"))
+
+# Benchmark results and baselines
+BENCH_DIR = BASE_DIR / ".bench"
+
+
+def ensure_directories() -> None:
+    """Create the data directories (called on first use, not at import)."""
+    PDF_DIR.mkdir(exist_ok=True)
+    CHROMA_DIR.mkdir(parents=True, exist_ok=True)
 
-# Ensure directories exist
-PDF_DIR.mkdir(exist_ok=True)
-CHROMA_DIR.mkdir(exist_ok=True)
 
 # =============================================================================
 # OLLAMA CONFIGURATION
@@ -39,6 +46,86 @@ LLM_NUM_CTX = 8192  # Context window size
 # Embedding Model
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "mxbai-embed-large")
 
+
+def _duration_seconds(value: str, default: int) -> int:
+    """
+    Parse an Ollama duration such as "300", "5m", "1h30m" or "-1m".
+    
+    Args:
+        value: Seconds, or a Go-style duration string
+        default: Returned when the value cannot be parsed
+    
+    Returns:
+        Whole seconds, or -1 for a negative duration (keep forever)
+    """
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value.lstrip("+-"))
+        if not parts or "".join(n + u for n, u in parts) != value.lstrip("+-"):
+            return default
+        units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        seconds = sum(float(n) * units[u] for n, u in parts)
+        if value.startswith("-"):
+            seconds = -seconds
+    if seconds != seconds or abs(seconds) == float("inf"):
+        return default
+    return -1 if seconds < 0 else int(seconds)
+
+
+# Seconds Ollama keeps a model loaded after each request (-1 = forever).
+# Shares Ollama's own variable, so duration strings like "24h" work too.
+OLLAMA_KEEP_ALIVE = _duration_seconds(os.getenv("OLLAMA_KEEP_ALIVE", "1800"), 1800)
+
+# Preload both models in the background when the CLI starts
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "1") == "1"
+
+# How often serve mode pings the models so they never go cold
+KEEP_WARM_INTERVAL_S = int(os.getenv("KEEP_WARM_INTERVAL_S", "240"))
+
+# =============================================================================
+# BEDROCK CONFIGURATION
+# =============================================================================
+
+# Backends (see backends.py): "ollama" or "bedrock". Chat and embeddings
+# are chosen separately, e.g. generation on Bedrock with local embeddings.
+# Vectors from different embedding backends are not comparable, so
+# re-ingest after switching EMBEDDING_BACKEND.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "ollama")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "ollama")
+
+BEDROCK_REGION = os.getenv("AWS_REGION", "us-east-1")
+
+# Optional endpoint override, e.g. a VPC endpoint or a local stub
+BEDROCK_ENDPOINT_URL = os.getenv("BEDROCK_ENDPOINT_URL") or None
+
+BEDROCK_LLM_MODEL = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-5-sonnet-20240620-v1:0")
+BEDROCK_MAX_TOKENS = int(os.getenv("BEDROCK_MAX_TOKENS", "1024"))
+
+# Connections in the shared Bedrock client pool and read timeout (seconds)
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "50"))
+BEDROCK_READ_TIMEOUT = int(os.getenv("BEDROCK_READ_TIMEOUT", "120"))
+
+BEDROCK_EMBEDDING_MODEL = os.getenv("BEDROCK_EMBEDDING_MODEL_ID", "amazon.titan-embed-text-v2:0")
+
+# Titan V2 output size (256, 512 or 1024) and unit-length normalization
+BEDROCK_EMBEDDING_DIMENSIONS = int(os.getenv("BEDROCK_EMBEDDING_DIMENSIONS", "1024"))
+BEDROCK_EMBEDDING_NORMALIZE = os.getenv("BEDROCK_EMBEDDING_NORMALIZE", "1") == "1"
+
+# Titan requests in flight at once (one text per request)
+BEDROCK_EMBED_CONCURRENCY = int(os.getenv("BEDROCK_EMBED_CONCURRENCY", "16"))
+
+# Content-hash cache of Bedrock embeddings, so re-ingesting is free
+BEDROCK_EMBEDDING_CACHE = Path(
+    os.getenv("BEDROCK_EMBEDDING_CACHE", CHROMA_DIR / "titan_embeddings.sqlite")
+)
+
+# Usage ledger shared with the Bedrock scripts: every Bedrock call records
+# its tokens and latency there (summarize with python usage_ledger.py in
+# that directory; BEDROCK_USAGE_LEDGER="" disables recording)
+USAGE_LEDGER_MODULE = BASE_DIR.parent / "aws ( core )" / "python" / "usage_ledger.py"
+
 # =============================================================================
 # TEXT SPLITTING CONFIGURATION
 # =============================================================================
@@ -46,6 +133,49 @@ EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "mxbai-embed-large")
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 
+# =============================================================================
+# INGESTION CONFIGURATION
+# =============================================================================
+
+# Chunks embedded and stored per checkpoint; an interrupted ingest resumes
+# after the last stored batch
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+
+# Retries per failed batch, with exponential backoff between attempts
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "4"))
+INGEST_RETRY_BASE_DELAY_S = 2.0
+INGEST_RETRY_MAX_DELAY_S = 60.0
+
+# =============================================================================
+# WATCH CONFIGURATION
+# =============================================================================
+
+# Seconds between directory scans when watchdog is not installed
+WATCH_POLL_INTERVAL_S = float(os.getenv("WATCH_POLL_INTERVAL_S", "2.0"))
+
+# A file is ingested once it has not changed for this many seconds
+# (copies of large PDFs arrive as a burst of events)
+WATCH_DEBOUNCE_S = float(os.getenv("WATCH_DEBOUNCE_S", "3.0"))
+
+# Use the watchdog package for file events when it is installed
+WATCH_USE_WATCHDOG = os.getenv("WATCH_USE_WATCHDOG", "1") == "1"
+
+# =============================================================================
+# DEDUPLICATION CONFIGURATION
+# =============================================================================
+
+# Skip near-duplicate chunks (front matter, credits pages, repeated TOCs)
+DEDUP_ENABLED = True
+
+# Number of words per shingle used for SimHash fingerprints
+DEDUP_SHINGLE_SIZE = 3
+
+# Maximum Hamming distance between 64-bit fingerprints to count as a duplicate
+DEDUP_MAX_DISTANCE = 3
+
+# Fingerprints of every stored chunk, used for cross-volume deduplication
+FINGERPRINT_FILE = CHROMA_DIR / "fingerprints.json"
+
 # =============================================================================
 # RETRIEVER CONFIGURATION
 # =============================================================================
@@ -66,6 +196,46 @@ MMR_LAMBDA_MULT = 0.5
 
 CHROMA_COLLECTION_NAME = "light_novel_collection"
 
+# Collection written by the old single-file app.py, merged into the one above
+LEGACY_COLLECTION_NAME = "light_novels"
+LEGACY_EMBEDDING_MODEL = "mxbai-embed-large"
+
+# Re-ingested volumes are built here and then swapped into the collection
+STAGING_COLLECTION_NAME = f"{CHROMA_COLLECTION_NAME}_staging"
+
+# One collection per series instead of one for the whole library (see
+# shards.py); queries naming a series only search its shard
+SHARDING_ENABLED = os.getenv("SHARDING_ENABLED", "0") == "1"
+
+# Series -> shard collection and volumes
+SHARD_MAP_FILE = CHROMA_DIR / "shards.json"
+
+# Shards searched in parallel by a cross-series query
+SHARD_SEARCH_WORKERS = int(os.getenv("SHARD_SEARCH_WORKERS", "8"))
+
+# HNSW index parameters, applied when a collection is created (run
+# main.py --compact to rebuild existing collections with new values).
+# Higher construction_ef / M build a better graph (recall) at the cost of
+# ingest time and memory; higher search_ef raises recall per query at the
+# cost of latency. Unset parameters keep Chroma's own defaults.
+HNSW_SPACE = os.getenv("HNSW_SPACE") or None  # "l2", "cosine" or "ip"
+HNSW_CONSTRUCTION_EF = int(os.getenv("HNSW_CONSTRUCTION_EF")) if os.getenv("HNSW_CONSTRUCTION_EF") else None
+HNSW_SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF")) if os.getenv("HNSW_SEARCH_EF") else None
+HNSW_M = int(os.getenv("HNSW_M")) if os.getenv("HNSW_M") else None
+
+# Only the parameters that are set (Chroma rejects empty metadata: use
+# ``COLLECTION_METADATA or None``)
+COLLECTION_METADATA = {
+    key: value
+    for key, value in {
+        "hnsw:space": HNSW_SPACE,
+        "hnsw:construction_ef": HNSW_CONSTRUCTION_EF,
+        "hnsw:search_ef": HNSW_SEARCH_EF,
+        "hnsw:M": HNSW_M,
+    }.items()
+    if value is not None
+}
+
 # =============================================================================
 # MEMORY CONFIGURATION
 # =============================================================================
@@ -73,6 +243,12 @@ CHROMA_COLLECTION_NAME = "light_novel_collection"
 # Maximum number of messages to keep in memory
 MEMORY_MAX_MESSAGES = 20
 
+# When history exceeds the maximum, drop the oldest messages down to this
+# many in one step. Trimming in blocks keeps the history prefix (and
+# Ollama's prompt cache) stable between trims instead of shifting it
+# every turn.
+MEMORY_TRIM_TO = 10
+
 # =============================================================================
 # AGENT CONFIGURATION
 # =============================================================================
@@ -82,3 +258,47 @@ AGENT_MAX_ITERATIONS = 10
 
 # Verbose output
 AGENT_VERBOSE = True
+
+# Record a span tree (LLM, tools, embedding, search) for every turn
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "0") == "1"
+
+# =============================================================================
+# SERVER CONFIGURATION
+# =============================================================================
+
+SERVE_HOST = os.getenv("SERVE_HOST", "127.0.0.1")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "8080"))
+
+# LLM generations running at once; further requests wait in the queue
+SERVE_MAX_GENERATIONS = int(os.getenv("SERVE_MAX_GENERATIONS", "2"))
+
+# Requests allowed to wait for a generation slot before answering 429
+SERVE_MAX_QUEUE = int(os.getenv("SERVE_MAX_QUEUE", "16"))
+
+# Conversations kept in memory; the least recently used idle one is dropped
+SERVE_MAX_SESSIONS = int(os.getenv("SERVE_MAX_SESSIONS", "256"))
+
+# Concurrent query embeddings are sent to Ollama as one batch
+EMBED_BATCH_SIZE = 32
+EMBED_BATCH_WAIT_MS = 5
+
+# =============================================================================
+# BATCH CONFIGURATION
+# =============================================================================
+
+# LLM generations running at once in batch mode (main.py --batch)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# Questions retrieved together; their query embeddings share requests
+BATCH_RETRIEVAL_SIZE = int(os.getenv("BATCH_RETRIEVAL_SIZE", "32"))
+
+# =============================================================================
+# METRICS CONFIGURATION
+# =============================================================================
+
+# Serve Prometheus metrics on this port in CLI mode (0 = disabled);
+# serve mode always exposes GET /metrics
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Write metrics to this file on exit, e.g. for node_exporter (empty = disabled)
+METRICS_FILE = os.getenv("METRICS_FILE", "")
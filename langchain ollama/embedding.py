@@ -1,25 +1,53 @@
 """
 Embedding model loader and logic.
-Uses Ollama embeddings with mxbai-embed-large model.
+Uses Ollama embeddings with mxbai-embed-large model, or Amazon Titan
+Text Embeddings V2 through Bedrock when EMBEDDING_BACKEND=bedrock.
 """
 
-from langchain_ollama import OllamaEmbeddings
+from __future__ import annotations
 
-from config import OLLAMA_BASE_URL, EMBEDDING_MODEL
+import asyncio
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
+from metrics import counter, histogram
 
-def get_embedding_model() -> OllamaEmbeddings:
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+EMBED_REQUESTS = counter(
+    "rag_embedding_requests_total", "Embedding requests sent to the model", ("kind",)
+)
+EMBED_TEXTS = counter(
+    "rag_embedding_texts_total", "Texts embedded by the model", ("kind",)
+)
+EMBED_LATENCY = histogram(
+    "rag_embedding_latency_seconds", "Embedding request latency", ("kind",)
+)
+EMBED_BATCH_SIZE_HISTOGRAM = histogram(
+    "rag_embedding_batch_size", "Query texts per micro-batched embedding request",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+# Only the Titan embedding cache is counted: Ollama embeddings are not cached
+CACHE_REQUESTS = counter(
+    "rag_cache_requests_total", "Embedding cache lookups by cache and result", ("cache", "result")
+)
+
+
+@lru_cache(maxsize=1)
+def get_embedding_model() -> Embeddings:
     """
-    Initialize and return the Ollama embedding model.
+    Initialize and return the embedding model of EMBEDDING_BACKEND.
+    
+    The instance is created once and shared, so its HTTP clients
+    (sync and async) keep their connection pools across calls.
     
     Returns:
-        OllamaEmbeddings: Configured embedding model instance
+        Embeddings: OllamaEmbeddings, or TitanEmbeddings for "bedrock"
     """
-    embeddings = OllamaEmbeddings(
-        base_url=OLLAMA_BASE_URL,
-        model=EMBEDDING_MODEL,
-    )
-    return embeddings
+    from backends import get_embeddings
+    
+    return get_embeddings()
 
 
 def embed_text(text: str) -> list[float]:
@@ -33,7 +61,10 @@ def embed_text(text: str) -> list[float]:
         List of floats representing the embedding vector
     """
     embeddings = get_embedding_model()
-    return embeddings.embed_query(text)
+    EMBED_REQUESTS.labels(kind="query").inc()
+    EMBED_TEXTS.labels(kind="query").inc()
+    with EMBED_LATENCY.labels(kind="query").time():
+        return embeddings.embed_query(text)
 
 
 def embed_documents(texts: list[str]) -> list[list[float]]:
@@ -47,7 +78,148 @@ def embed_documents(texts: list[str]) -> list[list[float]]:
         List of embedding vectors
     """
     embeddings = get_embedding_model()
-    return embeddings.embed_documents(texts)
+    EMBED_REQUESTS.labels(kind="documents").inc()
+    EMBED_TEXTS.labels(kind="documents").inc(len(texts))
+    with EMBED_LATENCY.labels(kind="documents").time():
+        return embeddings.embed_documents(texts)
+
+
+class QueryEmbeddingBatcher:
+    """
+    Collects concurrent query embeddings into batched Ollama requests.
+    
+    A batch is sent when it reaches ``max_batch_size`` texts or when the
+    oldest pending text has waited ``max_wait_ms``, whichever comes first.
+    """
+    
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        """
+        Initialize the batcher.
+        
+        Args:
+            max_batch_size: Maximum number of texts per request
+            max_wait_ms: Maximum time a text waits for its batch to fill
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        # The loop only keeps weak references to tasks: hold running batches
+        self._tasks: set[asyncio.Task] = set()
+    
+    async def embed(self, text: str) -> list[float]:
+        """
+        Embed a text as part of the next batch.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            List of floats representing the embedding vector
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        
+        return await future
+    
+    def _flush(self) -> None:
+        """Send all pending texts as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        """Embed a batch and resolve its futures."""
+        # Identical queries in the same batch are embedded once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        EMBED_BATCH_SIZE_HISTOGRAM.observe(len(texts))
+        EMBED_REQUESTS.labels(kind="query").inc()
+        EMBED_TEXTS.labels(kind="query").inc(len(texts))
+        
+        try:
+            with EMBED_LATENCY.labels(kind="query").time():
+                vectors = await get_embedding_model().aembed_documents(texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+
+# Active batcher for aembed_text, if batching is enabled
+_query_batcher: QueryEmbeddingBatcher | None = None
+
+
+def enable_query_batching(max_batch_size: int, max_wait_ms: float) -> None:
+    """
+    Route aembed_text through a shared QueryEmbeddingBatcher.
+    
+    Args:
+        max_batch_size: Maximum number of texts per request
+        max_wait_ms: Maximum time a text waits for its batch to fill
+    """
+    global _query_batcher
+    _query_batcher = QueryEmbeddingBatcher(max_batch_size, max_wait_ms)
+
+
+def disable_query_batching() -> None:
+    """Send each aembed_text call as its own request again."""
+    global _query_batcher
+    _query_batcher = None
+
+
+async def aembed_text(text: str) -> list[float]:
+    """
+    Embed a single text string without blocking the event loop.
+    
+    Args:
+        text: Text to embed
+        
+    Returns:
+        List of floats representing the embedding vector
+    """
+    if _query_batcher is not None:
+        return await _query_batcher.embed(text)
+    
+    embeddings = get_embedding_model()
+    EMBED_REQUESTS.labels(kind="query").inc()
+    EMBED_TEXTS.labels(kind="query").inc()
+    with EMBED_LATENCY.labels(kind="query").time():
+        return await embeddings.aembed_query(text)
+
+
+async def aembed_documents(texts: list[str]) -> list[list[float]]:
+    """
+    Embed multiple text documents without blocking the event loop.
+    
+    Args:
+        texts: List of texts to embed
+        
+    Returns:
+        List of embedding vectors
+    """
+    embeddings = get_embedding_model()
+    EMBED_REQUESTS.labels(kind="documents").inc()
+    EMBED_TEXTS.labels(kind="documents").inc(len(texts))
+    with EMBED_LATENCY.labels(kind="documents").time():
+        return await embeddings.aembed_documents(texts)
 
 
 if __name__ == "__main__":
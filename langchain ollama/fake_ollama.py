@@ -0,0 +1,531 @@
+"""
+Offline stand-in for the Ollama HTTP API.
+Used for deterministic benchmarks and tests without a live Ollama.
+
+Implements the endpoints the agent uses:
+    POST /api/embed        - Deterministic hash-based embeddings
+    POST /api/embeddings   - Legacy single-prompt embeddings
+    POST /api/chat         - Scripted completions, streaming and tool calls
+    POST /api/generate     - Scripted completions (used for model warm-up)
+    POST /api/show         - Minimal model details
+    GET  /api/tags         - Available models
+    GET  /api/ps           - Currently loaded models
+    GET  /api/version      - Server version
+
+Embeddings hash word unigrams and bigrams into signed buckets, so texts
+sharing words get similar vectors and retrieval behaves sensibly.
+Completions come from a script of regex rules or a deterministic default.
+Model load time, prefill and decode throughput are simulated, including
+reuse of the previous prompt's prefix like Ollama's KV cache.
+
+Usage:
+    python fake_ollama.py --port 11435
+    OLLAMA_BASE_URL=http://127.0.0.1:11435 python main.py
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from config import LLM_MODEL, EMBEDDING_MODEL
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+class FakeOllamaOptions:
+    """
+    Behaviour of the fake server.
+    
+    Times are in milliseconds, throughput in tokens per second.
+    A throughput of 0 disables the corresponding delay.
+    """
+    
+    def __init__(
+        self,
+        models: list[str] | None = None,
+        embedding_dim: int = 1024,
+        load_ms: float = 0.0,
+        keep_alive_s: float = 300.0,
+        embed_ms: float = 0.0,
+        prefill_tps: float = 0.0,
+        decode_tps: float = 0.0,
+        response_tokens: int = 48,
+        script: list[dict] | None = None,
+        default_tool: str | None = "search_novels",
+    ):
+        """
+        Initialize the fake server options.
+        
+        Args:
+            models: Model names reported by /api/tags
+            embedding_dim: Dimension of returned embeddings
+            load_ms: Simulated model load time on first use or after unload
+            keep_alive_s: Idle time after which a model is unloaded,
+                unless the request sets its own keep_alive
+            embed_ms: Simulated time per embedded text
+            prefill_tps: Prompt tokens processed per second
+            decode_tps: Tokens generated per second
+            response_tokens: Length of default completions
+            script: Rules of the form {"match": regex, "content": str,
+                "tool_calls": [{"name": str, "arguments": dict}]}
+            default_tool: Tool called when tools are offered and no rule
+                matches, or None to never call tools by default
+        """
+        self.models = models or [LLM_MODEL, EMBEDDING_MODEL]
+        self.embedding_dim = embedding_dim
+        self.load_ms = load_ms
+        self.keep_alive_s = keep_alive_s
+        self.embed_ms = embed_ms
+        self.prefill_tps = prefill_tps
+        self.decode_tps = decode_tps
+        self.response_tokens = response_tokens
+        self.script = [
+            {**rule, "pattern": re.compile(rule.get("match", ""), re.IGNORECASE)}
+            for rule in (script or [])
+        ]
+        self.default_tool = default_tool
+
+
+# =============================================================================
+# DETERMINISTIC MODEL BEHAVIOUR
+# =============================================================================
+
+def _bucket(feature: str, dim: int) -> tuple[int, float]:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "big")
+    return value % dim, 1.0 if value >> 63 else -1.0
+
+
+def fake_embedding(text: str, dim: int = 1024) -> list[float]:
+    """
+    Compute a deterministic, L2-normalized embedding for a text.
+    
+    Args:
+        text: Text to embed
+        dim: Embedding dimension
+    
+    Returns:
+        Embedding vector
+    """
+    words = _WORD_PATTERN.findall(text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        features = [text]
+    
+    vector = [0.0] * dim
+    for feature in features:
+        index, sign = _bucket(feature, dim)
+        vector[index] += sign
+    
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count (about four characters per token)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def _message_text(messages: list[dict]) -> str:
+    return "\n".join(f"{m.get('role', '')}: {m.get('content', '')}" for m in messages)
+
+
+def _last_user_message(messages: list[dict]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return message.get("content", "")
+    return ""
+
+
+def _default_completion(prompt: str, length: int) -> str:
+    """Deterministic filler answer seeded by the prompt."""
+    words = _WORD_PATTERN.findall(prompt.lower())[-12:] or ["nothing"]
+    seed = int(hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).hexdigest(), 16)
+    body = [words[(seed + i * 7) % len(words)] for i in range(max(0, length - 4))]
+    return " ".join(["Fake", "answer", "about:"] + body) + "."
+
+
+def _first_parameter(tool: dict) -> str | None:
+    properties = tool.get("function", {}).get("parameters", {}).get("properties", {})
+    return next(iter(properties), None)
+
+
+# =============================================================================
+# SERVER
+# =============================================================================
+
+class FakeOllama:
+    """State shared by all request handlers: options and loaded models."""
+    
+    def __init__(self, options: FakeOllamaOptions):
+        self.options = options
+        self._lock = threading.Lock()
+        # model -> (expires_at, last prompt for prefix reuse)
+        self._loaded: dict[str, tuple[float, str]] = {}
+    
+    def touch_model(self, model: str, keep_alive) -> tuple[float, str]:
+        """
+        Mark a model as used, returning its load time and previous prompt.
+        
+        Args:
+            model: Model name
+            keep_alive: Request keep_alive in seconds or a duration string
+        
+        Returns:
+            (load seconds incurred, previous prompt seen by the model)
+        """
+        now = time.monotonic()
+        with self._lock:
+            expires_at, last_prompt = self._loaded.get(model, (0.0, ""))
+            load_s = 0.0
+            if expires_at <= now:
+                load_s = self.options.load_ms / 1000
+                last_prompt = ""
+            self._loaded[model] = (now + load_s + _keep_alive_seconds(
+                keep_alive, self.options.keep_alive_s
+            ), last_prompt)
+        return load_s, last_prompt
+    
+    def remember_prompt(self, model: str, prompt: str) -> None:
+        with self._lock:
+            if model in self._loaded:
+                self._loaded[model] = (self._loaded[model][0], prompt)
+    
+    def loaded_models(self) -> list[str]:
+        now = time.monotonic()
+        with self._lock:
+            return [m for m, (expires, _) in self._loaded.items() if expires > now]
+    
+    def plan_reply(self, messages: list[dict], tools: list[dict] | None) -> tuple[str, list]:
+        """Choose the content and tool calls for a chat request."""
+        question = _last_user_message(messages)
+        
+        for rule in self.options.script:
+            if rule["pattern"].search(question):
+                tool_calls = rule.get("tool_calls", []) if tools else []
+                return rule.get("content", ""), [
+                    {"function": {"name": c["name"], "arguments": c.get("arguments", {})}}
+                    for c in tool_calls
+                ]
+        
+        if tools and self.options.default_tool:
+            for tool in tools:
+                if tool.get("function", {}).get("name") == self.options.default_tool:
+                    parameter = _first_parameter(tool)
+                    arguments = {parameter: question} if parameter else {}
+                    return "", [{"function": {
+                        "name": self.options.default_tool,
+                        "arguments": arguments,
+                    }}]
+        
+        return _default_completion(_message_text(messages), self.options.response_tokens), []
+
+
+def _keep_alive_seconds(value, default: float) -> float:
+    """Parse Ollama keep_alive values such as 300, "5m" or "1h"."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)([smh]?)", str(value).strip())
+    if not match:
+        return default
+    amount = float(match.group(1))
+    if amount < 0:
+        return float("inf")
+    return amount * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Request handler implementing the Ollama API subset."""
+    
+    server_version = "FakeOllama/1.0"
+    state: FakeOllama  # set on the subclass created by start_fake_ollama
+    
+    def log_message(self, format, *args):
+        pass
+    
+    # -------------------------------------------------------------------------
+    # Plumbing
+    # -------------------------------------------------------------------------
+    
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", "0") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+    
+    def _send_json(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _start_stream(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+    
+    def _send_line(self, payload: dict) -> None:
+        self.wfile.write(json.dumps(payload).encode("utf-8") + b"\n")
+        self.wfile.flush()
+    
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [
+                {
+                    "name": name,
+                    "model": name,
+                    "modified_at": _timestamp(),
+                    "size": 0,
+                    "digest": hashlib.sha256(name.encode()).hexdigest(),
+                    "details": {"format": "gguf", "family": "fake"},
+                }
+                for name in self.state.options.models
+            ]})
+        elif self.path == "/api/ps":
+            self._send_json({"models": [
+                {"name": name, "model": name} for name in self.state.loaded_models()
+            ]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        elif self.path == "/":
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"Ollama is running")
+        else:
+            self._send_json({"error": f"unknown path {self.path}"}, status=404)
+    
+    def do_POST(self):
+        routes = {
+            "/api/embed": self._embed,
+            "/api/embeddings": self._embeddings,
+            "/api/chat": self._chat,
+            "/api/generate": self._generate,
+            "/api/show": self._show,
+        }
+        handler = routes.get(self.path)
+        if handler is None:
+            self._send_json({"error": f"unknown path {self.path}"}, status=404)
+            return
+        try:
+            body = self._read_json()
+        except json.JSONDecodeError:
+            self._send_json({"error": "invalid JSON"}, status=400)
+            return
+        model = body.get("model", "")
+        if model and model not in self.state.options.models:
+            self._send_json({"error": f"model '{model}' not found"}, status=404)
+            return
+        handler(body)
+    
+    # -------------------------------------------------------------------------
+    # Endpoints
+    # -------------------------------------------------------------------------
+    
+    def _embed_texts(self, model: str, texts: list[str], keep_alive) -> tuple[list, float]:
+        options = self.state.options
+        load_s, _ = self.state.touch_model(model, keep_alive)
+        work_s = options.embed_ms * len(texts) / 1000
+        time.sleep(load_s + work_s)
+        return [fake_embedding(t, options.embedding_dim) for t in texts], load_s
+    
+    def _embed(self, body: dict) -> None:
+        texts = body.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        started = time.perf_counter_ns()
+        vectors, load_s = self._embed_texts(body.get("model", ""), texts, body.get("keep_alive"))
+        self._send_json({
+            "model": body.get("model", ""),
+            "embeddings": vectors,
+            "total_duration": time.perf_counter_ns() - started,
+            "load_duration": int(load_s * 1e9),
+            "prompt_eval_count": sum(count_tokens(t) for t in texts),
+        })
+    
+    def _embeddings(self, body: dict) -> None:
+        vectors, _ = self._embed_texts(
+            body.get("model", ""), [body.get("prompt", "")], body.get("keep_alive")
+        )
+        self._send_json({"embedding": vectors[0]})
+    
+    def _show(self, body: dict) -> None:
+        self._send_json({
+            "modelfile": "",
+            "parameters": "",
+            "template": "",
+            "details": {"format": "gguf", "family": "fake"},
+            "model_info": {},
+            "capabilities": ["completion", "tools", "embedding"],
+        })
+    
+    def _complete(self, body: dict, prompt: str, content: str, message_key: str | None,
+                  tool_calls: list) -> None:
+        """Send a completion, streamed or not, with Ollama's timing fields."""
+        options = self.state.options
+        model = body.get("model", "")
+        stream = body.get("stream", True)
+        
+        started = time.perf_counter_ns()
+        load_s, last_prompt = self.state.touch_model(model, body.get("keep_alive"))
+        cached_chars = _common_prefix_length(prompt, last_prompt)
+        prompt_tokens = count_tokens(prompt[cached_chars:])
+        prefill_s = prompt_tokens / options.prefill_tps if options.prefill_tps else 0.0
+        time.sleep(load_s + prefill_s)
+        self.state.remember_prompt(model, prompt)
+        
+        pieces = re.findall(r"\S+\s*", content)
+        token_delay = 1 / options.decode_tps if options.decode_tps else 0.0
+        decode_started = time.perf_counter_ns()
+        
+        def wrap(text: str, extra: dict | None = None) -> dict:
+            payload = {"model": model, "created_at": _timestamp()}
+            if message_key:
+                payload["message"] = {"role": "assistant", "content": text, **(extra or {})}
+            else:
+                payload["response"] = text
+            return payload
+        
+        def final() -> dict:
+            now = time.perf_counter_ns()
+            return {
+                "done": True,
+                "done_reason": "stop",
+                "total_duration": now - started,
+                "load_duration": int(load_s * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prefill_s * 1e9),
+                "eval_count": len(pieces) + len(tool_calls),
+                "eval_duration": now - decode_started,
+            }
+        
+        if stream:
+            self._start_stream()
+            for piece in pieces:
+                time.sleep(token_delay)
+                self._send_line({**wrap(piece), "done": False})
+            if tool_calls:
+                time.sleep(token_delay * len(tool_calls))
+                self._send_line({**wrap("", {"tool_calls": tool_calls}), "done": False})
+            self._send_line({**wrap(""), **final()})
+        else:
+            time.sleep(token_delay * (len(pieces) + len(tool_calls)))
+            extra = {"tool_calls": tool_calls} if tool_calls else None
+            self._send_json({**wrap(content, extra), **final()})
+    
+    def _chat(self, body: dict) -> None:
+        messages = body.get("messages", [])
+        content, tool_calls = self.state.plan_reply(messages, body.get("tools"))
+        self._complete(body, _message_text(messages), content, "message", tool_calls)
+    
+    def _generate(self, body: dict) -> None:
+        prompt = body.get("prompt", "")
+        content, _ = self.state.plan_reply([{"role": "user", "content": prompt}], None)
+        if not prompt:
+            # An empty prompt only loads the model, like Ollama
+            content = ""
+        self._complete(body, prompt, content, None, [])
+
+
+# =============================================================================
+# ENTRY POINTS
+# =============================================================================
+
+def start_fake_ollama(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    options: FakeOllamaOptions | None = None,
+) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Start the fake Ollama server in a background thread.
+    
+    Args:
+        host: Interface to bind
+        port: Port to listen on (0 picks a free port)
+        options: Server behaviour, defaults to instant responses
+    
+    Returns:
+        (server, base URL); call server.shutdown() to stop it
+    """
+    handler = type("BoundFakeOllamaHandler", (FakeOllamaHandler,), {
+        "state": FakeOllama(options or FakeOllamaOptions()),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    
+    bound_host, bound_port = server.server_address[:2]
+    return server, f"http://{bound_host}:{bound_port}"
+
+
+def load_script(path: str | Path) -> list[dict]:
+    """
+    Load completion rules from a JSON file.
+    
+    Args:
+        path: Path to a JSON list of rules
+    
+    Returns:
+        List of rule dictionaries
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline Ollama stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--dim", type=int, default=1024, help="embedding dimension")
+    parser.add_argument("--load-ms", type=float, default=0.0, help="model load time")
+    parser.add_argument("--keep-alive", type=float, default=300.0, help="default keep_alive seconds")
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="time per embedded text")
+    parser.add_argument("--prefill-tps", type=float, default=0.0, help="prompt tokens/second")
+    parser.add_argument("--decode-tps", type=float, default=0.0, help="generated tokens/second")
+    parser.add_argument("--response-tokens", type=int, default=48)
+    parser.add_argument("--script", help="JSON file with completion rules")
+    parser.add_argument("--no-tools", action="store_true", help="never call tools by default")
+    args = parser.parse_args()
+    
+    server, url = start_fake_ollama(args.host, args.port, FakeOllamaOptions(
+        embedding_dim=args.dim,
+        load_ms=args.load_ms,
+        keep_alive_s=args.keep_alive,
+        embed_ms=args.embed_ms,
+        prefill_tps=args.prefill_tps,
+        decode_tps=args.decode_tps,
+        response_tokens=args.response_tokens,
+        script=load_script(args.script) if args.script else None,
+        default_tool=None if args.no_tools else "search_novels",
+    ))
+    print(f"Fake Ollama listening on {url}")
+    print(f"  export OLLAMA_BASE_URL={url}")
+    
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
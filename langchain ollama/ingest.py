@@ -3,14 +3,74 @@ Data ingestion pipeline for light novel volumes.
 Handles loading, splitting, embedding, and storing documents.
 """
 
+import hashlib
 import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
-from config import PDF_DIR, REGISTRY_FILE
+from config import (
+    PDF_DIR, REGISTRY_FILE, DEDUP_ENABLED, FINGERPRINT_FILE, CHROMA_DIR,
+    CHROMA_COLLECTION_NAME, LEGACY_COLLECTION_NAME, LEGACY_EMBEDDING_MODEL,
+    EMBEDDING_BACKEND, EMBEDDING_MODEL, INGEST_BATCH_SIZE, INGEST_MAX_RETRIES,
+    INGEST_RETRY_BASE_DELAY_S, INGEST_RETRY_MAX_DELAY_S, SHARDING_ENABLED,
+    STAGING_COLLECTION_NAME, ensure_directories,
+)
 from loaders import load_document, get_all_pdf_files, get_all_text_files
-from splitter import split_documents
-from vectorstore import add_documents, get_collection_stats
+from splitter import split_documents, deduplicate_chunks, FingerprintIndex
+from embedding import embed_documents
+from vectorstore import (
+    add_embedded_documents, get_collection_stats, count_collection,
+    copy_collection, drop_collection, delete_source_documents, list_source_files,
+)
+from metrics import counter, gauge, histogram
+from shards import collection_for_volume, total_count as sharded_count
+
+INGEST_FILES = counter("rag_ingest_files_total", "Files processed by ingest", ("status",))
+INGEST_CHUNKS = counter("rag_ingest_chunks_total", "Chunks embedded and stored")
+INGEST_DUPLICATES = counter("rag_ingest_duplicates_total", "Near-duplicate chunks skipped")
+INGEST_STAGE_LATENCY = histogram(
+    "rag_ingest_stage_seconds", "Per-file ingest stage duration", ("stage",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0),
+)
+INGEST_THROUGHPUT = gauge(
+    "rag_ingest_chunks_per_second", "Chunks per second over the most recent file"
+)
+INGEST_BATCH_RETRIES = counter("rag_ingest_batch_retries_total", "Chunk batches retried after an error")
+
+# Serializes read-modify-write updates of the registry and fingerprints
+_registry_lock = threading.RLock()
+
+
+class StageTimings:
+    """
+    Records how long each ingest stage takes.
+    
+    A stage entered several times (embed and store run once per batch)
+    accumulates its time. Subclasses can override ``stage`` to capture more than wall time
+    (see bench_ingest.py).
+    """
+    
+    def __init__(self):
+        self.stages: dict[str, dict] = {}
+    
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            previous = self.stages.get(name, {}).get("wall_s", 0.0)
+            self.stages[name] = {"wall_s": previous + time.perf_counter() - start}
+    
+    def as_dict(self) -> dict:
+        """Return wall seconds per stage."""
+        return {name: round(info["wall_s"], 4) for name, info in self.stages.items()}
 
 
 def load_registry() -> dict:
@@ -26,95 +86,401 @@ def load_registry() -> dict:
     return {}
 
 
+def _write_json_atomic(path: Path, data, **kwargs) -> None:
+    """Write JSON to a temporary file and rename it over ``path``."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, **kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
 def save_registry(registry: dict) -> None:
     """
     Save the registry to file.
     
+    The file is replaced atomically, so a crash never leaves it half
+    written.
+    
     Args:
         registry: Registry dictionary to save
     """
-    with open(REGISTRY_FILE, "w", encoding="utf-8") as f:
-        json.dump(registry, f, indent=2)
+    with _registry_lock:
+        _write_json_atomic(REGISTRY_FILE, registry, indent=2)
+
+
+def update_registry_entry(filename: str, entry: dict | None) -> None:
+    """
+    Replace (or with None, remove) one volume's registry entry.
+    
+    Args:
+        filename: Volume filename
+        entry: New entry, or None to remove it
+    """
+    with _registry_lock:
+        registry = load_registry()
+        if entry is None:
+            registry.pop(filename, None)
+        else:
+            registry[filename] = entry
+        save_registry(registry)
+
+
+def load_fingerprints() -> dict:
+    """
+    Load the stored chunk fingerprints of every ingested volume.
+    
+    Returns:
+        Dictionary mapping filenames to lists of hex fingerprints
+    """
+    if FINGERPRINT_FILE.exists():
+        with open(FINGERPRINT_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_fingerprints(fingerprints: dict) -> None:
+    """
+    Save the chunk fingerprints to file.
+    
+    Args:
+        fingerprints: Fingerprint dictionary to save
+    """
+    ensure_directories()
+    with _registry_lock:
+        _write_json_atomic(FINGERPRINT_FILE, fingerprints)
+
+
+def build_fingerprint_index(exclude: str | None = None) -> FingerprintIndex:
+    """
+    Build a fingerprint index over the library.
+    
+    Args:
+        exclude: Filename whose fingerprints should be left out,
+            typically the volume that is being (re-)ingested
+        
+    Returns:
+        FingerprintIndex containing all other volumes' chunks
+    """
+    index = FingerprintIndex()
+    for filename, hex_fingerprints in load_fingerprints().items():
+        if filename == exclude:
+            continue
+        for value in hex_fingerprints:
+            index.add(int(value, 16))
+    return index
 
 
 def is_volume_processed(filename: str) -> bool:
     """
     Check if a volume has already been processed.
     
+    A volume the watcher is staging counts as processed: the watcher
+    swaps it in, so ingesting it directly would only duplicate its chunks.
+    
     Args:
         filename: Name of the file to check
         
     Returns:
         True if already processed, False otherwise
     """
-    registry = load_registry()
-    return filename in registry and registry[filename].get("status") == "embedded"
+    return is_volume_live(filename) or is_volume_staged(filename)
+
+
+def is_volume_live(filename: str) -> bool:
+    """
+    Check if a volume is fully stored in the collection it belongs to.
+    
+    A volume still in the single collection counts as well: retrieval
+    keeps searching it until ``shards.py --migrate`` moves it, so turning
+    sharding on does not re-embed the library.
+    
+    Args:
+        filename: Name of the file to check
+    
+    Returns:
+        True if embedded in its shard (or the single collection)
+    """
+    entry = load_registry().get(filename, {})
+    collection = entry.get("collection", CHROMA_COLLECTION_NAME)
+    return (
+        entry.get("status") == "embedded"
+        and collection in (collection_for_volume(filename), CHROMA_COLLECTION_NAME)
+    )
 
 
-def ingest_file(file_path: str | Path, force: bool = False) -> dict:
+def is_volume_staged(filename: str) -> bool:
+    """
+    Check if the watcher is re-ingesting a volume into the staging collection.
+    
+    Args:
+        filename: Name of the file to check
+    
+    Returns:
+        True while the volume is (partly) in staging, awaiting the swap
+    """
+    return load_registry().get(filename, {}).get("collection") == STAGING_COLLECTION_NAME
+
+
+def file_signature(file_path: str | Path) -> dict:
+    """
+    Size, modification time and SHA-256 of a file's contents.
+    
+    Args:
+        file_path: File to hash
+    
+    Returns:
+        Dictionary with "size", "mtime_ns" and "sha256"
+    """
+    path = Path(file_path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+
+def chunk_id(filename: str, index: int, text: str) -> str:
+    """
+    Deterministic ID of a chunk.
+    
+    Re-running an interrupted ingest produces the same IDs, so batches
+    written twice overwrite themselves instead of adding duplicates.
+    """
+    digest = hashlib.sha256(f"{filename}\0{index}\0{text}".encode("utf-8")).hexdigest()
+    return digest[:32]
+
+
+def _plan_hash(ids: list[str]) -> str:
+    """Identify a volume's chunk list, to check a checkpoint still applies."""
+    return hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()[:16]
+
+
+def _with_retries(description: str, function, *args, **kwargs):
+    """
+    Call ``function``, retrying with jittered exponential backoff.
+    
+    Args:
+        description: What is being attempted, for log messages
+        function: Callable to run
+        *args, **kwargs: Passed to ``function``
+    
+    Returns:
+        The function's result; the last exception is raised once
+        INGEST_MAX_RETRIES retries are used up
+    """
+    for attempt in range(INGEST_MAX_RETRIES + 1):
+        try:
+            return function(*args, **kwargs)
+        except Exception as e:
+            if attempt == INGEST_MAX_RETRIES:
+                raise
+            delay = min(INGEST_RETRY_MAX_DELAY_S, INGEST_RETRY_BASE_DELAY_S * 2 ** attempt)
+            delay *= random.uniform(0.5, 1.0)
+            INGEST_BATCH_RETRIES.inc()
+            print(f"  {description} failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+def ingest_file(
+    file_path: str | Path,
+    force: bool = False,
+    timings: StageTimings | None = None,
+    collection_name: str | None = None,
+) -> dict:
     """
     Ingest a single file into the vector store.
     
     Args:
         file_path: Path to the file to ingest
         force: If True, re-ingest even if already processed
+        timings: Stage recorder; a plain StageTimings is used if omitted
+        collection_name: Collection to write to (default: the volume's
+            shard, or the single collection without sharding; the
+            watcher stages re-ingested volumes in a separate one)
         
     Returns:
-        Dictionary with ingestion results
+        Dictionary with ingestion results, including per-stage timings
     """
+    if timings is None:
+        timings = StageTimings()
+    
     file_path = Path(file_path)
     filename = file_path.name
     
-    # Check if already processed
-    if not force and is_volume_processed(filename):
+    # Check if already processed (staging runs resume instead)
+    if not force and collection_name != STAGING_COLLECTION_NAME and is_volume_processed(filename):
+        INGEST_FILES.labels(status="skipped").inc()
         return {
             "filename": filename,
             "status": "skipped",
             "message": "Already processed. Use force=True to re-ingest."
         }
     
+    # Only volumes actually written register their series' shard
+    if collection_name is None:
+        collection_name = collection_for_volume(filename, register=True)
+    
     try:
+        signature = file_signature(file_path)
+        
         # Load the document
         print(f"Loading {filename}...")
-        documents = load_document(file_path)
+        with timings.stage("load"):
+            documents = load_document(file_path)
         print(f"  Loaded {len(documents)} pages/sections")
         
         # Split into chunks
         print("  Splitting into chunks...")
-        chunks = split_documents(documents)
+        with timings.stage("split"):
+            chunks = split_documents(documents)
         print(f"  Created {len(chunks)} chunks")
         
-        # Add to vector store
+        # Drop near-duplicates within the volume and across the library
+        duplicates = 0
+        if DEDUP_ENABLED:
+            split_count = len(chunks)
+            with timings.stage("dedup"):
+                chunks = deduplicate_chunks(chunks, build_fingerprint_index(exclude=filename))
+            duplicates = split_count - len(chunks)
+            print(f"  Skipped {duplicates} near-duplicate chunks")
+        
+        # Resume after the last stored batch when the checkpoint matches
+        # this exact chunk list; otherwise start clean
+        ids = [chunk_id(filename, i, chunk.page_content) for i, chunk in enumerate(chunks)]
+        plan = _plan_hash(ids)
+        entry = load_registry().get(filename, {})
+        resume_from = 0
+        resumable = (
+            entry.get("status") == "partial"
+            and entry.get("plan") == plan
+            and entry.get("collection", CHROMA_COLLECTION_NAME) == collection_name
+        )
+        if not force and resumable:
+            resume_from = entry.get("chunks_done", 0)
+        
+        checkpoint = {
+            "status": "partial",
+            "chunks": len(chunks),
+            "chunks_done": resume_from,
+            "plan": plan,
+            "pages": len(documents),
+            "duplicates_skipped": duplicates,
+            "last_updated": datetime.now().isoformat(),
+            "file_path": str(file_path),
+            "collection": collection_name,
+            **signature,
+        }
+        
+        if resume_from:
+            print(f"  Resuming after {resume_from}/{len(chunks)} stored chunks")
+        else:
+            # Mark the volume partial first: if the old chunks are gone and
+            # no batch gets stored, later runs must not skip it as processed
+            update_registry_entry(filename, checkpoint)
+            with timings.stage("delete"):
+                removed = delete_source_documents(filename, collection_name=collection_name)
+                # The volume moved to another shard: clear the old one too
+                previous = entry.get("collection", CHROMA_COLLECTION_NAME)
+                if entry and previous not in (collection_name, STAGING_COLLECTION_NAME) \
+                        and collection_name != STAGING_COLLECTION_NAME:
+                    removed += delete_source_documents(filename, collection_name=previous)
+            if removed:
+                print(f"  Removed {removed} previously stored chunks")
+        
+        # Embed and store batch by batch, checkpointing after each one
         print("  Embedding and storing...")
-        add_documents(chunks)
+        for start in range(resume_from, len(chunks), INGEST_BATCH_SIZE):
+            batch = chunks[start:start + INGEST_BATCH_SIZE]
+            batch_ids = ids[start:start + INGEST_BATCH_SIZE]
+            label = f"Batch {start // INGEST_BATCH_SIZE + 1}/{-(-len(chunks) // INGEST_BATCH_SIZE)}"
+            
+            with timings.stage("embed"):
+                vectors = _with_retries(
+                    f"{label} embedding", embed_documents, [chunk.page_content for chunk in batch]
+                )
+            with timings.stage("store"):
+                _with_retries(
+                    f"{label} storing", add_embedded_documents, batch, vectors, batch_ids,
+                    collection_name=collection_name,
+                )
+            
+            checkpoint.update(chunks_done=start + len(batch), last_updated=datetime.now().isoformat())
+            update_registry_entry(filename, checkpoint)
         print("  Done!")
         
-        # Update registry
-        registry = load_registry()
-        registry[filename] = {
+        if DEDUP_ENABLED:
+            with _registry_lock:
+                fingerprints = load_fingerprints()
+                fingerprints[filename] = [chunk.metadata["simhash"] for chunk in chunks]
+                save_fingerprints(fingerprints)
+        
+        # Mark the volume complete
+        update_registry_entry(filename, {
             "status": "embedded",
             "chunks": len(chunks),
             "pages": len(documents),
+            "duplicates_skipped": duplicates,
             "last_updated": datetime.now().isoformat(),
             "file_path": str(file_path),
-        }
-        save_registry(registry)
+            "collection": collection_name,
+            **signature,
+        })
+        
+        INGEST_FILES.labels(status="success").inc()
+        INGEST_CHUNKS.inc(len(chunks))
+        INGEST_DUPLICATES.inc(duplicates)
+        total_s = 0.0
+        for stage, info in timings.stages.items():
+            INGEST_STAGE_LATENCY.labels(stage=stage).observe(info["wall_s"])
+            total_s += info["wall_s"]
+        if total_s:
+            INGEST_THROUGHPUT.set(len(chunks) / total_s)
         
         return {
             "filename": filename,
             "status": "success",
             "chunks": len(chunks),
             "pages": len(documents),
+            "duplicates_skipped": duplicates,
+            "timings": timings.as_dict(),
         }
         
     except Exception as e:
+        INGEST_FILES.labels(status="error").inc()
+        # Stored batches stay checkpointed; the next run resumes after them
         return {
             "filename": filename,
             "status": "error",
             "message": str(e),
+            "chunks_done": load_registry().get(filename, {}).get("chunks_done", 0),
         }
 
 
+def remove_volume(filename: str) -> int:
+    """
+    Remove a volume's chunks, registry entry and fingerprints.
+    
+    Args:
+        filename: Volume filename
+    
+    Returns:
+        Number of chunks deleted
+    """
+    entry = load_registry().get(filename, {})
+    removed = delete_source_documents(
+        filename, collection_name=entry.get("collection") or collection_for_volume(filename)
+    )
+    with _registry_lock:
+        update_registry_entry(filename, None)
+        fingerprints = load_fingerprints()
+        if fingerprints.pop(filename, None) is not None:
+            save_fingerprints(fingerprints)
+    return removed
+
+
 def ingest_directory(
     directory: str | Path = PDF_DIR,
     force: bool = False,
@@ -129,6 +495,7 @@ def ingest_directory(
     Returns:
         List of ingestion results for each file
     """
+    ensure_directories()
     directory = Path(directory)
     results = []
     
@@ -154,6 +521,8 @@ def ingest_directory(
             print(f"○ {result['filename']}: Skipped (already processed)")
         else:
             print(f"✗ {result['filename']}: Error - {result.get('message', 'Unknown')}")
+            if result.get("chunks_done"):
+                print(f"  {result['chunks_done']} chunks are stored; run again to resume")
     
     return results
 
@@ -162,20 +531,69 @@ def get_ingestion_status() -> dict:
     """
     Get the current ingestion status.
     
+    Reads the registry and counts the collection without loading the
+    embedding model or LLM stack, so it is cheap to call at startup.
+    
     Returns:
         Dictionary with status information
     """
     registry = load_registry()
-    stats = get_collection_stats()
+    partial = sum(1 for info in registry.values() if info.get("status") == "partial")
+    if SHARDING_ENABLED:
+        stats = {"count": sharded_count(), "name": f"{CHROMA_COLLECTION_NAME} (sharded by series)"}
+    else:
+        stats = get_collection_stats()
     
     return {
-        "volumes_processed": len(registry),
+        "volumes_processed": len(registry) - partial,
+        "volumes_partial": partial,
         "total_chunks_in_db": stats.get("count", 0),
         "collection_name": stats.get("name", "Unknown"),
         "volumes": registry,
     }
 
 
+def migrate_legacy_collection() -> dict:
+    """
+    Merge the old app.py collection into the shared one.
+    
+    The single-file app.py used to store its chunks in a separate
+    ``light_novels`` collection while writing the same registry, so the
+    core would skip those files and never find their chunks. Their
+    vectors are copied over as they are (no re-embedding), into each
+    volume's shard when sharding is enabled, and the old collection is
+    dropped. When the configured embedding model is not
+    the one app.py used, the vectors would not be comparable: nothing is
+    copied and the caller should suggest a re-ingest instead.
+    
+    Returns:
+        Dictionary with "status" ("none", "migrated" or "incompatible")
+        and the number of legacy "chunks"
+    """
+    chunks = count_collection(CHROMA_DIR, LEGACY_COLLECTION_NAME)
+    if chunks == 0:
+        return {"status": "none", "chunks": 0}
+    
+    if EMBEDDING_BACKEND != "ollama" or EMBEDDING_MODEL != LEGACY_EMBEDDING_MODEL:
+        return {"status": "incompatible", "chunks": chunks}
+    
+    if SHARDING_ENABLED:
+        copied = 0
+        for filename in list_source_files(CHROMA_DIR, LEGACY_COLLECTION_NAME):
+            collection = collection_for_volume(filename, register=True)
+            copied += copy_collection(
+                LEGACY_COLLECTION_NAME, collection, CHROMA_DIR, where={"source_file": filename}
+            )
+            # app.py wrote the shared registry without a collection
+            entry = load_registry().get(filename)
+            if entry is not None:
+                update_registry_entry(filename, {**entry, "collection": collection})
+    else:
+        copied = copy_collection(LEGACY_COLLECTION_NAME, CHROMA_COLLECTION_NAME, CHROMA_DIR)
+    drop_collection(CHROMA_DIR, LEGACY_COLLECTION_NAME)
+    return {"status": "migrated", "chunks": copied}
+
+
 def clear_and_reingest(directory: str | Path = PDF_DIR) -> list[dict]:
     """
     Clear the registry and re-ingest all files.
@@ -186,8 +604,9 @@ def clear_and_reingest(directory: str | Path = PDF_DIR) -> list[dict]:
     Returns:
         List of ingestion results
     """
-    # Clear registry
+    # Clear registry and library fingerprints
     save_registry({})
+    save_fingerprints({})
     
     # Re-ingest all
     return ingest_directory(directory, force=True)
@@ -205,7 +624,10 @@ if __name__ == "__main__":
             print(f"  Collection: {status['collection_name']}")
             print("\nProcessed volumes:")
             for vol, info in status['volumes'].items():
-                print(f"  - {vol}: {info['chunks']} chunks, {info['pages']} pages")
+                line = f"  - {vol}: {info['chunks']} chunks, {info['pages']} pages"
+                if info.get("status") == "partial":
+                    line += f" (interrupted at {info['chunks_done']}, will resume)"
+                print(line)
         
         elif sys.argv[1] == "--reingest":
             print("Clearing and re-ingesting all files...")
@@ -1,16 +1,18 @@
 """
 Document loaders for PDF and TXT files.
 Handles loading of light novel volumes.
+
+langchain_community and pypdf are imported on first load, so listing
+files and importing this module stay cheap.
 """
 
+from __future__ import annotations
+
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    TextLoader,
-    DirectoryLoader,
-)
-from langchain_core.documents import Document
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
 
 
 def load_pdf(file_path: str | Path) -> list[Document]:
@@ -23,6 +25,8 @@ def load_pdf(file_path: str | Path) -> list[Document]:
     Returns:
         List of Document objects (one per page)
     """
+    from langchain_community.document_loaders import PyPDFLoader
+    
     loader = PyPDFLoader(str(file_path))
     documents = loader.load()
     
@@ -44,6 +48,8 @@ def load_text(file_path: str | Path) -> list[Document]:
     Returns:
         List of Document objects
     """
+    from langchain_community.document_loaders import TextLoader
+    
     loader = TextLoader(str(file_path), encoding="utf-8")
     documents = loader.load()
     
@@ -87,6 +93,8 @@ def load_directory(directory_path: str | Path, glob_pattern: str = "**/*.pdf") -
     Returns:
         List of Document objects from all matching files
     """
+    from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader
+    
     loader = DirectoryLoader(
         str(directory_path),
         glob=glob_pattern,
@@ -1,14 +1,29 @@
 """
 User interaction interface for the Light Novel AI Agent.
 Provides CLI-based interaction with the agent.
+
+The agent stack (LangChain, Ollama clients, Chroma) is loaded in a
+background thread while the prompt is already shown; ``--status``
+never loads it at all. ``--batch questions.jsonl`` answers a file of
+questions non-interactively (see batch.py). ``--watch`` (on its own or
+with ``--serve``) ingests volumes dropped into .pdfs in the background
+(see watcher.py). ``--compact`` rebuilds the vector store's indexes with
+the HNSW settings from config.py and reclaims disk space; it takes the
+options of compaction.py, e.g. ``--compact --measure-only``.
 """
 
+import atexit
 import sys
+import threading
 from pathlib import Path
 
-from config import PDF_DIR
-from agent import LightNovelAgent, SimpleRAGChain
-from ingest import ingest_directory, ingest_file, get_ingestion_status
+from config import (
+    PDF_DIR, SERVE_HOST, SERVE_PORT, METRICS_PORT, METRICS_FILE,
+    WARMUP_ON_START, ensure_directories,
+)
+from ingest import ingest_directory, ingest_file, get_ingestion_status, migrate_legacy_collection
+from profiling import enable_profiling, is_profiling_enabled, get_last_turn, format_turn
+from metrics import start_metrics_server, write_metrics
 
 
 def print_banner():
@@ -32,13 +47,81 @@ Available Commands:
   /clear      - Clear conversation history
   /simple     - Switch to simple RAG mode (no tools)
   /agent      - Switch to full agent mode (with tools)
+  /profile    - Show the latency breakdown of the last turn
+  /profile on|off - Print a breakdown after every turn
   /quit       - Exit the application
 
 Just type your question to chat with the agent!
 """)
 
 
-def handle_command(command: str, agent, mode: list) -> bool:
+class BackgroundStartup:
+    """
+    Checks ingestion status and builds the agents off the main thread.
+    
+    The prompt appears immediately; the first command that needs an
+    agent waits for the thread to finish.
+    """
+    
+    def __init__(self):
+        self.status: dict | None = None
+        self.migration: dict | None = None
+        self.agent = None
+        self.simple_chain = None
+        self._error: Exception | None = None
+        self._warned = False
+        self._thread = threading.Thread(target=self._run, name="startup", daemon=True)
+        self._thread.start()
+    
+    def _run(self) -> None:
+        try:
+            # Chunks left by the old app.py go into the shared collection first
+            self.migration = migrate_legacy_collection()
+            self.status = get_ingestion_status()
+            
+            from agent import LightNovelAgent, SimpleRAGChain
+            
+            self.agent = LightNovelAgent()
+            self.simple_chain = SimpleRAGChain()
+        except Exception as e:
+            self._error = e
+    
+    def wait(self) -> "BackgroundStartup":
+        """Block until startup finishes, re-raising any startup error."""
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        
+        if not self._warned and self.migration and self.migration["status"] != "none":
+            chunks = self.migration["chunks"]
+            if self.migration["status"] == "migrated":
+                print(f"ℹ️  Merged {chunks} chunks from the old 'light_novels' collection.\n")
+            else:
+                print(f"⚠️  {chunks} chunks in the old 'light_novels' collection use another embedding model.")
+                print("   Clear the registry and re-ingest to include them.\n")
+        
+        if not self._warned and self.status and self.status['total_chunks_in_db'] == 0:
+            print("⚠️  No documents ingested yet!")
+            print(f"   Put PDFs in: {PDF_DIR}")
+            print("   Then run: /ingest\n")
+        self._warned = True
+        return self
+
+
+def print_status():
+    """Print the ingestion status."""
+    status = get_ingestion_status()
+    print(f"\n📊 Ingestion Status:")
+    print(f"   Volumes: {status['volumes_processed']}")
+    print(f"   Chunks: {status['total_chunks_in_db']}")
+    if status['volumes']:
+        print("   Files:")
+        for vol, info in status['volumes'].items():
+            print(f"     - {vol}: {info['chunks']} chunks")
+    print()
+
+
+def handle_command(command: str, startup: BackgroundStartup, mode: list) -> bool:
     """Handle special commands. Returns False to quit."""
     cmd = command.lower().strip()
     
@@ -50,15 +133,7 @@ def handle_command(command: str, agent, mode: list) -> bool:
         print_help()
     
     elif cmd == "/status":
-        status = get_ingestion_status()
-        print(f"\n📊 Ingestion Status:")
-        print(f"   Volumes: {status['volumes_processed']}")
-        print(f"   Chunks: {status['total_chunks_in_db']}")
-        if status['volumes']:
-            print("   Files:")
-            for vol, info in status['volumes'].items():
-                print(f"     - {vol}: {info['chunks']} chunks")
-        print()
+        print_status()
     
     elif cmd == "/ingest":
         print("📥 Ingesting files from .pdfs folder...")
@@ -75,7 +150,7 @@ def handle_command(command: str, agent, mode: list) -> bool:
             print(f"File not found: {file_path}")
     
     elif cmd == "/clear":
-        agent.clear_history()
+        startup.wait().agent.clear_history()
         print("🧹 Conversation history cleared.")
     
     elif cmd == "/simple":
@@ -86,6 +161,28 @@ def handle_command(command: str, agent, mode: list) -> bool:
         mode[0] = "agent"
         print("🔄 Switched to full agent mode.")
     
+    elif cmd == "/profile on":
+        enable_profiling(True)
+        print("⏱️  Profiling enabled.")
+    
+    elif cmd == "/profile off":
+        enable_profiling(False)
+        print("⏱️  Profiling disabled.")
+    
+    elif cmd == "/profile":
+        last_turn = get_last_turn()
+        if last_turn is None:
+            print("No profiled turn yet. Enable profiling with /profile on.")
+        else:
+            print(f"\n{format_turn(last_turn)}\n")
+        
+        if startup.agent is not None:
+            chain = startup.agent if mode[0] == "agent" else startup.simple_chain
+            reuse = chain.prefix_tracker.summary()
+            if reuse["calls"]:
+                print(f"Prompt prefix reuse: {reuse['shared_ratio']:.0%} of ~{reuse['prompt_tokens']} "
+                      f"prompt tokens over {reuse['calls']} LLM calls\n")
+    
     else:
         print(f"Unknown command: {command}")
         print("Type /help for available commands.")
@@ -93,20 +190,28 @@ def handle_command(command: str, agent, mode: list) -> bool:
     return True
 
 
+def start_watcher():
+    """Ingest new and changed volumes in the background."""
+    from watcher import DirectoryWatcher
+    
+    watcher = DirectoryWatcher(
+        on_indexed=lambda filename, action: print(f"\n📥 {filename}: {action}, now searchable"),
+    ).start()
+    print(f"👀 Watching {watcher.directory} for new volumes ({watcher.mode})")
+    return watcher
+
+
 def main():
     """Main entry point for the CLI."""
     print_banner()
+    ensure_directories()
     
-    # Check ingestion status
-    status = get_ingestion_status()
-    if status['total_chunks_in_db'] == 0:
-        print("⚠️  No documents ingested yet!")
-        print(f"   Put PDFs in: {PDF_DIR}")
-        print("   Then run: /ingest\n")
-    
-    # Initialize agents
-    agent = LightNovelAgent()
-    simple_chain = SimpleRAGChain()
+    # Check ingestion status and initialize agents in the background
+    startup = BackgroundStartup()
+    if WARMUP_ON_START:
+        from warmup import warm_up_in_background
+        
+        warm_up_in_background()
     mode = ["agent"]  # Using list for mutability
     
     print("Ready! Type your question or /help for commands.\n")
@@ -119,20 +224,24 @@ def main():
                 continue
             
             if user_input.startswith("/"):
-                if not handle_command(user_input, agent, mode):
+                if not handle_command(user_input, startup, mode):
                     break
                 continue
             
             # Get response based on mode
             print("\n🤔 Thinking...\n")
+            ready = startup.wait()
             
             if mode[0] == "simple":
-                response = simple_chain.query(user_input)
+                response = ready.simple_chain.query(user_input)
             else:
-                response = agent.chat(user_input)
+                response = ready.agent.chat(user_input)
             
             print(f"Agent: {response}\n")
             
+            if is_profiling_enabled() and get_last_turn() is not None:
+                print(f"{format_turn(get_last_turn())}\n")
+        
         except KeyboardInterrupt:
             print("\n\nGoodbye! 👋")
             break
@@ -141,4 +250,42 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if METRICS_FILE:
+        atexit.register(write_metrics, METRICS_FILE)
+    
+    watch = "--watch" in sys.argv
+    if watch:
+        sys.argv.remove("--watch")
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "--status":
+        print_status()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        from server import serve
+        
+        # Optional port: python main.py --serve 9000
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else SERVE_PORT
+        if watch:
+            start_watcher()
+        serve(SERVE_HOST, port)
+    elif len(sys.argv) > 1 and sys.argv[1] == "--compact":
+        from compaction import main as compact
+        
+        # python main.py --compact [--collection NAME] [--queries N] [--measure-only]
+        compact(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        if len(sys.argv) < 3:
+            print("Usage: python main.py --batch questions.jsonl [answers.jsonl]")
+            sys.exit(1)
+        
+        from batch import run_batch, print_summary
+        
+        # Generations in flight: BATCH_CONCURRENCY
+        output = sys.argv[3] if len(sys.argv) > 3 else None
+        print_summary(run_batch(sys.argv[2], output))
+    else:
+        if METRICS_PORT:
+            start_metrics_server(METRICS_PORT)
+            print(f"📈 Metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+        if watch:
+            start_watcher()
+        main()
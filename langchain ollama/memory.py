@@ -6,22 +6,28 @@ Handles chat history and context retention.
 from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 
-from config import MEMORY_MAX_MESSAGES
+from config import MEMORY_MAX_MESSAGES, MEMORY_TRIM_TO
 
 
 class ConversationMemory:
     """
     Manages conversation history with a maximum message limit.
+    
+    History is append-only between trims, so successive prompts share
+    a growing prefix that Ollama can serve from its KV cache.
     """
     
-    def __init__(self, max_messages: int = MEMORY_MAX_MESSAGES):
+    def __init__(self, max_messages: int = MEMORY_MAX_MESSAGES, trim_to: int | None = MEMORY_TRIM_TO):
         """
         Initialize conversation memory.
         
         Args:
             max_messages: Maximum number of messages to retain
+            trim_to: Messages kept when the maximum is exceeded
+                (None trims one message at a time)
         """
         self.max_messages = max_messages
+        self.trim_to = min(trim_to or max_messages, max_messages)
         self._history: InMemoryChatMessageHistory = InMemoryChatMessageHistory()
     
     def add_user_message(self, message: str) -> None:
@@ -40,11 +46,14 @@ class ConversationMemory:
         self._trim_history()
     
     def _trim_history(self) -> None:
-        """Trim history to maximum message count."""
+        """Trim history down to ``trim_to`` messages once it exceeds the maximum."""
         messages = self._history.messages
         if len(messages) > self.max_messages:
-            # Keep only the most recent messages
-            self._history.messages = messages[-self.max_messages:]
+            # Keep only the most recent messages, starting at a user turn
+            kept = messages[-self.trim_to:]
+            while kept and not isinstance(kept[0], HumanMessage):
+                kept = kept[1:]
+            self._history.messages = kept
     
     def get_messages(self) -> list[BaseMessage]:
         """Get all messages in history."""
@@ -115,6 +124,16 @@ def clear_session(session_id: str = "default") -> None:
         _sessions[session_id].clear()
 
 
+def remove_session(session_id: str) -> None:
+    """
+    Forget a session's memory entirely.
+    
+    Args:
+        session_id: Session to remove
+    """
+    _sessions.pop(session_id, None)
+
+
 def clear_all_sessions() -> None:
     """Clear all session memories."""
     _sessions.clear()
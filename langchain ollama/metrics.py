@@ -0,0 +1,372 @@
+"""
+Prometheus-style metrics for the Light Novel AI Agent.
+Counters, gauges and histograms rendered in the Prometheus text format.
+
+Modules define their metrics at import time with counter(), gauge() and
+histogram(); every metric lands in one process-wide registry. The
+registry can be scraped over HTTP (start_metrics_server, or GET /metrics
+in serve mode) or dumped to a file for node_exporter's textfile
+collector (write_metrics).
+
+Updating a metric costs a dictionary lookup and a lock acquisition, so
+instrumentation stays on unconditionally.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Latency buckets in seconds, from a cached lookup to a slow generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Metric:
+    """Base class: a named family of labelled values."""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: dict[tuple[str, ...], "_Metric"] = {}
+        self._labelpairs: tuple[tuple[str, str], ...] = ()
+    
+    def labels(self, **labelvalues) -> "_Metric":
+        """
+        Return the child metric for a set of label values.
+        
+        Args:
+            **labelvalues: One value per label name
+        
+        Returns:
+            Child metric sharing this metric's name
+        """
+        key = tuple(str(labelvalues[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    child._labelpairs = tuple(zip(self.labelnames, key))
+                    self._children[key] = child
+        return child
+    
+    def _new_child(self) -> "_Metric":
+        return type(self)(self.name, self.documentation)
+    
+    def _series(self) -> list["_Metric"]:
+        """Children when labelled, otherwise the metric itself."""
+        return list(self._children.values()) if self.labelnames else [self]
+    
+    def _label_text(self, extra: dict | None = None) -> str:
+        pairs = list(self._labelpairs)
+        pairs.extend((extra or {}).items())
+        if not pairs:
+            return ""
+        inner = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+        return "{" + inner + "}"
+    
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for series in self._series():
+            lines.extend(series._samples())
+        return lines
+    
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A value that only goes up."""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+    
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+    
+    @property
+    def value(self) -> float:
+        return self._value
+    
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{self._label_text()} {_format(self._value)}"]
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+    
+    kind = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+    
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = float(value)
+    
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+    
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+    
+    @contextmanager
+    def track_inprogress(self):
+        """Increment for the duration of the block."""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+    
+    @property
+    def value(self) -> float:
+        return self._value
+    
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{self._label_text()} {_format(self._value)}"]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets."""
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+    
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+    
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+    
+    @contextmanager
+    def time(self):
+        """Observe the duration of the block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+    
+    @property
+    def count(self) -> int:
+        return self._count
+    
+    @property
+    def sum(self) -> float:
+        return self._sum
+    
+    def _samples(self) -> list[str]:
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{self._label_text({'le': _format(bound)})} {cumulative}")
+        lines.append(f"{self.name}_bucket{self._label_text({'le': '+Inf'})} {count}")
+        lines.append(f"{self.name}_sum{self._label_text()} {_format(total)}")
+        lines.append(f"{self.name}_count{self._label_text()} {count}")
+        return lines
+
+
+# =============================================================================
+# REGISTRY
+# =============================================================================
+
+_registry: dict[str, _Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric_class, name: str, documentation: str, labelnames, **kwargs) -> _Metric:
+    """Create a metric, or return the existing one with the same name."""
+    with _registry_lock:
+        existing = _registry.get(name)
+        if existing is not None:
+            if not isinstance(existing, metric_class):
+                raise ValueError(f"Metric {name} already registered as {existing.kind}")
+            return existing
+        metric = metric_class(name, documentation, tuple(labelnames), **kwargs)
+        _registry[name] = metric
+        return metric
+
+
+def counter(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    """Get or create a registered Counter."""
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+    """Get or create a registered Gauge."""
+    return _register(Gauge, name, documentation, labelnames)
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+) -> Histogram:
+    """Get or create a registered Histogram."""
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def render_metrics() -> str:
+    """
+    Render every registered metric in the Prometheus text format.
+    
+    Returns:
+        Exposition text ending in a newline
+    """
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+    
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# =============================================================================
+# LLM METRICS
+# =============================================================================
+# Shared by agent.py and tools.py, which both call the chat model.
+
+LLM_REQUESTS = counter("rag_llm_requests_total", "Chat model calls", ("call",))
+LLM_LATENCY = histogram("rag_llm_latency_seconds", "Chat model call latency", ("call",))
+LLM_TOKENS = counter("rag_llm_tokens_total", "Tokens processed by the chat model", ("direction",))
+LLM_IN_FLIGHT = gauge("rag_llm_generations_in_flight", "Chat model calls currently running")
+
+
+@contextmanager
+def track_llm_call(call: str):
+    """
+    Count, time and track as in flight one chat model call.
+    
+    Args:
+        call: Purpose of the call, e.g. "tool_selection" or "answer"
+    """
+    LLM_REQUESTS.labels(call=call).inc()
+    with LLM_IN_FLIGHT.track_inprogress(), LLM_LATENCY.labels(call=call).time():
+        yield
+
+
+def record_llm_tokens(message) -> None:
+    """
+    Add a response's prompt and generated token counts to LLM_TOKENS.
+    
+    Args:
+        message: AIMessage (or merged stream chunk) with usage_metadata
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage.get("input_tokens"):
+        LLM_TOKENS.labels(direction="prompt").inc(usage["input_tokens"])
+    if usage.get("output_tokens"):
+        LLM_TOKENS.labels(direction="generated").inc(usage["output_tokens"])
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+def write_metrics(path: str | Path) -> Path:
+    """
+    Dump the metrics to a file, replacing it atomically.
+    
+    Args:
+        path: Destination, e.g. a node_exporter textfile directory entry
+    
+    Returns:
+        Path written
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(render_metrics(), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return path
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve /metrics from a daemon thread.
+    
+    Args:
+        port: Port to listen on (0 picks a free one)
+        host: Interface to bind
+    
+    Returns:
+        The running server (call shutdown() to stop it)
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+if __name__ == "__main__":
+    # Print everything the instrumented modules register
+    import agent  # noqa: F401
+    import ingest  # noqa: F401
+    
+    print(render_metrics(), end="")
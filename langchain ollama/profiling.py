@@ -0,0 +1,220 @@
+"""
+Opt-in per-turn profiling for the Light Novel AI Agent.
+Records a tree of timed spans for every agent turn.
+
+A turn (one call to LightNovelAgent.chat, SimpleRAGChain.query, ...)
+is the root span. LLM calls, tool runs, query embeddings and vector
+searches inside it become child spans. LLM spans carry Ollama's response
+metadata: load, prefill and decode time plus tokens in and out.
+
+Profiling is off unless PROFILE_ENABLED is set or enable_profiling() is
+called; when off, span() and turn() cost one context-variable lookup.
+Finished turns are passed to registered callbacks and the most recent
+one is kept for get_last_turn().
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+from config import PROFILE_ENABLED
+
+
+class Span:
+    """A timed operation with attributes and child spans."""
+    
+    def __init__(self, name: str, attrs: dict | None = None):
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.children: list["Span"] = []
+        self.start = time.perf_counter()
+        self.end: float | None = None
+    
+    @property
+    def duration_ms(self) -> float:
+        """Duration in milliseconds (up to now if still open)."""
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+    
+    def set(self, **attrs) -> None:
+        """Add or update attributes."""
+        self.attrs.update(attrs)
+    
+    def total(self, name: str) -> float:
+        """Total milliseconds spent in descendant spans called ``name``."""
+        return sum(
+            (child.duration_ms if child.name == name else 0.0) + child.total(name)
+            for child in self.children
+        )
+    
+    def to_dict(self) -> dict:
+        """Serialize the span tree."""
+        return {
+            "name": self.name,
+            "duration_ms": round(self.duration_ms, 2),
+            "attrs": self.attrs,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+_enabled = PROFILE_ENABLED
+_callbacks: list[Callable[[Span], None]] = []
+_last_turn: Span | None = None
+
+
+def enable_profiling(enabled: bool = True) -> None:
+    """Turn turn profiling on or off."""
+    global _enabled
+    _enabled = enabled
+
+
+def is_profiling_enabled() -> bool:
+    """Return True if turns are being profiled."""
+    return _enabled
+
+
+def add_profile_callback(callback: Callable[[Span], None]) -> None:
+    """
+    Register a function called with the root span of every finished turn.
+    
+    Args:
+        callback: Function taking the turn's root Span
+    """
+    _callbacks.append(callback)
+
+
+def remove_profile_callback(callback: Callable[[Span], None]) -> None:
+    """Unregister a profile callback."""
+    if callback in _callbacks:
+        _callbacks.remove(callback)
+
+
+def get_last_turn() -> Span | None:
+    """Return the root span of the most recently finished turn."""
+    return _last_turn
+
+
+def _close(span: Span, token) -> None:
+    span.end = time.perf_counter()
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        # Async generators closed from another context cannot reset the var
+        pass
+
+
+@contextmanager
+def turn(name: str, /, **attrs):
+    """
+    Profile the enclosed block as one agent turn.
+    
+    Yields the root Span, or None when profiling is disabled. Nested
+    turns (e.g. ask -> chat) become child spans of the outer turn.
+    """
+    global _last_turn
+    
+    if not _enabled:
+        yield None
+        return
+    
+    parent = _current_span.get()
+    root = Span(name, attrs)
+    if parent is not None:
+        parent.children.append(root)
+    
+    token = _current_span.set(root)
+    try:
+        yield root
+    finally:
+        _close(root, token)
+        if parent is None:
+            _last_turn = root
+            for callback in list(_callbacks):
+                callback(root)
+
+
+@contextmanager
+def span(name: str, /, **attrs):
+    """
+    Profile the enclosed block as a child of the current span.
+    
+    Yields the new Span, or None when no turn is being profiled.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    
+    child = Span(name, attrs)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        _close(child, token)
+
+
+def record_llm_response(llm_span: Span | None, message) -> None:
+    """
+    Copy Ollama's timing and token counts from a response onto a span.
+    
+    Args:
+        llm_span: Span of the LLM call (None is ignored)
+        message: AIMessage (or final chunk) returned by ChatOllama
+    """
+    if llm_span is None or message is None:
+        return
+    
+    metadata = getattr(message, "response_metadata", None) or {}
+    usage = getattr(message, "usage_metadata", None) or {}
+    
+    def ms(key: str) -> float | None:
+        value = metadata.get(key)
+        return round(value / 1e6, 2) if value is not None else None
+    
+    tokens_in = metadata.get("prompt_eval_count", usage.get("input_tokens"))
+    tokens_out = metadata.get("eval_count", usage.get("output_tokens"))
+    decode_ms = ms("eval_duration")
+    
+    llm_span.set(
+        load_ms=ms("load_duration"),
+        prefill_ms=ms("prompt_eval_duration"),
+        decode_ms=decode_ms,
+        tokens_in=tokens_in,
+        tokens_out=tokens_out,
+    )
+    if decode_ms and tokens_out:
+        llm_span.set(decode_tps=round(tokens_out / (decode_ms / 1000), 1))
+
+
+def format_turn(root: Span) -> str:
+    """
+    Render a turn's span tree with durations and a per-category summary.
+    
+    Args:
+        root: Root span of a turn
+    
+    Returns:
+        Multi-line human-readable breakdown
+    """
+    lines = []
+    
+    def walk(node: Span, depth: int) -> None:
+        details = ", ".join(
+            f"{key}={value}" for key, value in node.attrs.items() if value is not None
+        )
+        suffix = f"  ({details})" if details else ""
+        lines.append(f"{'  ' * depth}{node.name:<{24 - 2 * depth}} {node.duration_ms:>9.1f} ms{suffix}")
+        for child in node.children:
+            walk(child, depth + 1)
+    
+    walk(root, 0)
+    
+    lines.append("")
+    lines.append("Totals: " + ", ".join(
+        f"{name} {root.total(name):.1f} ms"
+        for name in ("llm", "tool", "embed", "vector_search")
+    ))
+    return "\n".join(lines)
@@ -3,8 +3,17 @@ System prompt templates for the Light Novel AI Agent.
 Defines agent identity, context awareness, and response guidelines.
 """
 
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
+from metrics import counter
+
+PROMPT_PREFIX_TOKENS = counter(
+    "rag_prompt_prefix_tokens_total",
+    "Estimated prompt tokens shared with the previous prompt (cacheable) or new",
+    ("part",),
+)
+
 # =============================================================================
 # SYSTEM PROMPTS
 # =============================================================================
@@ -164,6 +173,121 @@ def format_context(documents: list) -> str:
     return "\n\n---\n\n".join(context_parts)
 
 
+def build_chat_messages(
+    system_prompt: str,
+    history: list[BaseMessage],
+    question: str,
+    context: str | None = None,
+) -> list[BaseMessage]:
+    """
+    Assemble a prompt in cache-friendly order.
+    
+    The fixed system prompt comes first, then the append-only history,
+    and only then the per-turn volatile part (retrieved context and the
+    question). Consecutive turns therefore share everything up to the
+    new message, which Ollama does not need to prefill again. The context
+    is never stored in history.
+    
+    Args:
+        system_prompt: Fixed system prompt
+        history: Previous messages (questions and answers only)
+        question: The user's question
+        context: Retrieved passages for this turn, if any
+    
+    Returns:
+        Message list for the chat model
+    """
+    messages = [SystemMessage(content=system_prompt), *history]
+    if context is None:
+        messages.append(HumanMessage(content=question))
+    else:
+        messages.append(HumanMessage(content=(
+            f"Context from Light Novels:\n{context}\n\n"
+            f"User Question: {question}\n\n"
+            "Please provide a helpful answer based on the context above."
+        )))
+    return messages
+
+
+def render_messages(messages: list[BaseMessage] | str) -> str:
+    """Flatten messages into the text order the model sees them in."""
+    if isinstance(messages, str):
+        return messages
+    return "".join(f"<{message.type}>{message.content}\n" for message in messages)
+
+
+class PrefixTracker:
+    """
+    Measures how much of each prompt repeats the previous one.
+    
+    Ollama keeps the KV cache of the last prompt a model processed and
+    only prefills what follows the longest common prefix, so the shared
+    part approximates the prefill that was skipped. Each tracker models
+    one conversation; concurrent sessions on the same model evict each
+    other's cache, which this estimate does not account for.
+    """
+    
+    def __init__(self):
+        self._previous = ""
+        self.calls = 0
+        self.shared_tokens = 0
+        self.prompt_tokens = 0
+    
+    def observe(self, messages: list[BaseMessage] | str) -> dict:
+        """
+        Record a prompt about to be sent.
+        
+        Args:
+            messages: Message list (or prompt string) for the model
+        
+        Returns:
+            Estimated shared and total prompt tokens for this call
+        """
+        text = render_messages(messages)
+        
+        shared_chars = 0
+        for a, b in zip(text, self._previous):
+            if a != b:
+                break
+            shared_chars += 1
+        self._previous = text
+        
+        shared = estimate_tokens(text[:shared_chars])
+        total = estimate_tokens(text)
+        self.calls += 1
+        self.shared_tokens += shared
+        self.prompt_tokens += total
+        PROMPT_PREFIX_TOKENS.labels(part="shared").inc(shared)
+        PROMPT_PREFIX_TOKENS.labels(part="new").inc(total - shared)
+        
+        return {"prefix_shared_tokens": shared, "prompt_tokens_est": total}
+    
+    def summary(self) -> dict:
+        """Totals over every observed prompt."""
+        return {
+            "calls": self.calls,
+            "shared_tokens": self.shared_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "shared_ratio": round(self.shared_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+        }
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a text.
+    
+    Uses the common heuristic of about four characters per token, which is
+    close enough for budgeting prompts without loading a tokenizer.
+    
+    Args:
+        text: Text to measure
+        
+    Returns:
+        Approximate token count
+    """
+    return (len(text) + 3) // 4
+
+
 if __name__ == "__main__":
     # Test prompt templates
     rag_prompt = get_rag_prompt()
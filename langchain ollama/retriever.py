@@ -3,6 +3,9 @@ Retrieval logic for fetching relevant documents.
 Handles query embedding and similarity search.
 """
 
+import asyncio
+import time
+
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
 
@@ -11,8 +14,27 @@ from config import (
     SEARCH_TYPE,
     MMR_FETCH_K,
     MMR_LAMBDA_MULT,
+    CHROMA_COLLECTION_NAME,
+    SHARDING_ENABLED,
+)
+from embedding import embed_text, aembed_text
+from metrics import counter, histogram
+from profiling import span
+from prompting import format_context
+from shards import search_by_vector as search_shards
+from vectorstore import (
+    get_vectorstore,
+    similarity_search_by_vector,
+    mmr_search_by_vector,
+)
+
+
+RETRIEVAL_REQUESTS = counter(
+    "rag_retrieval_requests_total", "Retrieval requests", ("search_type",)
+)
+RETRIEVAL_LATENCY = histogram(
+    "rag_retrieval_latency_seconds", "End-to-end retrieval latency (embed + search)", ("search_type",)
 )
-from vectorstore import get_vectorstore
 
 
 def get_retriever(
@@ -23,6 +45,9 @@ def get_retriever(
     """
     Create and return a retriever from the vector store.
     
+    The retriever keeps the store opened now; after a compaction
+    (compaction.py) rebuilds the collection, create a new one.
+    
     Args:
         search_type: Type of search ("similarity" or "mmr")
         k: Number of documents to retrieve
@@ -47,10 +72,67 @@ def get_retriever(
     return retriever
 
 
+def search_by_vector(
+    embedding: list[float],
+    k: int = RETRIEVER_K,
+    search_type: str = SEARCH_TYPE,
+    filter: dict | None = None,
+    fetch_k: int = MMR_FETCH_K,
+    lambda_mult: float = MMR_LAMBDA_MULT,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+    query: str | None = None,
+) -> list[Document]:
+    """
+    Search the vector store with an already embedded query.
+    
+    With sharding enabled, searches of the default collection go to the
+    shards the query routes to instead (see shards.py).
+    
+    Args:
+        embedding: Query embedding vector
+        k: Number of documents to retrieve
+        search_type: Type of search ("similarity" or "mmr")
+        filter: Optional metadata filter
+        fetch_k: MMR candidates fetched before re-ranking
+        lambda_mult: MMR diversity factor
+        collection_name: Name of the collection to search
+        query: Query text, used to pick shards
+    
+    Returns:
+        List of relevant documents
+    """
+    if SHARDING_ENABLED and collection_name == CHROMA_COLLECTION_NAME:
+        return search_shards(
+            embedding,
+            query=query,
+            k=k,
+            search_type=search_type,
+            filter=filter,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+        )
+    if search_type == "mmr":
+        return mmr_search_by_vector(
+            embedding,
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            filter=filter,
+            collection_name=collection_name,
+        )
+    return similarity_search_by_vector(
+        embedding, k=k, filter=filter, collection_name=collection_name
+    )
+
+
 def retrieve_documents(
     query: str,
     k: int = RETRIEVER_K,
     search_type: str = SEARCH_TYPE,
+    fetch_k: int = MMR_FETCH_K,
+    lambda_mult: float = MMR_LAMBDA_MULT,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+    timings: dict | None = None,
 ) -> list[Document]:
     """
     Retrieve relevant documents for a query.
@@ -59,12 +141,39 @@ def retrieve_documents(
         query: User query string
         k: Number of documents to retrieve
         search_type: Type of search ("similarity" or "mmr")
+        fetch_k: MMR candidates fetched before re-ranking
+        lambda_mult: MMR diversity factor
+        collection_name: Name of the collection to search
+        timings: If given, filled with "embed_s" and "search_s"
         
     Returns:
         List of relevant documents
     """
-    retriever = get_retriever(search_type=search_type, k=k)
-    return retriever.invoke(query)
+    RETRIEVAL_REQUESTS.labels(search_type=search_type).inc()
+    start = time.perf_counter()
+    with span("embed", texts=1):
+        embedding = embed_text(query)
+    embedded = time.perf_counter()
+    
+    with span("vector_search", k=k, search_type=search_type) as search_span:
+        documents = search_by_vector(
+            embedding,
+            k=k,
+            search_type=search_type,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            collection_name=collection_name,
+            query=query,
+        )
+        if search_span is not None:
+            search_span.set(results=len(documents))
+    
+    finished = time.perf_counter()
+    RETRIEVAL_LATENCY.labels(search_type=search_type).observe(finished - start)
+    if timings is not None:
+        timings["embed_s"] = embedded - start
+        timings["search_s"] = finished - embedded
+    return documents
 
 
 def retrieve_with_context(
@@ -81,20 +190,7 @@ def retrieve_with_context(
     Returns:
         Formatted context string from retrieved documents
     """
-    documents = retrieve_documents(query, k=k)
-    
-    if not documents:
-        return "No relevant context found."
-    
-    context_parts = []
-    for i, doc in enumerate(documents, 1):
-        source = doc.metadata.get("source_file", "Unknown")
-        page = doc.metadata.get("page", "N/A")
-        context_parts.append(
-            f"[Source {i}: {source}, Page {page}]\n{doc.page_content}"
-        )
-    
-    return "\n\n---\n\n".join(context_parts)
+    return format_context(retrieve_documents(query, k=k))
 
 
 def retrieve_by_volume(
@@ -113,16 +209,112 @@ def retrieve_by_volume(
     Returns:
         List of relevant documents from the specified volume
     """
-    vectorstore = get_vectorstore()
-    
     # Use filter to limit to specific volume
-    results = vectorstore.similarity_search(
-        query,
+    return search_by_vector(
+        embed_text(query),
         k=k,
+        search_type="similarity",
         filter={"source_file": volume_name},
     )
+
+
+# =============================================================================
+# ASYNC API
+# =============================================================================
+
+async def aretrieve_documents(
+    query: str,
+    k: int = RETRIEVER_K,
+    search_type: str = SEARCH_TYPE,
+    fetch_k: int = MMR_FETCH_K,
+    lambda_mult: float = MMR_LAMBDA_MULT,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+    timings: dict | None = None,
+) -> list[Document]:
+    """
+    Retrieve relevant documents for a query without blocking the event loop.
     
-    return results
+    Args:
+        query: User query string
+        k: Number of documents to retrieve
+        search_type: Type of search ("similarity" or "mmr")
+        fetch_k: MMR candidates fetched before re-ranking
+        lambda_mult: MMR diversity factor
+        collection_name: Name of the collection to search
+        timings: If given, filled with "embed_s" and "search_s"
+    
+    Returns:
+        List of relevant documents
+    """
+    RETRIEVAL_REQUESTS.labels(search_type=search_type).inc()
+    start = time.perf_counter()
+    with span("embed", texts=1):
+        embedding = await aembed_text(query)
+    embedded = time.perf_counter()
+    
+    with span("vector_search", k=k, search_type=search_type) as search_span:
+        documents = await asyncio.to_thread(
+            search_by_vector,
+            embedding,
+            k=k,
+            search_type=search_type,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            collection_name=collection_name,
+            query=query,
+        )
+        if search_span is not None:
+            search_span.set(results=len(documents))
+    
+    finished = time.perf_counter()
+    RETRIEVAL_LATENCY.labels(search_type=search_type).observe(finished - start)
+    if timings is not None:
+        timings["embed_s"] = embedded - start
+        timings["search_s"] = finished - embedded
+    return documents
+
+
+async def aretrieve_with_context(
+    query: str,
+    k: int = RETRIEVER_K,
+) -> str:
+    """
+    Retrieve documents asynchronously and format them as context string.
+    
+    Args:
+        query: User query string
+        k: Number of documents to retrieve
+        
+    Returns:
+        Formatted context string from retrieved documents
+    """
+    return format_context(await aretrieve_documents(query, k=k))
+
+
+async def aretrieve_by_volume(
+    query: str,
+    volume_name: str,
+    k: int = RETRIEVER_K,
+) -> list[Document]:
+    """
+    Retrieve documents filtered by volume name without blocking the event loop.
+    
+    Args:
+        query: User query string
+        volume_name: Name of the volume to filter by
+        k: Number of documents to retrieve
+        
+    Returns:
+        List of relevant documents from the specified volume
+    """
+    embedding = await aembed_text(query)
+    return await asyncio.to_thread(
+        search_by_vector,
+        embedding,
+        k,
+        "similarity",
+        {"source_file": volume_name},
+    )
 
 
 if __name__ == "__main__":
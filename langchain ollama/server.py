@@ -0,0 +1,474 @@
+"""
+HTTP serving mode for the Light Novel AI Agent.
+Exposes chat, streaming chat, retrieval and ingestion status over HTTP.
+
+Built on asyncio streams from the standard library. Concurrent query
+embeddings are micro-batched, LLM generations are bounded by a
+semaphore with a fixed-size wait queue, and requests beyond the queue
+are rejected with 429. Turns waiting for their session count against
+the queue as well. A request without a session_id gets a new session,
+returned in the response; idle sessions beyond SERVE_MAX_SESSIONS are
+dropped, least recently used first.
+
+Endpoints:
+    GET  /health          - Liveness check
+    GET  /ingest/status   - Ingestion status and collection size
+    POST /retrieve        - {"query": str, "k": int} -> retrieved passages
+    POST /chat            - {"message": str, "session_id": str, "mode": "agent"|"simple"}
+    POST /chat/stream     - Same body as /chat, answered as server-sent events
+    GET  /metrics         - Prometheus metrics in the text format
+"""
+
+import asyncio
+import json
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from http import HTTPStatus
+
+from config import (
+    SERVE_HOST,
+    SERVE_PORT,
+    SERVE_MAX_GENERATIONS,
+    SERVE_MAX_QUEUE,
+    SERVE_MAX_SESSIONS,
+    EMBED_BATCH_SIZE,
+    EMBED_BATCH_WAIT_MS,
+    RETRIEVER_K,
+    KEEP_WARM_INTERVAL_S,
+)
+from agent import LightNovelAgent, SimpleRAGChain
+from embedding import enable_query_batching
+from ingest import get_ingestion_status
+from memory import remove_session
+from metrics import counter, gauge, render_metrics, CONTENT_TYPE
+from retriever import aretrieve_documents
+from warmup import KeepWarm
+
+MAX_BODY_BYTES = 1024 * 1024
+
+QUEUED_GENERATIONS = gauge(
+    "rag_server_generations_queued", "Requests waiting for a generation slot"
+)
+REJECTED_REQUESTS = counter(
+    "rag_server_rejected_total", "Requests rejected with 429 because the queue was full"
+)
+
+
+class Overloaded(Exception):
+    """Raised when the generation queue is full."""
+
+
+class HTTPError(Exception):
+    """An error that maps directly to an HTTP response."""
+    
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class GenerationLimiter:
+    """
+    Bounds the number of in-flight LLM generations.
+    
+    Up to ``max_in_flight`` generations run at once and up to
+    ``max_queued`` more wait for a slot. Anything beyond that is
+    rejected immediately with Overloaded.
+    """
+    
+    def __init__(self, max_in_flight: int, max_queued: int):
+        """
+        Initialize the limiter.
+        
+        Args:
+            max_in_flight: Maximum concurrent generations
+            max_queued: Maximum requests waiting for a slot
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._admitted = 0
+        self._running = 0
+    
+    @property
+    def running(self) -> int:
+        """Number of generations currently running."""
+        return self._running
+    
+    @property
+    def queued(self) -> int:
+        """Number of requests waiting for a slot."""
+        return self._admitted - self._running
+    
+    @asynccontextmanager
+    async def slot(self, lock: asyncio.Lock | None = None):
+        """
+        Hold a generation slot, raising Overloaded if the queue is full.
+        
+        Args:
+            lock: Acquired before the slot (a session's turn lock); the
+                wait for it counts as queued but holds no slot
+        """
+        if self._admitted >= self.max_in_flight + self.max_queued:
+            raise Overloaded()
+        
+        self._admitted += 1
+        QUEUED_GENERATIONS.set(self.queued)
+        try:
+            if lock is not None:
+                await lock.acquire()
+            try:
+                async with self._semaphore:
+                    self._running += 1
+                    QUEUED_GENERATIONS.set(self.queued)
+                    try:
+                        yield
+                    finally:
+                        self._running -= 1
+            finally:
+                if lock is not None:
+                    lock.release()
+        finally:
+            self._admitted -= 1
+            QUEUED_GENERATIONS.set(self.queued)
+
+
+class AgentServer:
+    """Serves the agent over HTTP with shared per-session state."""
+    
+    def __init__(
+        self,
+        max_generations: int = SERVE_MAX_GENERATIONS,
+        max_queue: int = SERVE_MAX_QUEUE,
+        max_sessions: int = SERVE_MAX_SESSIONS,
+    ):
+        """
+        Initialize the server state.
+        
+        Args:
+            max_generations: Maximum concurrent LLM generations
+            max_queue: Maximum requests waiting for a generation slot
+            max_sessions: Sessions kept before idle ones are dropped
+        """
+        self.limiter = GenerationLimiter(max_generations, max_queue)
+        self.max_sessions = max_sessions
+        # session_id -> {"lock", "agent", "chain"}, least recently used first
+        self._sessions: OrderedDict[str, dict] = OrderedDict()
+    
+    def _session(self, session_id: str) -> dict:
+        """
+        Get or create a session's state and mark it as recently used.
+        
+        Its "lock" serializes the session's turns so its history stays
+        ordered. Beyond max_sessions, the least recently used sessions
+        that have no turn running or waiting are dropped together with
+        their conversation memory.
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = {"lock": asyncio.Lock(), "agent": None, "chain": None}
+            self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        
+        for old_id, old in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if old_id != session_id and not old["lock"].locked():
+                del self._sessions[old_id]
+                remove_session(old_id)
+        return session
+    
+    def _get_agent(self, session_id: str, session: dict) -> LightNovelAgent:
+        """Get or create the agent for a session (memory via get_session_memory)."""
+        if session["agent"] is None:
+            session["agent"] = LightNovelAgent(session_id=session_id)
+        return session["agent"]
+    
+    def _get_chain(self, session_id: str, session: dict) -> SimpleRAGChain:
+        """Get or create the simple RAG chain for a session."""
+        if session["chain"] is None:
+            session["chain"] = SimpleRAGChain(session_id=session_id)
+        return session["chain"]
+    
+    # -------------------------------------------------------------------------
+    # Handlers
+    # -------------------------------------------------------------------------
+    
+    async def handle_health(self, body: dict) -> dict:
+        return {
+            "status": "ok",
+            "generations_running": self.limiter.running,
+            "generations_queued": self.limiter.queued,
+        }
+    
+    async def handle_ingest_status(self, body: dict) -> dict:
+        status = await asyncio.to_thread(get_ingestion_status)
+        return {
+            "volumes_processed": status["volumes_processed"],
+            "total_chunks_in_db": status["total_chunks_in_db"],
+            "collection_name": status["collection_name"],
+            "volumes": status["volumes"],
+        }
+    
+    async def handle_retrieve(self, body: dict) -> dict:
+        query = _require_str(body, "query")
+        k = _require_positive_int(body, "k", RETRIEVER_K)
+        documents = await aretrieve_documents(query, k=k)
+        return {
+            "query": query,
+            "results": [
+                {
+                    "content": doc.page_content,
+                    "source_file": doc.metadata.get("source_file", "Unknown"),
+                    "page": doc.metadata.get("page"),
+                }
+                for doc in documents
+            ],
+        }
+    
+    async def handle_chat(self, body: dict) -> dict:
+        message = _require_str(body, "message")
+        session_id = _session_id(body)
+        mode = body.get("mode", "agent")
+        session = self._session(session_id)
+        
+        # Queued turns of one session wait for it without holding a slot
+        async with self.limiter.slot(session["lock"]):
+            if mode == "simple":
+                answer = await self._get_chain(session_id, session).aquery(message)
+            else:
+                answer = await self._get_agent(session_id, session).achat(message)
+        
+        return {"session_id": session_id, "answer": answer}
+    
+    async def stream_chat(self, body: dict, writer: asyncio.StreamWriter) -> None:
+        message = _require_str(body, "message")
+        session_id = _session_id(body)
+        session = self._session(session_id)
+        
+        async with self.limiter.slot(session["lock"]):
+            await _write_head(writer, HTTPStatus.OK, {
+                "Content-Type": "text/event-stream",
+                "Cache-Control": "no-cache",
+            })
+            try:
+                async for delta in self._get_agent(session_id, session).astream_chat(message):
+                    await _write_event(writer, {"delta": delta})
+                await _write_event(writer, {"done": True, "session_id": session_id})
+            except Exception as e:
+                await _write_event(writer, {"error": str(e)})
+    
+    # -------------------------------------------------------------------------
+    # Connection handling
+    # -------------------------------------------------------------------------
+    
+    async def handle_connection(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Handle a single HTTP request and close the connection."""
+        try:
+            method, path, body = await _read_request(reader)
+            route = (method, path)
+            
+            if route == ("POST", "/chat/stream"):
+                await self.stream_chat(body, writer)
+                return
+            
+            if route == ("GET", "/metrics"):
+                payload = render_metrics().encode("utf-8")
+                await _write_head(writer, HTTPStatus.OK, {
+                    "Content-Type": CONTENT_TYPE,
+                    "Content-Length": str(len(payload)),
+                })
+                writer.write(payload)
+                return
+            
+            handlers = {
+                ("GET", "/health"): self.handle_health,
+                ("GET", "/ingest/status"): self.handle_ingest_status,
+                ("POST", "/retrieve"): self.handle_retrieve,
+                ("POST", "/chat"): self.handle_chat,
+            }
+            if route not in handlers:
+                known_paths = {p for _, p in handlers} | {"/chat/stream", "/metrics"}
+                if path in known_paths:
+                    raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed")
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown path: {path}")
+            
+            result = await handlers[route](body)
+            await _write_json(writer, HTTPStatus.OK, result)
+        
+        except Overloaded:
+            REJECTED_REQUESTS.inc()
+            await _write_json(
+                writer,
+                HTTPStatus.TOO_MANY_REQUESTS,
+                {"error": "Server busy, retry later"},
+                {"Retry-After": "1"},
+            )
+        except HTTPError as e:
+            await _write_json(writer, e.status, {"error": e.message})
+        except Exception as e:
+            await _write_json(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+# =============================================================================
+# HTTP HELPERS
+# =============================================================================
+
+def _require_str(body: dict, key: str) -> str:
+    value = body.get(key)
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"'{key}' must be a non-empty string")
+    return value
+
+
+def _session_id(body: dict) -> str:
+    """The request's session_id, or a new one so clients never share a history."""
+    if "session_id" not in body:
+        return uuid.uuid4().hex
+    return _require_str(body, "session_id")
+
+
+def _require_positive_int(body: dict, key: str, default: int) -> int:
+    value = body.get(key, default)
+    if isinstance(value, bool):
+        value = None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        number = 0
+    if number < 1:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"'{key}' must be a positive integer")
+    return number
+
+
+async def _read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict]:
+    """Read the request line, headers and JSON body."""
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    parts = request_line.split()
+    if len(parts) != 3:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+    method, target, _ = parts
+    path = target.split("?", 1)[0]
+    
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    
+    try:
+        length = int(headers.get("content-length", "0") or 0)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed Content-Length")
+    if length < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    if not length:
+        return method, path, {}
+    
+    try:
+        raw = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body shorter than Content-Length")
+    try:
+        body = json.loads(raw)
+    except json.JSONDecodeError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be valid JSON")
+    if not isinstance(body, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+    return method, path, body
+
+
+async def _write_head(
+    writer: asyncio.StreamWriter,
+    status: HTTPStatus,
+    headers: dict,
+) -> None:
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}", "Connection: close"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    await writer.drain()
+
+
+async def _write_json(
+    writer: asyncio.StreamWriter,
+    status: HTTPStatus,
+    payload: dict,
+    extra_headers: dict | None = None,
+) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json; charset=utf-8",
+        "Content-Length": str(len(body)),
+        **(extra_headers or {}),
+    }
+    await _write_head(writer, status, headers)
+    writer.write(body)
+
+
+async def _write_event(writer: asyncio.StreamWriter, payload: dict) -> None:
+    data = json.dumps(payload, ensure_ascii=False)
+    writer.write(f"data: {data}\n\n".encode("utf-8"))
+    await writer.drain()
+
+
+# =============================================================================
+# ENTRY POINT
+# =============================================================================
+
+async def run_server(host: str = SERVE_HOST, port: int = SERVE_PORT) -> None:
+    """
+    Run the HTTP server until cancelled.
+    
+    Args:
+        host: Interface to bind
+        port: Port to listen on
+    """
+    enable_query_batching(EMBED_BATCH_SIZE, EMBED_BATCH_WAIT_MS)
+    app = AgentServer()
+    
+    # Load both models now and keep them loaded between requests
+    keep_warm = KeepWarm(KEEP_WARM_INTERVAL_S).start()
+    
+    server = await asyncio.start_server(app.handle_connection, host, port)
+    print(f"📡 Serving Light Novel AI Agent on http://{host}:{port}")
+    print(f"   Max generations: {SERVE_MAX_GENERATIONS}, queue: {SERVE_MAX_QUEUE}")
+    
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        keep_warm.stop()
+
+
+def serve(host: str = SERVE_HOST, port: int = SERVE_PORT) -> None:
+    """
+    Blocking entry point for the HTTP server.
+    
+    Args:
+        host: Interface to bind
+        port: Port to listen on
+    """
+    try:
+        asyncio.run(run_server(host, port))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+
+
+if __name__ == "__main__":
+    serve()
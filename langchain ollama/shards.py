@@ -0,0 +1,495 @@
+"""
+Per-series collections (shards) with a query router.
+
+With SHARDING_ENABLED=1 every series gets its own Chroma collection
+instead of sharing CHROMA_COLLECTION_NAME. The series of a volume is
+parsed from its filename ("Gimai Seikatsu vol 10.pdf" -> "Gimai
+Seikatsu") unless it was assigned explicitly.
+
+Retrieval goes through the router:
+
+- A query that names a series (or one of its aliases) searches only
+  that series' shard.
+- Any other query fans out to every shard in parallel; results are
+  merged by relevance score into one top-k list (for MMR, shards are
+  interleaved by rank).
+
+Shards are independent collections, so adding a series creates one and
+removing a series drops one; nothing else is rebuilt. The map of
+series, aliases and volumes lives in SHARD_MAP_FILE.
+
+Usage:
+    python shards.py --list                       # Shards and chunk counts
+    python shards.py --migrate                    # Split the single collection
+    python shards.py --route "who is Saki?"       # Show where a query goes
+    python shards.py --alias "Gimai Seikatsu" gimai
+    python shards.py --remove "Gimai Seikatsu"
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from config import (
+    CHROMA_DIR,
+    CHROMA_COLLECTION_NAME,
+    SHARDING_ENABLED,
+    SHARD_MAP_FILE,
+    SHARD_SEARCH_WORKERS,
+    STAGING_COLLECTION_NAME,
+    SEARCH_TYPE,
+    RETRIEVER_K,
+    MMR_FETCH_K,
+    MMR_LAMBDA_MULT,
+)
+from metrics import counter, histogram
+from vectorstore import (
+    copy_collection,
+    count_collection,
+    delete_source_documents,
+    drop_collection,
+    mmr_search_by_vector,
+    similarity_search_by_vector_with_score,
+)
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+SHARD_QUERIES = counter("rag_shard_queries_total", "Sharded searches by routing outcome", ("route",))
+SHARD_FANOUT = histogram(
+    "rag_shard_fanout", "Shards searched per query", buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+# Trailing volume numbers: "vol 10", "Volume 3", "v2", "#4", "Book 1", "- 05"
+_VOLUME_SUFFIX = re.compile(r"[\s_\-]*(?:vol(?:ume)?\.?|v|book|#)?[\s_\-]*\d+(?:\.\d+)?\s*$", re.IGNORECASE)
+
+# Loaded shard map and the modification time it was loaded at
+_shard_map: dict | None = None
+_shard_map_mtime: float | None = None
+_shard_map_lock = threading.RLock()
+
+_executor: ThreadPoolExecutor | None = None
+
+
+# =============================================================================
+# SHARD MAP
+# =============================================================================
+
+def _normalize(text: str) -> str:
+    """Lowercase and collapse everything but letters and digits to single spaces."""
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text.lower()).split())
+
+
+def load_shard_map() -> dict:
+    """
+    Load the shard map, re-reading the file only when it changed.
+    
+    Returns:
+        Dictionary with "series" (name -> {"collection", "aliases"}) and
+        "volumes" (filename -> series name)
+    """
+    global _shard_map, _shard_map_mtime
+    
+    with _shard_map_lock:
+        mtime = SHARD_MAP_FILE.stat().st_mtime if SHARD_MAP_FILE.exists() else None
+        if _shard_map is None or mtime != _shard_map_mtime:
+            if mtime is None:
+                _shard_map = {"series": {}, "volumes": {}}
+            else:
+                with open(SHARD_MAP_FILE, "r", encoding="utf-8") as f:
+                    _shard_map = json.load(f)
+            _shard_map_mtime = mtime
+        return _shard_map
+
+
+def save_shard_map(shard_map: dict) -> None:
+    """
+    Save the shard map atomically.
+    
+    Args:
+        shard_map: Map to save
+    """
+    global _shard_map, _shard_map_mtime
+    
+    with _shard_map_lock:
+        SHARD_MAP_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = SHARD_MAP_FILE.with_name(SHARD_MAP_FILE.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(shard_map, f, indent=2)
+        os.replace(tmp_path, SHARD_MAP_FILE)
+        _shard_map = shard_map
+        _shard_map_mtime = SHARD_MAP_FILE.stat().st_mtime
+
+
+def parse_series(filename: str) -> str:
+    """
+    Guess a volume's series from its filename.
+    
+    Args:
+        filename: Volume filename, e.g. "Gimai Seikatsu vol 10.pdf"
+    
+    Returns:
+        Series name, e.g. "Gimai Seikatsu"
+    """
+    stem = Path(filename).stem
+    series = " ".join(_VOLUME_SUFFIX.sub("", stem).replace("_", " ").split()).strip(" -")
+    return series or stem
+
+
+def shard_collection_name(series: str) -> str:
+    """
+    Chroma collection name of a series' shard.
+    
+    Chroma names are limited to 63 characters of [a-zA-Z0-9._-], so the
+    series is slugged and made unique with a short hash.
+    """
+    slug = re.sub(r"[^a-z0-9]+", "_", series.lower()).strip("_")[:30] or "series"
+    digest = hashlib.sha1(series.encode("utf-8")).hexdigest()[:6]
+    return f"{CHROMA_COLLECTION_NAME}_{slug}_{digest}"
+
+
+def series_for_volume(filename: str) -> str:
+    """Series of a volume: its explicit assignment, else parsed from the filename."""
+    return load_shard_map()["volumes"].get(filename) or parse_series(filename)
+
+
+def collection_for_volume(filename: str, register: bool = False) -> str:
+    """
+    Collection a volume is stored in.
+    
+    Args:
+        filename: Volume filename
+        register: Record the volume (and its series' shard) in the map
+    
+    Returns:
+        Its series' shard with sharding enabled, else CHROMA_COLLECTION_NAME
+    """
+    if not SHARDING_ENABLED:
+        return CHROMA_COLLECTION_NAME
+    if register:
+        return assign_volume(filename)
+    
+    series = series_for_volume(filename)
+    entry = load_shard_map()["series"].get(series)
+    return entry["collection"] if entry else shard_collection_name(series)
+
+
+def add_shard(series: str, aliases: list[str] | None = None) -> str:
+    """
+    Register a series' shard, or add aliases to an existing one.
+    
+    The collection itself is created by the first chunks written to it.
+    
+    Args:
+        series: Series name
+        aliases: Other names a query may use for the series
+    
+    Returns:
+        The shard's collection name
+    """
+    with _shard_map_lock:
+        shard_map = load_shard_map()
+        entry = shard_map["series"].get(series)
+        new_aliases = [alias for alias in aliases or [] if entry is None or alias not in entry["aliases"]]
+        if entry is None or new_aliases:
+            entry = entry or {"collection": shard_collection_name(series), "aliases": []}
+            entry["aliases"].extend(new_aliases)
+            shard_map["series"][series] = entry
+            save_shard_map(shard_map)
+        return entry["collection"]
+
+
+def assign_volume(filename: str, series: str | None = None) -> str:
+    """
+    Record which shard a volume belongs to.
+    
+    Args:
+        filename: Volume filename
+        series: Series name (default: parsed from the filename)
+    
+    Returns:
+        The shard's collection name
+    """
+    with _shard_map_lock:
+        series = series or series_for_volume(filename)
+        collection = add_shard(series)
+        shard_map = load_shard_map()
+        if shard_map["volumes"].get(filename) != series:
+            shard_map["volumes"][filename] = series
+            save_shard_map(shard_map)
+        return collection
+
+
+def remove_shard(series: str) -> list[str]:
+    """
+    Drop a series' shard and forget its volumes.
+    
+    Other shards are untouched. The volumes' registry entries are
+    removed too, so they are ingested again if their files come back.
+    
+    Args:
+        series: Series name
+    
+    Returns:
+        Filenames of the removed volumes
+    """
+    # ingest imports this module, so import it here
+    from ingest import update_registry_entry, load_fingerprints, save_fingerprints, _registry_lock
+    
+    with _shard_map_lock:
+        shard_map = load_shard_map()
+        entry = shard_map["series"].pop(series, None)
+        if entry is None:
+            raise ValueError(f"Unknown series: {series}")
+        volumes = [name for name, owner in shard_map["volumes"].items() if owner == series]
+        for name in volumes:
+            del shard_map["volumes"][name]
+        save_shard_map(shard_map)
+    
+    drop_collection(CHROMA_DIR, entry["collection"])
+    with _registry_lock:
+        fingerprints = load_fingerprints()
+        for name in volumes:
+            update_registry_entry(name, None)
+            fingerprints.pop(name, None)
+        save_fingerprints(fingerprints)
+    return volumes
+
+
+def list_shards() -> list[dict]:
+    """
+    Describe every shard.
+    
+    Returns:
+        List of dicts with "series", "collection", "aliases", "volumes"
+        and "count" (chunks in the collection)
+    """
+    shard_map = load_shard_map()
+    shards = []
+    for series, entry in sorted(shard_map["series"].items()):
+        shards.append({
+            "series": series,
+            "collection": entry["collection"],
+            "aliases": entry["aliases"],
+            "volumes": sorted(name for name, owner in shard_map["volumes"].items() if owner == series),
+            "count": count_collection(CHROMA_DIR, entry["collection"]),
+        })
+    return shards
+
+
+def total_count() -> int:
+    """Chunks across every shard and the unsharded collection."""
+    collections = {entry["collection"] for entry in load_shard_map()["series"].values()}
+    collections.add(CHROMA_COLLECTION_NAME)
+    return sum(count_collection(CHROMA_DIR, name) for name in collections)
+
+
+# =============================================================================
+# ROUTING & SEARCH
+# =============================================================================
+
+def _unsharded_collection_in_use() -> bool:
+    """Whether volumes ingested before sharding are still in the single collection."""
+    return count_collection(CHROMA_DIR, CHROMA_COLLECTION_NAME) > 0
+
+
+def route(query: str | None = None, filter: dict | None = None) -> list[str]:
+    """
+    Choose the collections a query searches.
+    
+    Args:
+        query: Query text; a series name or alias in it selects that shard
+            (and the single collection while it holds unmigrated volumes)
+        filter: Metadata filter; a "source_file" selects that volume's shard
+    
+    Returns:
+        Collection names to search (empty when the volume is not stored)
+    """
+    if filter and isinstance(filter.get("source_file"), str):
+        # ingest imports this module, so import it here
+        from ingest import load_registry
+        
+        # The registry knows where the volume really is: it may still be
+        # in the single collection, or not ingested at all. While it is
+        # staged, its searchable chunks are still in its own collection.
+        filename = filter["source_file"]
+        entry = load_registry().get(filename)
+        collection = entry.get("collection", CHROMA_COLLECTION_NAME) if entry else None
+        if collection == STAGING_COLLECTION_NAME:
+            candidates = [collection_for_volume(filename), CHROMA_COLLECTION_NAME]
+        else:
+            candidates = [collection or collection_for_volume(filename)]
+        # Counting never creates the collection, unlike opening it for search
+        return [name for name in dict.fromkeys(candidates) if count_collection(CHROMA_DIR, name) > 0]
+    
+    series = load_shard_map()["series"]
+    if query:
+        text = f" {_normalize(query)} "
+        named = [
+            entry["collection"]
+            for name, entry in series.items()
+            if any(f" {_normalize(alias)} " in text for alias in [name, *entry["aliases"]] if _normalize(alias))
+        ]
+        if named:
+            # Volumes of the series may not have been migrated yet
+            if _unsharded_collection_in_use():
+                named.append(CHROMA_COLLECTION_NAME)
+            return named
+    
+    collections = [entry["collection"] for entry in series.values()]
+    if not collections or _unsharded_collection_in_use():
+        collections.append(CHROMA_COLLECTION_NAME)
+    return collections
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    
+    with _shard_map_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SHARD_SEARCH_WORKERS, thread_name_prefix="shard")
+        return _executor
+
+
+def search_by_vector(
+    embedding: list[float],
+    query: str | None = None,
+    k: int = RETRIEVER_K,
+    search_type: str = SEARCH_TYPE,
+    filter: dict | None = None,
+    fetch_k: int = MMR_FETCH_K,
+    lambda_mult: float = MMR_LAMBDA_MULT,
+) -> list[Document]:
+    """
+    Search the shards a query routes to and merge their results.
+    
+    Args:
+        embedding: Query embedding vector
+        query: Query text, used for routing
+        k: Number of documents to return
+        search_type: "similarity" or "mmr"
+        filter: Optional metadata filter
+        fetch_k: MMR candidates fetched per shard
+        lambda_mult: MMR diversity factor
+    
+    Returns:
+        Top-k documents across the searched shards
+    """
+    collections = route(query, filter)
+    SHARD_QUERIES.labels(route="all" if len(collections) > 1 else "single").inc()
+    SHARD_FANOUT.observe(len(collections))
+    if not collections:
+        return []
+    
+    if search_type == "mmr":
+        def search(collection: str) -> list:
+            return mmr_search_by_vector(
+                embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult,
+                filter=filter, collection_name=collection,
+            )
+    else:
+        def search(collection: str) -> list:
+            return similarity_search_by_vector_with_score(
+                embedding, k=k, filter=filter, collection_name=collection
+            )
+    
+    if len(collections) == 1:
+        results = [search(collections[0])]
+    else:
+        results = list(_get_executor().map(search, collections))
+    
+    if search_type == "mmr":
+        # MMR results carry no score: interleave shards by rank
+        merged = [doc for rank in zip_longest(*results) for doc in rank if doc is not None]
+        return merged[:k]
+    
+    # Scores are distances (lower is closer); every shard is created with the
+    # same embedding model and distance space, so they compare across shards
+    best = heapq.nsmallest(k, (pair for shard in results for pair in shard), key=lambda pair: pair[1])
+    return [doc for doc, _ in best]
+
+
+# =============================================================================
+# MIGRATION
+# =============================================================================
+
+def migrate_to_shards(drop_source: bool = False) -> dict[str, int]:
+    """
+    Move every volume from the single collection into its series' shard.
+    
+    Embeddings are copied as they are, nothing is re-embedded. Each
+    volume is copied, marked in the registry and then deleted from the
+    source, so an interrupted migration can simply be run again.
+    
+    Args:
+        drop_source: Drop the single collection once it is empty
+    
+    Returns:
+        Chunks moved per series
+    """
+    # ingest imports this module, so import it here
+    from ingest import load_registry, update_registry_entry
+    
+    moved: dict[str, int] = {}
+    for filename, entry in load_registry().items():
+        if entry.get("collection", CHROMA_COLLECTION_NAME) != CHROMA_COLLECTION_NAME:
+            continue
+        
+        series = series_for_volume(filename)
+        collection = assign_volume(filename, series)
+        copied = copy_collection(
+            CHROMA_COLLECTION_NAME, collection, CHROMA_DIR, where={"source_file": filename}
+        )
+        update_registry_entry(filename, {**entry, "collection": collection})
+        delete_source_documents(filename, CHROMA_DIR, CHROMA_COLLECTION_NAME)
+        moved[series] = moved.get(series, 0) + copied
+        print(f"  {filename} -> {series}: {copied} chunks")
+    
+    remaining = count_collection(CHROMA_DIR, CHROMA_COLLECTION_NAME)
+    if drop_source and remaining == 0:
+        drop_collection(CHROMA_DIR, CHROMA_COLLECTION_NAME)
+    return moved
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Manage per-series collections")
+    parser.add_argument("--list", action="store_true", help="show shards and chunk counts")
+    parser.add_argument("--migrate", action="store_true", help="split the single collection into shards")
+    parser.add_argument("--drop-source", action="store_true", help="with --migrate: drop the emptied collection")
+    parser.add_argument("--route", metavar="QUERY", help="show which shards a query searches")
+    parser.add_argument("--alias", nargs="+", metavar=("SERIES", "ALIAS"), help="add a shard or aliases")
+    parser.add_argument("--assign", nargs=2, metavar=("FILENAME", "SERIES"), help="put a volume in a series")
+    parser.add_argument("--remove", metavar="SERIES", help="drop a series' shard")
+    args = parser.parse_args()
+    
+    if not SHARDING_ENABLED:
+        print("Note: SHARDING_ENABLED is off, retrieval uses the single collection.")
+    
+    if args.migrate:
+        moved = migrate_to_shards(drop_source=args.drop_source)
+        print(f"Moved {sum(moved.values())} chunks into {len(moved)} shards")
+    if args.alias:
+        print(f"{args.alias[0]} -> {add_shard(args.alias[0], args.alias[1:])}")
+    if args.assign:
+        print(f"{args.assign[0]} -> {assign_volume(*args.assign)} (re-ingest it to move its chunks)")
+    if args.remove:
+        volumes = remove_shard(args.remove)
+        print(f"Removed {args.remove} ({len(volumes)} volumes)")
+    if args.route:
+        print("Searches:", ", ".join(route(args.route)))
+    if args.list or not any((args.migrate, args.alias, args.assign, args.remove, args.route)):
+        for shard in list_shards():
+            aliases = f" (aka {', '.join(shard['aliases'])})" if shard["aliases"] else ""
+            print(f"{shard['series']}{aliases}: {shard['count']} chunks, {len(shard['volumes'])} volumes")
+            print(f"  {shard['collection']}")
@@ -3,10 +3,26 @@ Text splitting logic for document chunking.
 Splits documents into smaller chunks for embedding.
 """
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
+from __future__ import annotations
 
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+import hashlib
+import re
+from typing import TYPE_CHECKING
+
+from config import (
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    DEDUP_SHINGLE_SIZE,
+    DEDUP_MAX_DISTANCE,
+)
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+FINGERPRINT_BITS = 64
+
+_WORD_PATTERN = re.compile(r"\w+")
 
 
 def get_text_splitter(
@@ -23,6 +39,8 @@ def get_text_splitter(
     Returns:
         Configured RecursiveCharacterTextSplitter
     """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
@@ -79,6 +97,146 @@ def split_text(
     return splitter.split_text(text)
 
 
+def simhash(text: str, shingle_size: int = DEDUP_SHINGLE_SIZE) -> int:
+    """
+    Compute a 64-bit SimHash fingerprint over word shingles.
+    
+    Texts that share most of their shingles end up with fingerprints
+    that differ in only a few bits.
+    
+    Args:
+        text: Text to fingerprint
+        shingle_size: Number of words per shingle
+        
+    Returns:
+        Fingerprint as an unsigned 64-bit integer
+    """
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) <= shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [
+            " ".join(words[i:i + shingle_size])
+            for i in range(len(words) - shingle_size + 1)
+        ]
+    
+    # One bit string per shingle; columns are then counted in C via str.count
+    bit_rows = [
+        format(
+            int.from_bytes(
+                hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(),
+                "big",
+            ),
+            "064b",
+        )
+        for shingle in shingles
+    ]
+    
+    fingerprint = 0
+    threshold = len(bit_rows)
+    for column in zip(*bit_rows):
+        fingerprint <<= 1
+        if column.count("1") * 2 > threshold:
+            fingerprint |= 1
+    return fingerprint
+
+
+class FingerprintIndex:
+    """
+    Index of SimHash fingerprints supporting near-duplicate lookup.
+    
+    Fingerprints are split into ``max_distance + 1`` bands. Two fingerprints
+    within ``max_distance`` bits of each other must agree exactly on at least
+    one band, so only fingerprints sharing a band are compared.
+    """
+    
+    def __init__(self, max_distance: int = DEDUP_MAX_DISTANCE):
+        """
+        Initialize an empty fingerprint index.
+        
+        Args:
+            max_distance: Maximum Hamming distance counted as a duplicate
+        """
+        self.max_distance = max_distance
+        num_bands = max_distance + 1
+        width, extra = divmod(FINGERPRINT_BITS, num_bands)
+        
+        self._bands: list[tuple[int, int]] = []
+        shift = 0
+        for i in range(num_bands):
+            band_width = width + (1 if i < extra else 0)
+            self._bands.append((shift, (1 << band_width) - 1))
+            shift += band_width
+        
+        self._tables: list[dict[int, list[int]]] = [{} for _ in self._bands]
+        self._count = 0
+    
+    def _keys(self, fingerprint: int):
+        """Yield the band values of a fingerprint."""
+        for shift, mask in self._bands:
+            yield (fingerprint >> shift) & mask
+    
+    def find(self, fingerprint: int) -> int | None:
+        """
+        Find a stored fingerprint close to the given one.
+        
+        Args:
+            fingerprint: Fingerprint to look up
+            
+        Returns:
+            A matching stored fingerprint, or None if there is none
+        """
+        for table, key in zip(self._tables, self._keys(fingerprint)):
+            for candidate in table.get(key, ()):
+                if (candidate ^ fingerprint).bit_count() <= self.max_distance:
+                    return candidate
+        return None
+    
+    def add(self, fingerprint: int) -> None:
+        """Add a fingerprint to the index."""
+        for table, key in zip(self._tables, self._keys(fingerprint)):
+            table.setdefault(key, []).append(fingerprint)
+        self._count += 1
+    
+    def __len__(self) -> int:
+        """Return the number of indexed fingerprints."""
+        return self._count
+
+
+def deduplicate_chunks(
+    chunks: list[Document],
+    index: FingerprintIndex | None = None,
+    shingle_size: int = DEDUP_SHINGLE_SIZE,
+) -> list[Document]:
+    """
+    Drop chunks that are near-duplicates of an already seen chunk.
+    
+    Kept chunks are added to the index and get a ``simhash`` metadata
+    field (hex string) so their fingerprints can be persisted.
+    
+    Args:
+        chunks: Chunks to filter, in document order
+        index: Fingerprints seen so far (e.g. other volumes in the library)
+        shingle_size: Number of words per shingle
+        
+    Returns:
+        List of chunks that are not near-duplicates
+    """
+    if index is None:
+        index = FingerprintIndex()
+    
+    unique = []
+    for chunk in chunks:
+        fingerprint = simhash(chunk.page_content, shingle_size)
+        if index.find(fingerprint) is not None:
+            continue
+        index.add(fingerprint)
+        chunk.metadata["simhash"] = f"{fingerprint:016x}"
+        unique.append(chunk)
+    
+    return unique
+
+
 if __name__ == "__main__":
     # Test splitting
     test_text = """
@@ -0,0 +1,301 @@
+"""
+Bulk Amazon Titan Text Embeddings V2 for the Light Novel AI Agent.
+Embeds a corpus through Bedrock as an alternative to Ollama.
+
+Titan V2 takes one text per InvokeModel call, so throughput comes from
+concurrency: embed_texts keeps up to BEDROCK_EMBED_CONCURRENCY requests
+in flight over a shared, pooled client whose adaptive retry mode backs
+off client-side when the account's rate limit is reached. Vectors are
+returned as one contiguous float32 array and cached in SQLite by content
+hash, so unchanged chunks are never embedded twice.
+
+Set EMBEDDING_BACKEND=bedrock to use TitanEmbeddings through the
+backend registry in backends.py.
+
+Usage:
+    python titan_embeddings.py            # Embed a sample batch and report throughput
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from backends import get_bedrock_client, get_usage_ledger
+from config import (
+    BEDROCK_EMBEDDING_MODEL,
+    BEDROCK_EMBEDDING_DIMENSIONS,
+    BEDROCK_EMBEDDING_NORMALIZE,
+    BEDROCK_EMBED_CONCURRENCY,
+    BEDROCK_EMBEDDING_CACHE,
+)
+from embedding import CACHE_REQUESTS
+from metrics import counter, histogram
+
+TITAN_REQUESTS = counter(
+    "rag_titan_requests_total", "Titan embedding requests by result", ("result",)
+)
+TITAN_LATENCY = histogram(
+    "rag_titan_latency_seconds", "Titan embedding request latency"
+)
+
+# Errors worth retrying once botocore's own retries are exhausted
+_RETRYABLE_ERRORS = {"ThrottlingException", "ServiceUnavailableException", "ModelNotReadyException"}
+
+
+class EmbeddingCache:
+    """
+    SQLite cache of embeddings keyed by a hash of model, options and text.
+    
+    Safe to share between threads; vectors are stored as raw float32 bytes.
+    """
+    
+    def __init__(self, path: str | Path = BEDROCK_EMBEDDING_CACHE):
+        """
+        Open (or create) the cache.
+        
+        Args:
+            path: SQLite file, or ":memory:"
+        """
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+    
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """Return the cached vectors for the keys that are present."""
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+    
+    def put_many(self, items: dict[str, np.ndarray]) -> None:
+        """Store vectors, replacing existing entries."""
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TitanEmbedder:
+    """
+    Concurrent Titan Text Embeddings V2 client with a content-hash cache.
+    """
+    
+    def __init__(
+        self,
+        model_id: str = BEDROCK_EMBEDDING_MODEL,
+        dimensions: int = BEDROCK_EMBEDDING_DIMENSIONS,
+        normalize: bool = BEDROCK_EMBEDDING_NORMALIZE,
+        max_in_flight: int = BEDROCK_EMBED_CONCURRENCY,
+        cache: EmbeddingCache | None = None,
+    ):
+        """
+        Initialize the embedder.
+        
+        Args:
+            model_id: Bedrock model ID
+            dimensions: Output size (256, 512 or 1024)
+            normalize: Return unit-length vectors
+            max_in_flight: Maximum concurrent InvokeModel requests
+            cache: Embedding cache (None disables caching)
+        """
+        self.model_id = model_id
+        self.dimensions = dimensions
+        self.normalize = normalize
+        self.max_in_flight = max_in_flight
+        self.cache = cache
+    
+    def _key(self, text: str) -> str:
+        material = f"{self.model_id}\0{self.dimensions}\0{int(self.normalize)}\0{text}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+    
+    def embed_one(self, text: str, retries: int = 4) -> np.ndarray:
+        """
+        Embed one text with a single InvokeModel call (no cache).
+        
+        Throttling that outlasts botocore's retries is retried again
+        with full-jitter backoff.
+        
+        Args:
+            text: Text to embed
+            retries: Extra attempts after a retryable error
+        
+        Returns:
+            float32 vector of length ``dimensions``
+        """
+        from botocore.exceptions import ClientError
+        
+        body = json.dumps({
+            "inputText": text,
+            "dimensions": self.dimensions,
+            "normalize": self.normalize,
+        })
+        client = get_bedrock_client()
+        ledger = get_usage_ledger()
+        
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                response = client.invoke_model(
+                    modelId=self.model_id,
+                    body=body,
+                    contentType="application/json",
+                    accept="application/json",
+                )
+            except ClientError as e:
+                code = e.response.get("Error", {}).get("Code")
+                TITAN_REQUESTS.labels(result=code or "error").inc()
+                if ledger is not None:
+                    ledger.record_error(self.model_id, "embed", code or "error", time.perf_counter() - start)
+                if code not in _RETRYABLE_ERRORS or attempt == retries:
+                    raise
+                time.sleep(random.uniform(0, min(30.0, 2 ** attempt)))
+                continue
+            
+            payload = json.loads(response["body"].read())
+            elapsed = time.perf_counter() - start
+            TITAN_LATENCY.observe(elapsed)
+            TITAN_REQUESTS.labels(result="ok").inc()
+            if ledger is not None:
+                usage = {"inputTokens": payload.get("inputTextTokenCount", 0)}
+                ledger.record_response(self.model_id, "embed", {"usage": usage}, elapsed)
+            return np.asarray(payload["embedding"], dtype=np.float32)
+    
+    def embed_texts(self, texts: Iterable[str]) -> np.ndarray:
+        """
+        Embed many texts concurrently.
+        
+        Duplicate and cached texts are not sent to Bedrock. At most
+        ``max_in_flight`` requests are pending at any time.
+        
+        Args:
+            texts: Texts to embed
+        
+        Returns:
+            C-contiguous float32 array of shape (len(texts), dimensions)
+        """
+        texts = list(texts)
+        result = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        if not texts:
+            return result
+        
+        # Row indexes per distinct text
+        rows_by_key: dict[str, list[int]] = {}
+        text_by_key: dict[str, str] = {}
+        for row, text in enumerate(texts):
+            key = self._key(text)
+            rows_by_key.setdefault(key, []).append(row)
+            text_by_key[key] = text
+        
+        cached = self.cache.get_many(list(rows_by_key)) if self.cache is not None else {}
+        CACHE_REQUESTS.labels(cache="titan_embedding", result="hit").inc(len(cached))
+        CACHE_REQUESTS.labels(cache="titan_embedding", result="miss").inc(len(rows_by_key) - len(cached))
+        for key, vector in cached.items():
+            result[rows_by_key[key]] = vector
+        
+        pending_keys = iter([key for key in rows_by_key if key not in cached])
+        fresh: dict[str, np.ndarray] = {}
+        
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+                in_flight = {}
+                
+                def submit_next() -> bool:
+                    key = next(pending_keys, None)
+                    if key is None:
+                        return False
+                    in_flight[pool.submit(self.embed_one, text_by_key[key])] = key
+                    return True
+                
+                for _ in range(self.max_in_flight):
+                    if not submit_next():
+                        break
+                
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        key = in_flight.pop(future)
+                        vector = future.result()
+                        result[rows_by_key[key]] = vector
+                        fresh[key] = vector
+                        submit_next()
+        finally:
+            # Keep what was paid for even if one text failed, so a rerun
+            # only embeds the rest
+            if self.cache is not None:
+                self.cache.put_many(fresh)
+        return result
+
+
+class TitanEmbeddings(Embeddings):
+    """LangChain Embeddings backed by TitanEmbedder."""
+    
+    def __init__(self, embedder: TitanEmbedder | None = None):
+        """
+        Initialize the wrapper.
+        
+        Args:
+            embedder: Embedder to use (default: configured from config.py
+                with the on-disk cache)
+        """
+        self.embedder = embedder or TitanEmbedder(cache=EmbeddingCache())
+    
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embedder.embed_texts(texts).tolist()
+    
+    def embed_query(self, text: str) -> list[float]:
+        return self.embedder.embed_texts([text])[0].tolist()
+    
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+    
+    async def aembed_query(self, text: str) -> list[float]:
+        return await asyncio.to_thread(self.embed_query, text)
+
+
+if __name__ == "__main__":
+    sample = [f"Sample sentence number {i} about a light novel hero." for i in range(64)]
+    embedder = TitanEmbedder(cache=EmbeddingCache(":memory:"))
+    
+    start = time.perf_counter()
+    vectors = embedder.embed_texts(sample)
+    elapsed = time.perf_counter() - start
+    print(f"Embedded {len(sample)} texts in {elapsed:.2f}s ({len(sample) / elapsed:.1f} texts/s)")
+    print(f"Array: shape={vectors.shape} dtype={vectors.dtype} contiguous={vectors.flags['C_CONTIGUOUS']}")
+    
+    start = time.perf_counter()
+    embedder.embed_texts(sample)
+    print(f"Cached pass: {time.perf_counter() - start:.3f}s")
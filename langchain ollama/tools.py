@@ -1,13 +1,20 @@
 """
 Agent tools for the Light Novel AI Agent.
 Defines retrieval and analysis tools.
+
+Every tool has a sync implementation and an async counterpart, so the
+agent can run tools with either ``invoke`` or ``ainvoke``.
 """
 
-from langchain_core.tools import tool
-from langchain_ollama import ChatOllama
+from langchain_core.documents import Document
+from langchain_core.tools import StructuredTool
+from langchain_core.language_models import BaseChatModel
 
-from config import OLLAMA_BASE_URL, LLM_MODEL, LLM_TEMPERATURE, RETRIEVER_K
-from retriever import retrieve_documents, retrieve_with_context
+from backends import get_chat_model
+from config import RETRIEVER_K
+from metrics import track_llm_call, record_llm_tokens
+from profiling import span, record_llm_response
+from retriever import retrieve_documents, aretrieve_documents
 from prompting import (
     RETRIEVER_TOOL_DESCRIPTION,
     CHARACTER_TOOL_DESCRIPTION,
@@ -17,60 +24,34 @@ from prompting import (
 )
 
 
-@tool
-def search_novels(query: str) -> str:
-    """
-    Search the light novel database for relevant passages.
-    
-    Use this tool to find information about any topic in the light novels.
-    """
-    documents = retrieve_documents(query, k=RETRIEVER_K)
-    
-    if not documents:
-        return "No relevant passages found in the light novel database."
-    
+# =============================================================================
+# RESULT FORMATTING
+# =============================================================================
+
+def _format_passages(documents: list[Document], label: str) -> str:
+    """Format retrieved passages with their source and page."""
     results = []
     for i, doc in enumerate(documents, 1):
         source = doc.metadata.get("source_file", "Unknown")
         page = doc.metadata.get("page", "N/A")
-        results.append(f"[Result {i} - {source}, Page {page}]\n{doc.page_content}")
+        results.append(f"[{label} {i} - {source}, Page {page}]\n{doc.page_content}")
     
     return "\n\n---\n\n".join(results)
 
 
-@tool
-def search_character(character_query: str) -> str:
-    """
-    Search for character-specific information in the light novels.
-    
-    Use this tool when looking for information about specific characters,
-    their descriptions, relationships, or development.
-    """
-    # Enhanced query for character-specific search
-    enhanced_query = f"character {character_query} description appearance personality"
-    documents = retrieve_documents(enhanced_query, k=RETRIEVER_K)
-    
+def _format_search_results(documents: list[Document]) -> str:
+    if not documents:
+        return "No relevant passages found in the light novel database."
+    return _format_passages(documents, "Result")
+
+
+def _format_character_results(documents: list[Document], character_query: str) -> str:
     if not documents:
         return f"No information found about '{character_query}' in the light novel database."
-    
-    results = []
-    for i, doc in enumerate(documents, 1):
-        source = doc.metadata.get("source_file", "Unknown")
-        page = doc.metadata.get("page", "N/A")
-        results.append(f"[Character Info {i} - {source}, Page {page}]\n{doc.page_content}")
-    
-    return "\n\n---\n\n".join(results)
+    return _format_passages(documents, "Character Info")
 
 
-@tool
-def find_volume(event_description: str) -> str:
-    """
-    Find which volume contains a specific event or information.
-    
-    Use this tool to identify which volume an event occurs in.
-    """
-    documents = retrieve_documents(event_description, k=3)
-    
+def _format_volume_results(documents: list[Document]) -> str:
     if not documents:
         return "Could not locate this event in any of the available volumes."
     
@@ -89,40 +70,7 @@ def find_volume(event_description: str) -> str:
     return header + "\n\n".join(results)
 
 
-@tool
-def summarize_content(text_to_summarize: str) -> str:
-    """
-    Summarize a long passage of text into a concise summary.
-    
-    Use this tool when you need to condense retrieved content.
-    """
-    llm = ChatOllama(
-        base_url=OLLAMA_BASE_URL,
-        model=LLM_MODEL,
-        temperature=0.3,  # Lower temperature for more focused summaries
-    )
-    
-    summary_prompt = f"""Please summarize the following text concisely, 
-    preserving the key information and events:
-
-    {text_to_summarize}
-
-    Summary:"""
-    
-    response = llm.invoke(summary_prompt)
-    return response.content
-
-
-@tool
-def analyze_timeline(timeline_query: str) -> str:
-    """
-    Analyze the timeline and story progression for a specific topic.
-    
-    Use this tool to understand when events happen relative to each other.
-    """
-    # Search for timeline-related content
-    documents = retrieve_documents(timeline_query, k=RETRIEVER_K)
-    
+def _format_timeline_results(documents: list[Document]) -> str:
     if not documents:
         return "No timeline information found for this query."
     
@@ -146,6 +94,140 @@ def analyze_timeline(timeline_query: str) -> str:
     return formatted
 
 
+def _character_query(character_query: str) -> str:
+    # Enhanced query for character-specific search
+    return f"character {character_query} description appearance personality"
+
+
+def _get_summary_llm() -> BaseChatModel:
+    # Lower temperature for more focused summaries
+    return get_chat_model(temperature=0.3)
+
+
+def _summary_prompt(text_to_summarize: str) -> str:
+    return f"""Please summarize the following text concisely,
+    preserving the key information and events:
+    
+    {text_to_summarize}
+    
+    Summary:"""
+
+
+# =============================================================================
+# TOOL IMPLEMENTATIONS
+# =============================================================================
+
+def _search_novels(query: str) -> str:
+    """
+    Search the light novel database for relevant passages.
+    
+    Use this tool to find information about any topic in the light novels.
+    """
+    return _format_search_results(retrieve_documents(query, k=RETRIEVER_K))
+
+
+async def _asearch_novels(query: str) -> str:
+    return _format_search_results(await aretrieve_documents(query, k=RETRIEVER_K))
+
+
+def _search_character(character_query: str) -> str:
+    """
+    Search for character-specific information in the light novels.
+    
+    Use this tool when looking for information about specific characters,
+    their descriptions, relationships, or development.
+    """
+    documents = retrieve_documents(_character_query(character_query), k=RETRIEVER_K)
+    return _format_character_results(documents, character_query)
+
+
+async def _asearch_character(character_query: str) -> str:
+    documents = await aretrieve_documents(_character_query(character_query), k=RETRIEVER_K)
+    return _format_character_results(documents, character_query)
+
+
+def _find_volume(event_description: str) -> str:
+    """
+    Find which volume contains a specific event or information.
+    
+    Use this tool to identify which volume an event occurs in.
+    """
+    return _format_volume_results(retrieve_documents(event_description, k=3))
+
+
+async def _afind_volume(event_description: str) -> str:
+    return _format_volume_results(await aretrieve_documents(event_description, k=3))
+
+
+def _summarize_content(text_to_summarize: str) -> str:
+    """
+    Summarize a long passage of text into a concise summary.
+    
+    Use this tool when you need to condense retrieved content.
+    """
+    with span("llm", call="summarize") as llm_span, track_llm_call("summarize"):
+        response = _get_summary_llm().invoke(_summary_prompt(text_to_summarize))
+        record_llm_response(llm_span, response)
+    record_llm_tokens(response)
+    return response.content
+
+
+async def _asummarize_content(text_to_summarize: str) -> str:
+    with span("llm", call="summarize") as llm_span, track_llm_call("summarize"):
+        response = await _get_summary_llm().ainvoke(_summary_prompt(text_to_summarize))
+        record_llm_response(llm_span, response)
+    record_llm_tokens(response)
+    return response.content
+
+
+def _analyze_timeline(timeline_query: str) -> str:
+    """
+    Analyze the timeline and story progression for a specific topic.
+    
+    Use this tool to understand when events happen relative to each other.
+    """
+    return _format_timeline_results(retrieve_documents(timeline_query, k=RETRIEVER_K))
+
+
+async def _aanalyze_timeline(timeline_query: str) -> str:
+    return _format_timeline_results(await aretrieve_documents(timeline_query, k=RETRIEVER_K))
+
+
+# =============================================================================
+# TOOLS
+# =============================================================================
+
+search_novels = StructuredTool.from_function(
+    func=_search_novels,
+    coroutine=_asearch_novels,
+    name="search_novels",
+)
+
+search_character = StructuredTool.from_function(
+    func=_search_character,
+    coroutine=_asearch_character,
+    name="search_character",
+)
+
+find_volume = StructuredTool.from_function(
+    func=_find_volume,
+    coroutine=_afind_volume,
+    name="find_volume",
+)
+
+summarize_content = StructuredTool.from_function(
+    func=_summarize_content,
+    coroutine=_asummarize_content,
+    name="summarize_content",
+)
+
+analyze_timeline = StructuredTool.from_function(
+    func=_analyze_timeline,
+    coroutine=_aanalyze_timeline,
+    name="analyze_timeline",
+)
+
+
 def get_tools() -> list:
     """
     Get all available tools for the agent.
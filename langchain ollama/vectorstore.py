@@ -3,13 +3,94 @@ Vector database storage and loading using ChromaDB.
 Handles persistent storage of document embeddings.
 """
 
+from __future__ import annotations
+
+import asyncio
+import threading
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+from config import CHROMA_DIR, CHROMA_COLLECTION_NAME, COLLECTION_METADATA
+from embedding import get_embedding_model, aembed_text
+from metrics import counter, gauge, histogram
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+    from langchain_core.documents import Document
+
+VECTORSTORE_OPERATIONS = counter(
+    "rag_vectorstore_operations_total", "Vector store operations", ("operation",)
+)
+VECTORSTORE_LATENCY = histogram(
+    "rag_vectorstore_latency_seconds", "Vector store operation latency", ("operation",)
+)
+COLLECTION_SIZE = gauge(
+    "rag_collection_documents", "Documents in the collection when last checked", ("collection",)
+)
+
+
+# Open vector stores, keyed by (persist_directory, collection_name)
+_vectorstores: dict[tuple[str, str], Chroma] = {}
+_vectorstores_lock = threading.Lock()
+
+
+class ReadWriteLock:
+    """
+    Many readers or one writer; a waiting writer blocks new readers.
+    
+    Searches hold the read side. Swapping a re-ingested volume into a
+    collection holds the write side, so a search sees either the old or
+    the new version of the volume, never both or neither.
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+    
+    @contextmanager
+    def read(self):
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+    
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
 
-from langchain_chroma import Chroma
-from langchain_core.documents import Document
+# Guards searches against collection swaps (see promote_staged_collection)
+index_lock = ReadWriteLock()
 
-from config import CHROMA_DIR, CHROMA_COLLECTION_NAME
-from embedding import get_embedding_model
+
+@contextmanager
+def _observe(operation: str):
+    """Count and time a vector store operation."""
+    VECTORSTORE_OPERATIONS.labels(operation=operation).inc()
+    with VECTORSTORE_LATENCY.labels(operation=operation).time():
+        yield
 
 
 def get_vectorstore(
@@ -19,6 +100,8 @@ def get_vectorstore(
     """
     Get or create a ChromaDB vector store.
     
+    Stores are opened once per collection and reused by later calls.
+    
     Args:
         persist_directory: Directory for persistent storage
         collection_name: Name of the collection
@@ -26,15 +109,20 @@ def get_vectorstore(
     Returns:
         Chroma vector store instance
     """
-    embeddings = get_embedding_model()
-    
-    vectorstore = Chroma(
-        collection_name=collection_name,
-        embedding_function=embeddings,
-        persist_directory=str(persist_directory),
-    )
+    key = (str(persist_directory), collection_name)
     
-    return vectorstore
+    with _vectorstores_lock:
+        if key not in _vectorstores:
+            from langchain_chroma import Chroma
+            
+            # HNSW settings only apply when this creates the collection
+            _vectorstores[key] = Chroma(
+                collection_name=collection_name,
+                embedding_function=get_embedding_model(),
+                persist_directory=str(persist_directory),
+                collection_metadata=COLLECTION_METADATA or None,
+            )
+        return _vectorstores[key]
 
 
 def add_documents(
@@ -54,7 +142,44 @@ def add_documents(
         Updated Chroma vector store instance
     """
     vectorstore = get_vectorstore(persist_directory, collection_name)
-    vectorstore.add_documents(documents)
+    with _observe("add"):
+        vectorstore.add_documents(documents)
+    COLLECTION_SIZE.labels(collection=collection_name).set(vectorstore._collection.count())
+    return vectorstore
+
+
+def add_embedded_documents(
+    documents: list[Document],
+    embeddings: list[list[float]],
+    ids: list[str] | None = None,
+    persist_directory: str | Path = CHROMA_DIR,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+) -> Chroma:
+    """
+    Store documents whose embeddings were already computed.
+    
+    Args:
+        documents: List of documents to store
+        embeddings: One embedding vector per document
+        ids: Optional document IDs (random UUIDs if omitted)
+        persist_directory: Directory for persistent storage
+        collection_name: Name of the collection
+        
+    Returns:
+        Updated Chroma vector store instance
+    """
+    if ids is None:
+        ids = [str(uuid.uuid4()) for _ in documents]
+    
+    vectorstore = get_vectorstore(persist_directory, collection_name)
+    with _observe("upsert"):
+        vectorstore._collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=[doc.page_content for doc in documents],
+            metadatas=[doc.metadata or None for doc in documents],
+        )
+    COLLECTION_SIZE.labels(collection=collection_name).set(vectorstore._collection.count())
     return vectorstore
 
 
@@ -74,6 +199,8 @@ def create_vectorstore_from_documents(
     Returns:
         New Chroma vector store instance
     """
+    from langchain_chroma import Chroma
+    
     embeddings = get_embedding_model()
     
     vectorstore = Chroma.from_documents(
@@ -81,6 +208,7 @@ def create_vectorstore_from_documents(
         embedding=embeddings,
         collection_name=collection_name,
         persist_directory=str(persist_directory),
+        collection_metadata=COLLECTION_METADATA or None,
     )
     
     return vectorstore
@@ -104,8 +232,9 @@ def similarity_search(
     Returns:
         List of similar documents
     """
-    vectorstore = get_vectorstore(persist_directory, collection_name)
-    return vectorstore.similarity_search(query, k=k)
+    with index_lock.read():
+        vectorstore = get_vectorstore(persist_directory, collection_name)
+        return vectorstore.similarity_search(query, k=k)
 
 
 def similarity_search_with_score(
@@ -126,8 +255,9 @@ def similarity_search_with_score(
     Returns:
         List of (document, score) tuples
     """
-    vectorstore = get_vectorstore(persist_directory, collection_name)
-    return vectorstore.similarity_search_with_score(query, k=k)
+    with index_lock.read():
+        vectorstore = get_vectorstore(persist_directory, collection_name)
+        return vectorstore.similarity_search_with_score(query, k=k)
 
 
 def get_collection_stats(
@@ -144,15 +274,241 @@ def get_collection_stats(
     Returns:
         Dictionary with collection statistics
     """
-    vectorstore = get_vectorstore(persist_directory, collection_name)
-    collection = vectorstore._collection
+    key = (str(persist_directory), collection_name)
+    with _vectorstores_lock:
+        vectorstore = _vectorstores.get(key)
+    
+    if vectorstore is not None:
+        count = vectorstore._collection.count()
+    else:
+        # Not opened yet: count through chromadb directly, without loading
+        # langchain_chroma or the embedding model
+        count = count_collection(persist_directory, collection_name)
+    COLLECTION_SIZE.labels(collection=collection_name).set(count)
     
     return {
-        "name": collection.name,
-        "count": collection.count(),
+        "name": collection_name,
+        "count": count,
     }
 
 
+def count_collection(
+    persist_directory: str | Path = CHROMA_DIR,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+) -> int:
+    """
+    Count the documents in a collection using the bare chromadb client.
+    
+    Args:
+        persist_directory: Directory for persistent storage
+        collection_name: Name of the collection
+    
+    Returns:
+        Number of documents, 0 if the store or collection does not exist
+    """
+    if not Path(persist_directory).exists():
+        return 0
+    
+    import chromadb
+    
+    client = chromadb.PersistentClient(path=str(persist_directory))
+    try:
+        return client.get_collection(collection_name).count()
+    except Exception:
+        # chromadb raises ValueError or NotFoundError depending on version
+        return 0
+
+
+def copy_collection(
+    source_name: str,
+    target_name: str = CHROMA_COLLECTION_NAME,
+    persist_directory: str | Path = CHROMA_DIR,
+    batch_size: int = 500,
+    where: dict | None = None,
+    metadata: dict | None = None,
+) -> int:
+    """
+    Copy the records of a collection into another, embeddings included.
+    
+    Uses the bare chromadb client, so nothing is re-embedded. The target
+    is created with the source's metadata if it does not exist; records
+    already in it are overwritten by ID.
+    
+    Args:
+        source_name: Collection to copy from
+        target_name: Collection to copy into
+        persist_directory: Directory for persistent storage
+        batch_size: Records read and written per round trip
+        where: Optional metadata filter; only matching records are copied
+        metadata: Collection metadata for a newly created target
+            (default: the source's)
+    
+    Returns:
+        Number of records copied, 0 if the source does not exist
+    """
+    if not Path(persist_directory).exists():
+        return 0
+    
+    import chromadb
+    
+    client = chromadb.PersistentClient(path=str(persist_directory))
+    try:
+        source = client.get_collection(source_name)
+    except Exception:
+        return 0
+    target = client.get_or_create_collection(target_name, metadata=metadata or source.metadata)
+    
+    copied = 0
+    with _observe("copy"):
+        while True:
+            batch = source.get(
+                where=where,
+                limit=batch_size,
+                offset=copied,
+                include=["embeddings", "documents", "metadatas"],
+            )
+            if not batch["ids"]:
+                break
+            target.upsert(
+                ids=batch["ids"],
+                embeddings=batch["embeddings"],
+                documents=batch["documents"],
+                metadatas=batch["metadatas"],
+            )
+            copied += len(batch["ids"])
+    COLLECTION_SIZE.labels(collection=target_name).set(target.count())
+    return copied
+
+
+def drop_collection(
+    persist_directory: str | Path = CHROMA_DIR,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+) -> None:
+    """
+    Delete a collection with the bare chromadb client.
+    
+    Unlike delete_collection(), this never loads langchain_chroma or the
+    embedding model. Missing collections are ignored.
+    
+    Args:
+        persist_directory: Directory for persistent storage
+        collection_name: Name of the collection
+    """
+    with _vectorstores_lock:
+        _vectorstores.pop((str(persist_directory), collection_name), None)
+    
+    if not Path(persist_directory).exists():
+        return
+    
+    import chromadb
+    
+    client = chromadb.PersistentClient(path=str(persist_directory))
+    try:
+        client.delete_collection(collection_name)
+    except Exception:
+        pass
+
+
+def delete_source_documents(
+    source_file: str,
+    persist_directory: str | Path = CHROMA_DIR,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+) -> int:
+    """
+    Delete every chunk of one source file from a collection.
+    
+    Args:
+        source_file: Value of the chunks' "source_file" metadata
+        persist_directory: Directory for persistent storage
+        collection_name: Name of the collection
+    
+    Returns:
+        Number of chunks deleted
+    """
+    if not Path(persist_directory).exists():
+        return 0
+    
+    import chromadb
+    
+    client = chromadb.PersistentClient(path=str(persist_directory))
+    try:
+        collection = client.get_collection(collection_name)
+    except Exception:
+        return 0
+    
+    with _observe("delete"):
+        ids = collection.get(where={"source_file": source_file}, include=[])["ids"]
+        if ids:
+            collection.delete(ids=ids)
+    COLLECTION_SIZE.labels(collection=collection_name).set(collection.count())
+    return len(ids)
+
+
+def list_source_files(
+    persist_directory: str | Path = CHROMA_DIR,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+) -> list[str]:
+    """
+    List the distinct "source_file" values of a collection's chunks.
+    
+    Args:
+        persist_directory: Directory for persistent storage
+        collection_name: Name of the collection
+    
+    Returns:
+        Sorted filenames, empty if the collection does not exist
+    """
+    if not Path(persist_directory).exists():
+        return []
+    
+    import chromadb
+    
+    client = chromadb.PersistentClient(path=str(persist_directory))
+    try:
+        collection = client.get_collection(collection_name)
+    except Exception:
+        return []
+    
+    metadatas = collection.get(include=["metadatas"])["metadatas"]
+    return sorted({meta["source_file"] for meta in metadatas if meta and "source_file" in meta})
+
+
+def promote_staged_collection(
+    source_file: str,
+    staging_name: str,
+    persist_directory: str | Path = CHROMA_DIR,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+) -> int:
+    """
+    Replace one volume's chunks with those of a staging collection.
+    
+    The volume is ingested into ``staging_name`` while searches keep
+    using the live collection; this then deletes its old chunks, copies
+    its staged ones (embeddings included) and removes them from staging,
+    all under the write side of ``index_lock``. Chunks other volumes left
+    in staging are neither copied nor removed.
+    
+    The swap is delete-then-copy, and ``index_lock`` only guards searches
+    in this process: another process searching the same store can see
+    the volume missing or half copied while it runs.
+    
+    Args:
+        source_file: Volume being replaced
+        staging_name: Collection holding only the new version of the volume
+        persist_directory: Directory for persistent storage
+        collection_name: Live collection
+    
+    Returns:
+        Number of chunks copied in
+    """
+    staged = {"source_file": source_file}
+    with index_lock.write():
+        delete_source_documents(source_file, persist_directory, collection_name)
+        copied = copy_collection(staging_name, collection_name, persist_directory, where=staged)
+    delete_source_documents(source_file, persist_directory, staging_name)
+    return copied
+
+
 def delete_collection(
     persist_directory: str | Path = CHROMA_DIR,
     collection_name: str = CHROMA_COLLECTION_NAME,
@@ -166,6 +522,181 @@ def delete_collection(
     """
     vectorstore = get_vectorstore(persist_directory, collection_name)
     vectorstore.delete_collection()
+    
+    with _vectorstores_lock:
+        _vectorstores.pop((str(persist_directory), collection_name), None)
+
+
+def similarity_search_by_vector(
+    embedding: list[float],
+    k: int = 5,
+    filter: dict | None = None,
+    persist_directory: str | Path = CHROMA_DIR,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+) -> list[Document]:
+    """
+    Perform similarity search with an already computed query embedding.
+    
+    Args:
+        embedding: Query embedding vector
+        k: Number of results to return
+        filter: Optional metadata filter
+        persist_directory: Directory for persistent storage
+        collection_name: Name of the collection
+        
+    Returns:
+        List of similar documents
+    """
+    with index_lock.read(), _observe("search"):
+        vectorstore = get_vectorstore(persist_directory, collection_name)
+        return vectorstore.similarity_search_by_vector(embedding, k=k, filter=filter)
+
+
+def similarity_search_by_vector_with_score(
+    embedding: list[float],
+    k: int = 5,
+    filter: dict | None = None,
+    persist_directory: str | Path = CHROMA_DIR,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+) -> list[tuple[Document, float]]:
+    """
+    Perform similarity search with scores using a query embedding.
+    
+    Args:
+        embedding: Query embedding vector
+        k: Number of results to return
+        filter: Optional metadata filter
+        persist_directory: Directory for persistent storage
+        collection_name: Name of the collection
+        
+    Returns:
+        List of (document, distance) tuples, lower is more similar
+    """
+    with index_lock.read(), _observe("search"):
+        vectorstore = get_vectorstore(persist_directory, collection_name)
+        return vectorstore.similarity_search_by_vector_with_relevance_scores(
+            embedding, k=k, filter=filter
+        )
+
+
+def mmr_search_by_vector(
+    embedding: list[float],
+    k: int = 5,
+    fetch_k: int = 20,
+    lambda_mult: float = 0.5,
+    filter: dict | None = None,
+    persist_directory: str | Path = CHROMA_DIR,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+) -> list[Document]:
+    """
+    Perform Maximal Marginal Relevance search with a query embedding.
+    
+    Args:
+        embedding: Query embedding vector
+        k: Number of results to return
+        fetch_k: Number of candidates to fetch before re-ranking
+        lambda_mult: Diversity factor (0 = max diversity, 1 = min diversity)
+        filter: Optional metadata filter
+        persist_directory: Directory for persistent storage
+        collection_name: Name of the collection
+        
+    Returns:
+        List of selected documents
+    """
+    with index_lock.read(), _observe("mmr_search"):
+        vectorstore = get_vectorstore(persist_directory, collection_name)
+        return vectorstore.max_marginal_relevance_search_by_vector(
+            embedding,
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            filter=filter,
+        )
+
+
+# =============================================================================
+# ASYNC API
+# =============================================================================
+# Chroma's client is blocking, so its calls run in worker threads while
+# query embeddings use the Ollama async client.
+
+async def aadd_documents(
+    documents: list[Document],
+    persist_directory: str | Path = CHROMA_DIR,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+) -> Chroma:
+    """
+    Add documents to the vector store without blocking the event loop.
+    
+    Args:
+        documents: List of documents to add
+        persist_directory: Directory for persistent storage
+        collection_name: Name of the collection
+        
+    Returns:
+        Updated Chroma vector store instance
+    """
+    return await asyncio.to_thread(
+        add_documents, documents, persist_directory, collection_name
+    )
+
+
+async def asimilarity_search(
+    query: str,
+    k: int = 5,
+    persist_directory: str | Path = CHROMA_DIR,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+) -> list[Document]:
+    """
+    Perform similarity search without blocking the event loop.
+    
+    Args:
+        query: Query string
+        k: Number of results to return
+        persist_directory: Directory for persistent storage
+        collection_name: Name of the collection
+        
+    Returns:
+        List of similar documents
+    """
+    embedding = await aembed_text(query)
+    return await asyncio.to_thread(
+        similarity_search_by_vector,
+        embedding,
+        k,
+        None,
+        persist_directory,
+        collection_name,
+    )
+
+
+async def asimilarity_search_with_score(
+    query: str,
+    k: int = 5,
+    persist_directory: str | Path = CHROMA_DIR,
+    collection_name: str = CHROMA_COLLECTION_NAME,
+) -> list[tuple[Document, float]]:
+    """
+    Perform similarity search with scores without blocking the event loop.
+    
+    Args:
+        query: Query string
+        k: Number of results to return
+        persist_directory: Directory for persistent storage
+        collection_name: Name of the collection
+        
+    Returns:
+        List of (document, score) tuples
+    """
+    embedding = await aembed_text(query)
+    return await asyncio.to_thread(
+        similarity_search_by_vector_with_score,
+        embedding,
+        k,
+        None,
+        persist_directory,
+        collection_name,
+    )
 
 
 if __name__ == "__main__":
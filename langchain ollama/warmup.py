@@ -0,0 +1,195 @@
+"""
+Model warm-up and keep-warm for the Light Novel AI Agent.
+Preloads the Ollama models so the first question does not pay load time.
+
+Ollama loads a model on its first request and unloads it after
+``keep_alive`` of inactivity. Warm-up sends each model a minimal request
+(an empty generate prompt for the chat model, a one-word embedding for
+the embedding model) with the same num_ctx and keep_alive the agent
+uses, so the loaded instance is the one later requests reuse. KeepWarm
+repeats that periodically in serve mode so idle gaps never unload them.
+
+Usage:
+    python warmup.py            # Warm both models and print load times
+"""
+
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    OLLAMA_BASE_URL,
+    LLM_BACKEND,
+    EMBEDDING_BACKEND,
+    LLM_MODEL,
+    LLM_NUM_CTX,
+    EMBEDDING_MODEL,
+    OLLAMA_KEEP_ALIVE,
+    KEEP_WARM_INTERVAL_S,
+)
+from metrics import histogram
+
+WARMUP_LATENCY = histogram(
+    "rag_model_warmup_seconds", "Warm-up and keep-warm request latency", ("model",)
+)
+
+
+def _post(path: str, payload: dict, timeout: float) -> dict:
+    """POST JSON to the Ollama API and return the decoded response."""
+    request = urllib.request.Request(
+        f"{OLLAMA_BASE_URL.rstrip('/')}{path}",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def _timed(model: str, path: str, payload: dict, timeout: float) -> dict:
+    start = time.perf_counter()
+    response = _post(path, payload, timeout)
+    wall_s = time.perf_counter() - start
+    WARMUP_LATENCY.labels(model=model).observe(wall_s)
+    return {
+        "model": model,
+        "wall_s": round(wall_s, 3),
+        "load_s": round(response.get("load_duration", 0) / 1e9, 3),
+    }
+
+
+def warm_up_llm(timeout: float = 300.0) -> dict:
+    """
+    Load the chat model with an empty prompt.
+    
+    Args:
+        timeout: Seconds to wait for Ollama
+    
+    Returns:
+        Dictionary with the model name, wall seconds and Ollama load seconds
+    """
+    return _timed(LLM_MODEL, "/api/generate", {
+        "model": LLM_MODEL,
+        "prompt": "",
+        "stream": False,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        # Must match the agent's num_ctx or the next real request reloads the model
+        "options": {"num_ctx": LLM_NUM_CTX},
+    }, timeout)
+
+
+def warm_up_embedding_model(timeout: float = 120.0) -> dict:
+    """
+    Load the embedding model with a one-word embedding.
+    
+    Args:
+        timeout: Seconds to wait for Ollama
+    
+    Returns:
+        Dictionary with the model name, wall seconds and Ollama load seconds
+    """
+    return _timed(EMBEDDING_MODEL, "/api/embed", {
+        "model": EMBEDDING_MODEL,
+        "input": "warm-up",
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+    }, timeout)
+
+
+def warm_up_models(timeout: float = 300.0) -> list[dict]:
+    """
+    Load the chat and embedding models concurrently.
+    
+    Only models served by the Ollama backend are warmed. Failures are
+    reported per model rather than raised, so a missing model does not
+    stop the other from loading.
+    
+    Args:
+        timeout: Seconds to wait for each model
+    
+    Returns:
+        One result per model, with an "error" key on failure
+    """
+    jobs = {}
+    if LLM_BACKEND == "ollama":
+        jobs[LLM_MODEL] = warm_up_llm
+    if EMBEDDING_BACKEND == "ollama":
+        jobs[EMBEDDING_MODEL] = warm_up_embedding_model
+    if not jobs:
+        return []
+    
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = {model: pool.submit(job, timeout) for model, job in jobs.items()}
+    
+    results = []
+    for model, future in futures.items():
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append({"model": model, "error": str(e)})
+    return results
+
+
+def warm_up_in_background(timeout: float = 300.0) -> threading.Thread:
+    """
+    Run warm_up_models in a daemon thread.
+    
+    Args:
+        timeout: Seconds to wait for each model
+    
+    Returns:
+        The started thread
+    """
+    thread = threading.Thread(target=warm_up_models, args=(timeout,), name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+class KeepWarm:
+    """
+    Periodically re-warms both models from a daemon thread.
+    
+    The first ping happens immediately, so starting a KeepWarm also
+    performs the initial warm-up. The interval should stay below
+    OLLAMA_KEEP_ALIVE.
+    """
+    
+    def __init__(self, interval_s: float = KEEP_WARM_INTERVAL_S):
+        """
+        Initialize the pinger.
+        
+        Args:
+            interval_s: Seconds between pings
+        """
+        self.interval_s = interval_s
+        self.last_results: list[dict] = []
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+    
+    def start(self) -> "KeepWarm":
+        """Start pinging in the background."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="keep-warm", daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        """Stop pinging."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+    
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.last_results = warm_up_models()
+            self._stop.wait(self.interval_s)
+
+
+if __name__ == "__main__":
+    print(f"Warming up {LLM_MODEL} and {EMBEDDING_MODEL} at {OLLAMA_BASE_URL}...")
+    for result in warm_up_models():
+        if "error" in result:
+            print(f"  ✗ {result['model']}: {result['error']}")
+        else:
+            print(f"  ✓ {result['model']}: {result['wall_s']:.2f}s (load {result['load_s']:.2f}s)")
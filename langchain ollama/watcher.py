@@ -0,0 +1,317 @@
+"""
+Directory watcher for continuous incremental ingestion.
+
+Watches the PDF directory and keeps the collection in sync while the
+agent keeps answering:
+
+1. File events come from watchdog when it is installed, otherwise from
+   polling the directory every WATCH_POLL_INTERVAL_S (stdlib only).
+2. Events are debounced: a file is handled once it has not changed for
+   WATCH_DEBOUNCE_S, so a PDF that is still being copied is not read
+   half-written.
+3. A settled file is compared with its registry entry by size and
+   modification time, then by SHA-256, so touching a file or restarting
+   the watcher does not re-ingest anything.
+4. New and changed volumes are queued to a background worker that
+   ingests them into a staging collection and then swaps them into the
+   live collection under the index write lock. Searches see the old
+   version of a volume until the new one is complete.
+5. Deleted files have their chunks and registry entry removed.
+
+Usage:
+    python watcher.py               # Watch .pdfs until Ctrl+C
+    python main.py --watch          # Chat while watching
+"""
+
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from config import (
+    PDF_DIR,
+    CHROMA_COLLECTION_NAME,
+    STAGING_COLLECTION_NAME,
+    WATCH_POLL_INTERVAL_S,
+    WATCH_DEBOUNCE_S,
+    WATCH_USE_WATCHDOG,
+    ensure_directories,
+)
+from shards import collection_for_volume
+from ingest import (
+    file_signature,
+    ingest_file,
+    load_registry,
+    remove_volume,
+    update_registry_entry,
+    is_volume_live,
+)
+from metrics import counter, histogram
+from vectorstore import promote_staged_collection, delete_source_documents
+
+WATCH_EVENTS = counter("rag_watch_events_total", "Settled file changes handled by the watcher", ("action",))
+WATCH_INDEX_LATENCY = histogram(
+    "rag_watch_index_seconds", "Time from a file settling to its volume being searchable",
+    buckets=(1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0),
+)
+
+# Extensions handled by loaders.load_document
+SUPPORTED_EXTENSIONS = {".pdf", ".txt", ".md"}
+
+
+def _snapshot(directory: Path) -> dict[Path, tuple[int, int]]:
+    """(mtime_ns, size) of every supported file in a directory."""
+    snapshot = {}
+    for path in directory.iterdir():
+        if path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+            continue
+        try:
+            stat = path.stat()
+        except OSError:
+            # Deleted between listing and stat
+            continue
+        if path.is_file():
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+class DirectoryWatcher:
+    """
+    Watches a directory and ingests new, changed and deleted volumes.
+    
+    Detection runs on one thread, ingestion on another, so a long ingest
+    never delays noticing further changes.
+    """
+    
+    def __init__(
+        self,
+        directory: str | Path = PDF_DIR,
+        poll_interval_s: float = WATCH_POLL_INTERVAL_S,
+        debounce_s: float = WATCH_DEBOUNCE_S,
+        use_watchdog: bool = WATCH_USE_WATCHDOG,
+        on_indexed: Callable[[str, str], None] | None = None,
+    ):
+        """
+        Initialize the watcher.
+        
+        Args:
+            directory: Directory to watch
+            poll_interval_s: Seconds between scans without watchdog
+            debounce_s: Quiet period before a changed file is handled
+            use_watchdog: Use watchdog file events when installed
+            on_indexed: Called with (filename, action) after a volume is
+                added, updated or removed
+        """
+        self.directory = Path(directory)
+        self.poll_interval_s = poll_interval_s
+        self.debounce_s = debounce_s
+        self.use_watchdog = use_watchdog
+        self.on_indexed = on_indexed
+        
+        # Path -> monotonic time of its last event
+        self._pending: dict[Path, float] = {}
+        self._pending_lock = threading.Lock()
+        self._queue: queue.Queue[tuple[Path, float] | None] = queue.Queue()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._observer = None
+        self._snapshot: dict[Path, tuple[int, int]] = {}
+    
+    # =========================================================================
+    # Lifecycle
+    # =========================================================================
+    
+    def start(self) -> "DirectoryWatcher":
+        """Start watching; every existing file is checked once first."""
+        ensure_directories()
+        self._snapshot = _snapshot(self.directory)
+        
+        # Check files on disk and volumes in the registry whose file is gone
+        known = {self.directory / filename for filename in load_registry()}
+        for path in set(self._snapshot) | known:
+            self._touch(path, settled=True)
+        
+        if self.use_watchdog:
+            self._observer = self._start_watchdog()
+        
+        for target, name in ((self._detect_loop, "watch-detect"), (self._ingest_loop, "watch-ingest")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+    
+    def stop(self, timeout: float | None = None) -> None:
+        """Stop watching; an ingest in progress finishes first."""
+        self._stop.set()
+        self._queue.put(None)
+        if self._observer is not None:
+            self._observer.stop()
+        for thread in self._threads:
+            thread.join(timeout)
+    
+    @property
+    def mode(self) -> str:
+        return "watchdog" if self._observer is not None else "polling"
+    
+    # =========================================================================
+    # Detection
+    # =========================================================================
+    
+    def _start_watchdog(self):
+        """Start a watchdog observer, or return None if it is not installed."""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+        
+        watcher = self
+        
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for attr in ("src_path", "dest_path"):
+                    path = getattr(event, attr, None)
+                    if path:
+                        watcher._touch(Path(path))
+        
+        observer = Observer()
+        observer.schedule(Handler(), str(self.directory), recursive=False)
+        observer.daemon = True
+        observer.start()
+        return observer
+    
+    def _touch(self, path: Path, settled: bool = False) -> None:
+        """Record an event for a path, restarting its debounce period."""
+        if path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+            return
+        with self._pending_lock:
+            self._pending[path] = float("-inf") if settled else time.monotonic()
+    
+    def _poll(self) -> None:
+        """Compare the directory with the last snapshot and record changes."""
+        snapshot = _snapshot(self.directory)
+        for path in snapshot.keys() | self._snapshot.keys():
+            if snapshot.get(path) != self._snapshot.get(path):
+                self._touch(path)
+        self._snapshot = snapshot
+    
+    def _detect_loop(self) -> None:
+        # With watchdog only the debounce timer needs to tick
+        interval = self.poll_interval_s if self._observer is None else min(self.poll_interval_s, 0.5)
+        while not self._stop.is_set():
+            if self._observer is None:
+                try:
+                    self._poll()
+                except OSError as e:
+                    print(f"⚠️  Watcher scan failed: {e}")
+            
+            now = time.monotonic()
+            with self._pending_lock:
+                settled = [path for path, seen in self._pending.items() if now - seen >= self.debounce_s]
+                for path in settled:
+                    del self._pending[path]
+            for path in sorted(settled):
+                self._queue.put((path, now))
+            
+            self._stop.wait(interval)
+    
+    # =========================================================================
+    # Ingestion
+    # =========================================================================
+    
+    def _ingest_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None or self._stop.is_set():
+                return
+            path, settled_at = item
+            try:
+                action = self.process(path)
+            except Exception as e:
+                WATCH_EVENTS.labels(action="error").inc()
+                print(f"⚠️  Watcher could not index {path.name}: {e}")
+                continue
+            
+            WATCH_EVENTS.labels(action=action).inc()
+            if action in ("added", "updated", "removed"):
+                WATCH_INDEX_LATENCY.observe(time.monotonic() - settled_at)
+                if self.on_indexed is not None:
+                    self.on_indexed(path.name, action)
+    
+    def process(self, path: Path) -> str:
+        """
+        Bring one file's volume up to date.
+        
+        Args:
+            path: File that changed (it may no longer exist)
+        
+        Returns:
+            "added", "updated", "removed", "unchanged" or "failed"
+        """
+        filename = path.name
+        entry = load_registry().get(filename)
+        
+        if not path.exists():
+            if entry is None:
+                return "unchanged"
+            remove_volume(filename)
+            return "removed"
+        
+        current = is_volume_live(filename)
+        if current and (entry.get("size"), entry.get("mtime_ns")) == _stat(path):
+            return "unchanged"
+        
+        signature = file_signature(path)
+        if current and "sha256" not in entry:
+            # Ingested before signatures were recorded: trust it and backfill
+            update_registry_entry(filename, {**entry, **signature})
+            return "unchanged"
+        if current and entry["sha256"] == signature["sha256"]:
+            # Touched but not modified
+            update_registry_entry(filename, {**entry, **signature})
+            return "unchanged"
+        
+        staged = (
+            entry is not None
+            and entry.get("status") == "embedded"
+            and entry.get("collection") == STAGING_COLLECTION_NAME
+            and entry.get("sha256") == signature["sha256"]
+        )
+        if not staged:
+            # Build the new version aside; a partial staging run resumes
+            result = ingest_file(path, force=current, collection_name=STAGING_COLLECTION_NAME)
+            if result["status"] != "success":
+                print(f"⚠️  Watcher could not index {filename}: {result.get('message', 'Unknown')}")
+                return "failed"
+        
+        # Swap it in atomically, then mark the volume live
+        target = collection_for_volume(filename, register=True)
+        promote_staged_collection(filename, STAGING_COLLECTION_NAME, collection_name=target)
+        # Drop the old version wherever else it lived: another shard, or the
+        # single collection it was ingested into before sharding (a resumed
+        # staging run no longer knows which, so the latter is always checked)
+        previous = (entry or {}).get("collection", CHROMA_COLLECTION_NAME)
+        for stale in {previous, CHROMA_COLLECTION_NAME} - {target, STAGING_COLLECTION_NAME}:
+            delete_source_documents(filename, collection_name=stale)
+        update_registry_entry(filename, {**load_registry()[filename], "collection": target})
+        return "updated" if current else "added"
+
+
+def _stat(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+if __name__ == "__main__":
+    watcher = DirectoryWatcher(
+        on_indexed=lambda filename, action: print(f"📥 {filename}: {action}"),
+    ).start()
+    print(f"👀 Watching {watcher.directory} ({watcher.mode}), Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()